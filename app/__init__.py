@@ -1 +1 @@
-# Quiz System Backend Application
+# Quiz System Backend Application
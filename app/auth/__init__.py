@@ -1 +1 @@
-# Authentication
+# Authentication
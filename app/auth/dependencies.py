@@ -1,65 +1,88 @@
-"""
-Authentication dependencies for route protection
-JWT validation and role-based access control
-"""
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import decode_token
-from app.models.models import User
-
-security = HTTPBearer()
-
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """
-    Validate JWT token and return current user
-    Raises 401 if token is invalid or user not found
-    """
-    token = credentials.credentials
-    payload = decode_token(token)
-    
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token"
-        )
-    
-    if payload.get("type") != "access":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token type"
-        )
-    
-    user_id = payload.get("sub")
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload"
-        )
-    
-    user = db.query(User).filter(User.id == int(user_id), User.is_active == True).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found or inactive"
-        )
-    
-    return user
-
-def require_role(allowed_roles: list):
-    """
-    Dependency factory for role-based access control
-    Usage: Depends(require_role(["Admin"]))
-    """
-    def role_checker(current_user: User = Depends(get_current_user)) -> User:
-        if current_user.role.name not in allowed_roles:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Access denied. Required roles: {', '.join(allowed_roles)}"
-            )
-        return current_user
-    return role_checker
+"""
+Authentication dependencies for route protection
+JWT validation and role-based access control
+"""
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.principal import Principal, principal_cache
+from app.config import settings
+from app.core.database import get_async_db
+from app.core.security import decode_token
+from app.models.models import User, Role
+
+security = HTTPBearer()
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """
+    Validate JWT token and return the current user's principal
+    Served from the principal cache (or the token claims when
+    AUTH_TRUST_TOKEN_CLAIMS is set) before falling back to the database
+    Raises 401 if token is invalid or user not found
+    """
+    token = credentials.credentials
+    payload = decode_token(token)
+    
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token"
+        )
+    
+    if payload.get("type") != "access":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type"
+        )
+    
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token payload"
+        )
+    
+    user_id = int(user_id)
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    
+    if settings.AUTH_TRUST_TOKEN_CLAIMS and payload.get("role"):
+        return Principal(
+            id=user_id,
+            name=payload.get("name", ""),
+            role_name=payload["role"]
+        )
+    
+    user = (await db.execute(
+        select(User.id, User.name, Role.name.label("role_name")).outerjoin(
+            Role, Role.id == User.role_id
+        ).where(User.id == user_id, User.is_active == True)
+    )).first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found or inactive"
+        )
+    
+    principal = Principal(id=user.id, name=user.name, role_name=user.role_name)
+    principal_cache.put(principal)
+    return principal
+
+def require_role(allowed_roles: list):
+    """
+    Dependency factory for role-based access control
+    Usage: Depends(require_role(["Admin"]))
+    """
+    def role_checker(current_user: Principal = Depends(get_current_user)) -> Principal:
+        if current_user.role_name not in allowed_roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Access denied. Required roles: {', '.join(allowed_roles)}"
+            )
+        return current_user
+    return role_checker
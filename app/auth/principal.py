@@ -0,0 +1,68 @@
+"""
+Authenticated principal and its in-process cache
+Lets get_current_user skip the User/Role lookup on repeat requests
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Immutable view of the authenticated user"""
+    id: int
+    name: str
+    role_name: str
+    is_active: bool = True
+
+
+class PrincipalCache:
+    """
+    TTL cache of Principal objects keyed by user id
+    Must be invalidated whenever a user's name, role or active flag changes
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[int, Tuple[float, Principal]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def put(self, principal: Principal) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[principal.id] = (time.monotonic() + self.ttl_seconds, principal)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        # Drop expired entries first, then the oldest inserted if still full
+        now = time.monotonic()
+        for user_id in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[user_id]
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES
+)
@@ -1,31 +1,120 @@
-"""
-Application configuration
-Loads environment variables and defines app settings
-"""
-from pydantic_settings import BaseSettings
-
-class Settings(BaseSettings):
-    # Database
-    DATABASE_URL: str = "sqlite:///./quiz.db"
-    
-    # JWT
-    SECRET_KEY: str = "your-secret-key-change-in-production"
-    ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
-    
-    # Email
-    SMTP_HOST: str = "smtp.gmail.com"
-    SMTP_PORT: int = 587
-    SMTP_USER: str = ""
-    SMTP_PASSWORD: str = ""
-    EMAIL_FROM: str = ""
-    
-    # Exam settings
-    EXAM_DURATION_MINUTES: int = 45
-    MAX_TAB_SWITCHES: int = 3
-    
-    class Config:
-        env_file = ".env"
-
-settings = Settings()
+"""
+Application configuration
+Loads environment variables and defines app settings
+"""
+from pydantic_settings import BaseSettings
+
+class Settings(BaseSettings):
+    # Database
+    DATABASE_URL: str = "sqlite:///./quiz.db"
+    # Optional override; derived from DATABASE_URL (aiosqlite / asyncpg) when empty
+    ASYNC_DATABASE_URL: str = ""
+    # DATABASE_URL goes through a transaction-mode pooler (PgBouncer, Supabase :6543);
+    # disables asyncpg's prepared statement cache, which such poolers break
+    DB_TRANSACTION_POOLER: bool = False
+    
+    # Connection pool (applies to both the sync and the async engine)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800  # seconds, -1 disables
+    # Ping on every checkout; with a recycle shorter than the server's idle
+    # timeout this round trip can usually be turned off
+    DB_POOL_PRE_PING: bool = True
+    
+    # SQLite tuning (applied on connect)
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456
+    
+    # JWT
+    SECRET_KEY: str = "your-secret-key-change-in-production"
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    
+    # Auth principal cache
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # Trust the role/name claims in the access token instead of loading the user.
+    # Deactivation and role changes then only take effect when the token expires.
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+    
+    # Password hashing pool (login)
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # thread | process
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    # Process pool size for bulk user provisioning, 0 = one per CPU
+    PASSWORD_HASH_BULK_WORKERS: int = 0
+    # Bulk imports waiting behind the running one; more are refused with 503
+    PROVISIONING_MAX_QUEUED_JOBS: int = 4
+    
+    # Email
+    SMTP_HOST: str = "smtp.gmail.com"
+    SMTP_PORT: int = 587
+    SMTP_USER: str = ""
+    SMTP_PASSWORD: str = ""
+    EMAIL_FROM: str = ""
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT_SECONDS: int = 30
+    
+    # SMTP connection pool
+    SMTP_POOL_SIZE: int = 4
+    SMTP_POOL_IDLE_CHECK_SECONDS: int = 30  # NOOP connections idle longer than this before reuse
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    
+    # Certificates
+    CERTIFICATE_STORAGE_BACKEND: str = "local"  # local | s3
+    CERTIFICATE_STORAGE_DIR: str = "./certificates"
+    CERTIFICATE_S3_BUCKET: str = ""
+    CERTIFICATE_S3_PREFIX: str = "certificates/"
+    CERTIFICATE_S3_ENDPOINT_URL: str = ""  # set for MinIO / other S3-compatible stores
+    CERTIFICATE_DOWNLOAD_URL_TTL_SECONDS: int = 300
+    
+    # Certificate email outbox
+    CERTIFICATE_OUTBOX_CONCURRENCY: int = 4
+    CERTIFICATE_OUTBOX_BATCH_SIZE: int = 50
+    CERTIFICATE_OUTBOX_POLL_SECONDS: int = 2
+    CERTIFICATE_OUTBOX_LEASE_SECONDS: int = 300  # a claimed row becomes due again after this
+    CERTIFICATE_OUTBOX_MAX_ATTEMPTS: int = 8
+    CERTIFICATE_OUTBOX_BACKOFF_BASE_SECONDS: int = 30
+    CERTIFICATE_OUTBOX_BACKOFF_MAX_SECONDS: int = 3600
+    
+    # Exam settings
+    EXAM_DURATION_MINUTES: int = 45
+    MAX_TAB_SWITCHES: int = 3
+    
+    # Admin dashboard
+    DASHBOARD_CACHE_TTL_SECONDS: int = 10
+    STAT_COUNTER_SHARDS: int = 8
+    
+    # Exam sessions
+    EXAM_SESSION_BACKEND: str = "memory"  # memory | redis | sqlite
+    EXAM_SESSION_REDIS_URL: str = "redis://localhost:6379/0"
+    EXAM_SESSION_SQLITE_PATH: str = "./exam_sessions.db"
+    EXAM_SESSION_GRACE_MINUTES: int = 5
+    EXAM_SESSION_SWEEP_SECONDS: int = 60
+    # Sessions outlive the submit cutoff by this much so the deadline scheduler can
+    # auto-submit them; keep it well above 2 * AUTOSAVE_FLUSH_SECONDS
+    EXAM_SESSION_RETAIN_SECONDS: int = 300
+    
+    # Exam autosave (write-behind to the session store)
+    AUTOSAVE_FLUSH_SECONDS: int = 5
+    AUTOSAVE_MAX_PENDING: int = 10000  # flush early once this many sessions have unsaved progress
+    
+    # Score distributions
+    SCORE_STATS_REFRESH_SECONDS: int = 5  # catch up on other workers' submissions at most this often
+    SCORE_STATS_REBUILD_SECONDS: int = 3600  # full rebuild, drops deactivated scores
+    SCORE_STATS_ID_OVERLAP: int = 1000  # ids re-read below the watermark, for out-of-order commits
+    SCORE_LEADERBOARD_SIZE: int = 100
+    
+    # Item analytics
+    ITEM_ANALYTICS_ID_OVERLAP: int = 1000  # exam_answers ids re-read below the watermark
+    
+    # Question bank cache
+    QUESTION_CACHE_MAX_TOPICS: int = 256
+    QUESTION_CACHE_TTL_SECONDS: int = 300
+    
+    class Config:
+        env_file = ".env"
+
+settings = Settings()
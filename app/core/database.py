@@ -1,27 +1,189 @@
-"""
-Database connection and session management
-"""
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.config import settings
-
-# SQLite specific configuration
-connect_args = {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-
-# ✅ FINAL FIX: pooler-safe engine (NO search_path)
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args=connect_args,
-    pool_pre_ping=True
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+"""
+Database connection and session management
+"""
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url, Engine, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.config import settings
+
+# -----------------------------
+# Pool instrumentation
+# -----------------------------
+class PoolWaitStats:
+    """Time spent waiting for a pooled connection at checkout"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += waited
+            self.max = max(self.max, waited)
+            if timed_out:
+                self.timeouts += 1
+
+class _TimedCheckoutMixin:
+    # Shared by every pool the engine recreates (e.g. after dispose())
+    wait_stats: PoolWaitStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - started)
+        return connection
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    wait_stats = PoolWaitStats()
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    wait_stats = PoolWaitStats()
+
+def pool_stats(engine: Engine) -> Dict:
+    """Live pool statistics for an engine (sync, or AsyncEngine.sync_engine)"""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow
+        })
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        checkouts = wait_stats.count or 1
+        stats.update({
+            "checkouts": wait_stats.count,
+            "checkout_timeouts": wait_stats.timeouts,
+            "wait_avg_ms": round(wait_stats.total / checkouts * 1000, 3),
+            "wait_max_ms": round(wait_stats.max * 1000, 3)
+        })
+    return stats
+
+# -----------------------------
+# Engine configuration
+# -----------------------------
+def _is_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite"
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return _is_sqlite(url) and url.database in (None, "", ":memory:")
+
+def engine_options(url: URL, pool_class) -> Dict:
+    """Pool settings from app config; in-memory SQLite keeps SQLAlchemy's default pool"""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if _is_sqlite_memory(url):
+        return options
+    options.update({
+        "poolclass": pool_class,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE
+    })
+    return options
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the single writer; NORMAL sync is safe under WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+database_url = make_url(settings.DATABASE_URL)
+
+# SQLite specific configuration
+connect_args = {"check_same_thread": False} if _is_sqlite(database_url) else {}
+
+# ✅ FINAL FIX: pooler-safe engine (NO search_path)
+engine = create_engine(
+    database_url,
+    connect_args=connect_args,
+    **engine_options(database_url, InstrumentedQueuePool)
+)
+
+if _is_sqlite(database_url):
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# -----------------------------
+# Async engine (aiosqlite / asyncpg)
+# -----------------------------
+def get_async_database_url(url: str) -> URL:
+    """
+    Derive the async driver URL from DATABASE_URL
+    sqlite -> sqlite+aiosqlite, postgresql[+psycopg2] -> postgresql+asyncpg
+    """
+    if settings.ASYNC_DATABASE_URL:
+        return make_url(settings.ASYNC_DATABASE_URL)
+
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    if backend in ("postgresql", "postgres"):
+        # asyncpg takes "ssl" rather than libpq's "sslmode"
+        query = dict(url.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return url.set(drivername="postgresql+asyncpg", query=query)
+    return url
+
+async_database_url = get_async_database_url(settings.DATABASE_URL)
+
+def async_connect_args(url: URL) -> Dict:
+    """
+    Behind a transaction-mode pooler consecutive statements may run on different
+    server connections, so statements prepared on one are missing on the next
+    """
+    if settings.DB_TRANSACTION_POOLER and url.get_dialect().driver == "asyncpg":
+        return {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    return {}
+
+async_engine = create_async_engine(
+    async_database_url,
+    connect_args=async_connect_args(async_database_url),
+    **engine_options(async_database_url, InstrumentedAsyncQueuePool)
+)
+
+if _is_sqlite(async_database_url):
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
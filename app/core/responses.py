@@ -0,0 +1,138 @@
+"""
+File download responses with conditional and range request support
+Starlette 0.27's FileResponse has neither, so If-None-Match, Range and
+If-Range are handled here
+"""
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import Request, Response, status
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRangeResponse(FileResponse):
+    """206 response carrying bytes start..end (inclusive) of a file"""
+
+    def __init__(self, path: str, start: int, end: int, size: int, **kwargs):
+        super().__init__(path, status_code=status.HTTP_206_PARTIAL_CONTENT, **kwargs)
+        self.start = start
+        self.length = end - start + 1
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(self.length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" range into inclusive offsets
+    Returns None for anything we do not handle (multiple ranges, other units);
+    raises ValueError when the range cannot be satisfied
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def conditional_file_response(
+    request: Request,
+    path: str,
+    etag: str,
+    filename: str,
+    media_type: str,
+    cache_control: str
+) -> Response:
+    """
+    Serve a file honouring If-None-Match (304), Range / If-Range (206, 416)
+    `etag` must be a quoted strong validator for the file's exact content
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    headers: Dict[str, str] = {
+        "etag": etag,
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "content-range": f"bytes */{size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            return FileRangeResponse(
+                path, start, end, size,
+                headers=headers,
+                media_type=media_type,
+                filename=filename,
+                stat_result=stat_result,
+                method=request.method
+            )
+
+    return FileResponse(
+        path,
+        headers=headers,
+        media_type=media_type,
+        filename=filename,
+        stat_result=stat_result,
+        method=request.method
+    )
@@ -1,105 +1,221 @@
-"""
-Security utilities: password hashing, JWT token generation/validation
-"""
-
-from datetime import datetime, timedelta
-from typing import Optional, Dict
-
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-
-from app.config import settings
-
-
-# -----------------------------
-# Password hashing configuration
-# -----------------------------
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto"
-)
-
-
-def hash_password(password: str) -> str:
-    """
-    Hash a plain password using bcrypt
-    """
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """
-    Verify a plain password against a bcrypt hash
-    """
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except Exception:
-        # Covers invalid/corrupted hashes safely
-        return False
-
-
-# -----------------------------
-# JWT Token Utilities
-# -----------------------------
-def create_access_token(
-    data: Dict,
-    expires_delta: Optional[timedelta] = None
-) -> str:
-    """
-    Create JWT access token
-    """
-    to_encode = data.copy()
-
-    expire = (
-        datetime.utcnow() + expires_delta
-        if expires_delta
-        else datetime.utcnow()
-        + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-
-    to_encode.update({
-        "exp": expire,
-        "type": "access"
-    })
-
-    return jwt.encode(
-        to_encode,
-        settings.SECRET_KEY,
-        algorithm=settings.ALGORITHM
-    )
-
-
-def create_refresh_token(data: Dict) -> str:
-    """
-    Create JWT refresh token
-    """
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(
-        days=settings.REFRESH_TOKEN_EXPIRE_DAYS
-    )
-
-    to_encode.update({
-        "exp": expire,
-        "type": "refresh"
-    })
-
-    return jwt.encode(
-        to_encode,
-        settings.SECRET_KEY,
-        algorithm=settings.ALGORITHM
-    )
-
-
-def decode_token(token: str) -> Optional[Dict]:
-    """
-    Decode and validate JWT token
-    """
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
-        return payload
-    except JWTError:
-        return None
+"""
+Security utilities: password hashing, JWT token generation/validation
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Tuple
+
+from jose import JWTError, jwt
+from passlib.context import CryptContext
+
+from app.config import settings
+
+
+# -----------------------------
+# Password hashing configuration
+# -----------------------------
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto"
+)
+
+
+def hash_password(password: str) -> str:
+    """
+    Hash a plain password using bcrypt
+    """
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a plain password against a bcrypt hash
+    """
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    except Exception:
+        # Covers invalid/corrupted hashes safely
+        return False
+
+
+# -----------------------------
+# Bounded password hashing pool
+# -----------------------------
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503"""
+
+
+def _timed_hash(password: str) -> Tuple[str, float]:
+    started = time.perf_counter()
+    hashed = hash_password(password)
+    return hashed, time.perf_counter() - started
+
+
+def _timed_verify(plain_password: str, hashed_password: str) -> Tuple[bool, float]:
+    started = time.perf_counter()
+    valid = verify_password(plain_password, hashed_password)
+    return valid, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, size-limited executor so async handlers never
+    block the event loop or the shared AnyIO threadpool
+    At most `workers + max_queue` calls may be in flight; beyond that calls
+    fail fast with PasswordHasherBusy instead of queueing indefinitely
+    """
+
+    def __init__(self, workers: int, max_queue: int, use_processes: bool = False):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._hash_time_total = 0.0
+        self._hash_time_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing this module never forks worker processes
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.use_processes:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers,
+                            thread_name_prefix="bcrypt"
+                        )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise PasswordHasherBusy()
+            self._in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, hash_time = await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        queue_wait = max(time.perf_counter() - submitted - hash_time, 0.0)
+        with self._lock:
+            self._completed += 1
+            self._queue_wait_total += queue_wait
+            self._queue_wait_max = max(self._queue_wait_max, queue_wait)
+            self._hash_time_total += hash_time
+            self._hash_time_max = max(self._hash_time_max, hash_time)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_timed_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_timed_verify, plain_password, hashed_password)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "executor": "process" if self.use_processes else "thread",
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(self._queue_wait_total / completed * 1000, 3),
+                "queue_wait_max_ms": round(self._queue_wait_max * 1000, 3),
+                "hash_time_avg_ms": round(self._hash_time_total / completed * 1000, 3),
+                "hash_time_max_ms": round(self._hash_time_max * 1000, 3)
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    use_processes=settings.PASSWORD_HASH_EXECUTOR == "process"
+)
+
+
+# -----------------------------
+# JWT Token Utilities
+# -----------------------------
+def create_access_token(
+    data: Dict,
+    expires_delta: Optional[timedelta] = None
+) -> str:
+    """
+    Create JWT access token
+    """
+    to_encode = data.copy()
+
+    expire = (
+        datetime.utcnow() + expires_delta
+        if expires_delta
+        else datetime.utcnow()
+        + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+    to_encode.update({
+        "exp": expire,
+        "type": "access"
+    })
+
+    return jwt.encode(
+        to_encode,
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+
+
+def create_refresh_token(data: Dict) -> str:
+    """
+    Create JWT refresh token
+    """
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(
+        days=settings.REFRESH_TOKEN_EXPIRE_DAYS
+    )
+
+    to_encode.update({
+        "exp": expire,
+        "type": "refresh"
+    })
+
+    return jwt.encode(
+        to_encode,
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+
+
+def decode_token(token: str) -> Optional[Dict]:
+    """
+    Decode and validate JWT token
+    """
+    try:
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM]
+        )
+        return payload
+    except JWTError:
+        return None
@@ -1,35 +1,61 @@
-"""
-Main FastAPI application entry point
-Handles app initialization, middleware, and route registration
-"""
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, topics, questions, exam, admin, certificate
-from app.core.database import engine, Base
-
-# Create database tables
-# Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Quiz System API", version="1.0.0")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "https://m1v0sc5c-3000.inc1.devtunnels.ms", "https://quiz-frontend-q69i.onrender.com"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Register routes
-app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
-app.include_router(topics.router, prefix="/api/topics", tags=["Topics"])
-app.include_router(questions.router, prefix="/api/questions", tags=["Questions"])
-app.include_router(exam.router, prefix="/api/exam", tags=["Exam"])
-app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
-app.include_router(certificate.router, prefix="/api/certificate", tags=["Certificate"])
-
-@app.get("/")
-def root():
-    return {"message": "Quiz System API is running"}
-
+"""
+Main FastAPI application entry point
+Handles app initialization, middleware, and route registration
+"""
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from app.routes import auth, topics, questions, exam, admin, certificate
+from app.core.database import engine, async_engine, Base
+from app.core.security import password_hasher
+from app.services.autosave import autosave_buffer
+from app.services.certificate_outbox import certificate_outbox
+from app.services.exam_deadlines import exam_deadlines
+from app.services.score_stats import score_stats
+from app.services.smtp_pool import smtp_pool
+from app.services.user_provisioning import provisioning_jobs
+
+# Create database tables
+# Base.metadata.create_all(bind=engine)
+
+app = FastAPI(title="Quiz System API", version="1.0.0")
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000", "https://m1v0sc5c-3000.inc1.devtunnels.ms", "https://quiz-frontend-q69i.onrender.com"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
+)
+
+# Register routes
+app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
+app.include_router(topics.router, prefix="/api/topics", tags=["Topics"])
+app.include_router(questions.router, prefix="/api/questions", tags=["Questions"])
+app.include_router(exam.router, prefix="/api/exam", tags=["Exam"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+app.include_router(certificate.router, prefix="/api/certificate", tags=["Certificate"])
+
+@app.on_event("startup")
+def startup():
+    certificate_outbox.start()
+    score_stats.load()
+    autosave_buffer.start()
+    exam_deadlines.load()
+    exam_deadlines.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    password_hasher.shutdown()
+    provisioning_jobs.shutdown()
+    certificate_outbox.shutdown()
+    exam_deadlines.shutdown()
+    autosave_buffer.shutdown()
+    smtp_pool.close()
+    await async_engine.dispose()
+
+@app.get("/")
+def root():
+    return {"message": "Quiz System API is running"}
+
@@ -1,102 +1,264 @@
-"""
-SQLAlchemy ORM models matching the exact database schema
-"""
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
-from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-from app.core.database import Base
-import uuid
-import json
-
-class Role(Base):
-    __tablename__ = "roles"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
-    name = Column(String(100), nullable=False)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
-    created_by = Column(Integer)
-    updated_at = Column(DateTime)
-    updated_by = Column(Integer)
-    
-    users = relationship("User", back_populates="role")
-
-class User(Base):
-    __tablename__ = "users"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
-    name = Column(String(150), nullable=False)
-    email = Column(String(150), nullable=False, unique=True, index=True)
-    password = Column(Text, nullable=False)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
-    created_by = Column(Integer)
-    updated_at = Column(DateTime)
-    updated_by = Column(Integer)
-    role_id = Column(Integer, ForeignKey("roles.id"))
-    
-    role = relationship("Role", back_populates="users")
-    scores = relationship("UserScore", back_populates="user")
-
-class Topic(Base):
-    __tablename__ = "topics"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
-    name = Column(String(150), nullable=False)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
-    created_by = Column(Integer)
-    updated_at = Column(DateTime)
-    updated_by = Column(Integer)
-    
-    questions = relationship("Question", back_populates="topic")
-    scores = relationship("UserScore", back_populates="topic")
-
-class Question(Base):
-    __tablename__ = "questions"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
-    question_text = Column(Text, nullable=False)
-    options = Column(Text, nullable=False)  # Store as JSON string
-    question_type = Column(String(50), nullable=False)
-    correct_answer = Column(Text, nullable=False)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
-    created_by = Column(Integer)
-    updated_at = Column(DateTime)
-    updated_by = Column(Integer)
-    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
-    
-    @property
-    def options_list(self):
-        """Convert JSON string to list"""
-        return json.loads(self.options) if self.options else []
-    
-    @options_list.setter
-    def options_list(self, value):
-        """Convert list to JSON string"""
-        self.options = json.dumps(value)
-    
-    topic = relationship("Topic", back_populates="questions")
-
-class UserScore(Base):
-    __tablename__ = "user_scores"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
-    score = Column(Integer, nullable=False)
-    certificate_issued = Column(Boolean, default=False)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
-    created_by = Column(Integer)
-    updated_at = Column(DateTime)
-    updated_by = Column(Integer)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
-    
-    user = relationship("User", back_populates="scores")
-    topic = relationship("Topic", back_populates="scores")
+"""
+SQLAlchemy ORM models matching the exact database schema
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Index, JSON, LargeBinary
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
+from app.core.database import Base
+from datetime import datetime
+import uuid
+import json
+
+def validate_options(value) -> list:
+    """Options must be a list of strings"""
+    if not isinstance(value, (list, tuple)) or not all(isinstance(o, str) for o in value):
+        raise ValueError("options must be a list of strings")
+    return list(value)
+
+class OptionList(TypeDecorator):
+    """
+    Question options as a Python list of strings
+    JSONB on Postgres; JSON text elsewhere, validated on write and decoded
+    once when rows are loaded, so callers never see the raw string
+    """
+    impl = Text
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.JSONB())
+        return dialect.type_descriptor(Text())
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        options = validate_options(value)
+        if dialect.name == "postgresql":
+            # JSONB serializes it
+            return options
+        return json.dumps(options)
+    
+    def process_result_value(self, value, dialect):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+class Role(Base):
+    __tablename__ = "roles"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
+    name = Column(String(100), nullable=False)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    created_by = Column(Integer)
+    updated_at = Column(DateTime)
+    updated_by = Column(Integer)
+    
+    users = relationship("User", back_populates="role")
+
+class User(Base):
+    __tablename__ = "users"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
+    name = Column(String(150), nullable=False)
+    email = Column(String(150), nullable=False, unique=True, index=True)
+    password = Column(Text, nullable=False)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    created_by = Column(Integer)
+    updated_at = Column(DateTime)
+    updated_by = Column(Integer)
+    role_id = Column(Integer, ForeignKey("roles.id"))
+    
+    role = relationship("Role", back_populates="users")
+    scores = relationship("UserScore", back_populates="user")
+
+class Topic(Base):
+    __tablename__ = "topics"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
+    name = Column(String(150), nullable=False)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    created_by = Column(Integer)
+    updated_at = Column(DateTime)
+    updated_by = Column(Integer)
+    
+    questions = relationship("Question", back_populates="topic")
+    scores = relationship("UserScore", back_populates="topic")
+
+class Question(Base):
+    __tablename__ = "questions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
+    question_text = Column(Text, nullable=False)
+    options = Column(OptionList, nullable=False)
+    question_type = Column(String(50), nullable=False)
+    correct_answer = Column(Text, nullable=False)
+    category = Column(String(100))  # optional grouping used by exam category quotas
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    created_by = Column(Integer)
+    updated_at = Column(DateTime)
+    updated_by = Column(Integer)
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
+    
+    @property
+    def options_list(self):
+        """Options as a list (kept for older callers; options is already a list)"""
+        return list(self.options or [])
+    
+    @options_list.setter
+    def options_list(self, value):
+        self.options = validate_options(value)
+    
+    topic = relationship("Topic", back_populates="questions")
+    
+    __table_args__ = (
+        # Exam start/submit and the topic list count: active questions of a topic, in id order
+        Index(
+            "ix_questions_topic_active", "topic_id", "id",
+            postgresql_where=is_active == True,
+            sqlite_where=is_active == True
+        ),
+    )
+
+class TopicExamSettings(Base):
+    """
+    Per-topic exam composition
+    Topics without a row serve every active question in bank order
+    """
+    __tablename__ = "topic_exam_settings"
+    
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True)
+    question_count = Column(Integer)  # None = all active questions
+    category_quotas = Column(JSON, nullable=False, default=dict)  # {category: questions drawn from it}
+    shuffle_questions = Column(Boolean, nullable=False, default=True)
+    shuffle_options = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime)
+    updated_by = Column(Integer)
+
+class UserScore(Base):
+    __tablename__ = "user_scores"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    uuid = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
+    score = Column(Integer, nullable=False)
+    total_questions = Column(Integer)  # questions in the exam; NULL for scores saved before it was stored
+    certificate_issued = Column(Boolean, default=False)
+    certificate_key = Column(String(80))  # content-addressed key in certificate storage
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    created_by = Column(Integer)
+    updated_at = Column(DateTime)
+    updated_by = Column(Integer)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
+    
+    user = relationship("User", back_populates="scores")
+    topic = relationship("Topic", back_populates="scores")
+    
+    __table_args__ = (
+        # "Already taken" check on exam start; one active score per user and topic
+        Index(
+            "ix_user_scores_user_topic_active", "user_id", "topic_id",
+            unique=True,
+            postgresql_where=is_active == True,
+            sqlite_where=is_active == True
+        ),
+        # Results listing: newest first, keyset pagination on (created_at, id)
+        Index(
+            "ix_user_scores_active_created", "created_at", "id",
+            postgresql_where=is_active == True,
+            sqlite_where=is_active == True
+        ),
+    )
+
+class ExamAnswers(Base):
+    """
+    Graded answers of one submission, packed: question_ids holds the exam's
+    question ids as little-endian uint32 in ascending order, correct a
+    bitmap (numpy.packbits order) of correct flags in the same order
+    """
+    __tablename__ = "exam_answers"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_score_id = Column(Integer, ForeignKey("user_scores.id", ondelete="CASCADE"), nullable=False, unique=True)
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
+    question_ids = Column(LargeBinary, nullable=False)
+    correct = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        # Item analytics: a topic's submissions in id order
+        Index("ix_exam_answers_topic_id", "topic_id", "id"),
+    )
+
+class StatCounter(Base):
+    """
+    Write-maintained counters for the admin dashboard
+    Each counter is split over a few shard rows so concurrent writers
+    (e.g. the exam submission spike) do not all lock the same row
+    """
+    __tablename__ = "stat_counters"
+    
+    name = Column(String(100), primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    value = Column(Integer, nullable=False, default=0)
+
+class CertificateOutbox(Base):
+    """
+    Certificate emails waiting to be sent
+    Rows are written in the same transaction that sets certificate_issued and
+    are drained by the outbox worker; timestamps are UTC
+    """
+    __tablename__ = "certificate_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_score_id = Column(Integer, ForeignKey("user_scores.id", ondelete="CASCADE"), nullable=False)
+    recipient_email = Column(String(150), nullable=False)
+    recipient_name = Column(String(150), nullable=False)
+    topic_name = Column(String(150), nullable=False)
+    score = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+    grade = Column(String(2), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending | sent | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_by = Column(Integer)
+    sent_at = Column(DateTime)
+    batch_id = Column(String(36))  # set for rows queued by a batch publish job
+    
+    __table_args__ = (
+        Index("ix_certificate_outbox_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_certificate_outbox_batch_id", "batch_id"),
+    )
+
+class ProvisioningJob(Base):
+    """
+    Bulk user import run in the background by the admin endpoint
+    The submitted rows (with plain-text passwords) stay in the worker's
+    memory; status, counts and the per-row report are kept here so any
+    app process can answer a poll. Timestamps are UTC
+    """
+    __tablename__ = "provisioning_jobs"
+    
+    id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | completed | failed
+    total = Column(Integer, nullable=False)
+    created_count = Column(Integer)  # counts and results are set once completed
+    skipped_count = Column(Integer)
+    failed_count = Column(Integer)
+    results = Column(JSON)  # [{row, email, status, error, user_id}, ...]
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_by = Column(Integer)
+    finished_at = Column(DateTime)
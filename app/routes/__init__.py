@@ -1 +1 @@
-# API routes
+# API routes
@@ -1,207 +1,384 @@
-"""
-Admin management routes
-Dashboard stats, user management, results viewing
-"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-from app.core.database import get_db
-from app.auth.dependencies import require_role
-from app.core.security import hash_password
-from app.models.models import User, Role, Topic, UserScore
-from app.schemas.schemas import (
-    DashboardStats, UserCreate, UserResponse, 
-    UserUpdate, UserScoreResponse
-)
-
-router = APIRouter()
-
-@router.get("/dashboard", response_model=DashboardStats)
-def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Get dashboard statistics
-    - Total users
-    - Total admins
-    - Total topics
-    - Total exams taken
-    """
-    # Get role IDs
-    user_role = db.query(Role).filter(Role.name == "User").first()
-    admin_role = db.query(Role).filter(Role.name == "Admin").first()
-    
-    total_users = db.query(User).filter(
-        User.role_id == user_role.id,
-        User.is_active == True
-    ).count() if user_role else 0
-    
-    total_admins = db.query(User).filter(
-        User.role_id == admin_role.id,
-        User.is_active == True
-    ).count() if admin_role else 0
-    
-    total_topics = db.query(Topic).filter(Topic.is_active == True).count()
-    total_exams = db.query(UserScore).filter(UserScore.is_active == True).count()
-    
-    return DashboardStats(
-        total_users=total_users,
-        total_admins=total_admins,
-        total_topics=total_topics,
-        total_exams_taken=total_exams
-    )
-
-@router.get("/users", response_model=List[UserResponse])
-def get_all_users(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Get all users (Admin only)
-    """
-    users = db.query(User).filter(User.is_active == True).all()
-    return users
-
-@router.post("/users", response_model=UserResponse)
-def create_user(
-    request: UserCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Create new user or admin (Admin only)
-    """
-    # Check if email already exists
-    existing_user = db.query(User).filter(User.email == request.email).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    # Create user
-    user = User(
-        name=request.name,
-        email=request.email,
-        password=hash_password(request.password),
-        role_id=request.role_id,
-        created_by=current_user.id
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
-
-@router.put("/users/{user_id}", response_model=UserResponse)
-def update_user(
-    user_id: int,
-    request: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Update user details (Admin only)
-    """
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    if request.name:
-        user.name = request.name
-    if request.email:
-        # Check email uniqueness
-        existing = db.query(User).filter(
-            User.email == request.email,
-            User.id != user_id
-        ).first()
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already in use"
-            )
-        user.email = request.email
-    
-    user.updated_by = current_user.id
-    db.commit()
-    db.refresh(user)
-    return user
-
-@router.delete("/users/{user_id}")
-def deactivate_user(
-    user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Deactivate user (Admin only)
-    """
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    user.is_active = False
-    user.updated_by = current_user.id
-    db.commit()
-    return {"message": "User deactivated successfully"}
-
-@router.get("/results", response_model=List[UserScoreResponse])
-def get_all_results(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Get all exam results with user and topic details
-    """
-    results = db.query(UserScore).filter(UserScore.is_active == True).all()
-    
-    response = []
-    for score in results:
-        response.append(UserScoreResponse(
-            id=score.id,
-            score=score.score,
-            certificate_issued=score.certificate_issued,
-            created_at=score.created_at,
-            user_id=score.user_id,
-            topic_id=score.topic_id,
-            user_name=score.user.name,
-            topic_name=score.topic.name
-        ))
-    
-    return response
-
-@router.get("/results/user/{user_id}", response_model=List[UserScoreResponse])
-def get_user_results(
-    user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Get exam results for specific user
-    """
-    results = db.query(UserScore).filter(
-        UserScore.user_id == user_id,
-        UserScore.is_active == True
-    ).all()
-    
-    response = []
-    for score in results:
-        response.append(UserScoreResponse(
-            id=score.id,
-            score=score.score,
-            certificate_issued=score.certificate_issued,
-            created_at=score.created_at,
-            user_id=score.user_id,
-            topic_id=score.topic_id,
-            user_name=score.user.name,
-            topic_name=score.topic.name
-        ))
-    
-    return response
+"""
+Admin management routes
+Dashboard stats, user management, results viewing
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from app.core.database import get_db, engine, async_engine, pool_stats
+from app.auth.dependencies import require_role
+from app.auth.principal import Principal, principal_cache
+from app.core.security import hash_password, password_hasher
+from app.models.models import User, Role, Question, ProvisioningJob
+from app.schemas.schemas import (
+    DashboardStats, UserCreate, UserResponse, 
+    UserUpdate, UserScoreResponse, BulkUserCreate, BulkUserJobResponse, BulkUserResult,
+    ItemAnalyticsResponse, ItemStatistics
+)
+from app.services.answer_analytics import item_analytics
+from app.services.user_provisioning import get_provisioning_job, provisioning_jobs, ProvisioningBusy
+from app.services.smtp_pool import smtp_pool
+from app.services.autosave import autosave_buffer
+from app.services.exam_deadlines import exam_deadlines
+from app.services.stats_service import (
+    dashboard_cache, counter_update, active_users_counter, ACTIVE_TOPICS, EXAMS_TAKEN
+)
+from app.services.results_service import (
+    results_query, next_cursor, iter_results_export, InvalidCursor
+)
+
+router = APIRouter()
+
+@router.get("/dashboard", response_model=DashboardStats)
+def get_dashboard_stats(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Get dashboard statistics
+    - Total users
+    - Total admins
+    - Total topics
+    - Total exams taken
+    Read from the write-maintained stat_counters (cached for a few seconds)
+    """
+    counters = dashboard_cache.get(db)
+    
+    return DashboardStats(
+        total_users=counters.get(active_users_counter("User"), 0),
+        total_admins=counters.get(active_users_counter("Admin"), 0),
+        total_topics=counters.get(ACTIVE_TOPICS, 0),
+        total_exams_taken=counters.get(EXAMS_TAKEN, 0)
+    )
+
+@router.get("/users", response_model=List[UserResponse])
+def get_all_users(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Get all users (Admin only)
+    """
+    users = db.query(User).filter(User.is_active == True).all()
+    return users
+
+@router.post("/users", response_model=UserResponse)
+def create_user(
+    request: UserCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Create new user or admin (Admin only)
+    """
+    # Check if email already exists
+    existing_user = db.query(User).filter(User.email == request.email).first()
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    
+    # Create user
+    user = User(
+        name=request.name,
+        email=request.email,
+        password=hash_password(request.password),
+        role_id=request.role_id,
+        created_by=current_user.id
+    )
+    db.add(user)
+    role_name = db.query(Role.name).filter(Role.id == request.role_id).scalar()
+    if role_name:
+        db.execute(counter_update(active_users_counter(role_name), 1))
+    db.commit()
+    db.refresh(user)
+    return user
+
+def provisioning_job_response(job: ProvisioningJob) -> BulkUserJobResponse:
+    result = None
+    if job.status == "completed":
+        result = BulkUserResult(
+            created=job.created_count,
+            skipped=job.skipped_count,
+            failed=job.failed_count,
+            results=job.results
+        )
+    return BulkUserJobResponse(
+        job_id=job.id,
+        status=job.status,
+        total=job.total,
+        error=job.error,
+        result=result,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+@router.post("/users/bulk", response_model=BulkUserJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_users_bulk(
+    request: BulkUserCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Provision many users at once (Admin only)
+    Runs as a background job; poll /users/bulk/jobs/{job_id} for the per-row
+    report. Existing or repeated emails are skipped
+    For very large cohorts prefer the provision_users.py CLI
+    """
+    try:
+        job = provisioning_jobs.submit(db, request.users, created_by=current_user.id)
+    except ProvisioningBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many bulk imports in progress, please retry later",
+            headers={"Retry-After": "30"}
+        )
+    return provisioning_job_response(job)
+
+@router.get("/users/bulk/jobs/{job_id}", response_model=BulkUserJobResponse)
+def get_bulk_user_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Status of a bulk user import; includes the report once completed
+    """
+    job = get_provisioning_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return provisioning_job_response(job)
+
+@router.put("/users/{user_id}", response_model=UserResponse)
+def update_user(
+    user_id: int,
+    request: UserUpdate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Update user details (Admin only)
+    """
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    if request.name:
+        user.name = request.name
+    if request.email:
+        # Check email uniqueness
+        existing = db.query(User).filter(
+            User.email == request.email,
+            User.id != user_id
+        ).first()
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already in use"
+            )
+        user.email = request.email
+    
+    user.updated_by = current_user.id
+    db.commit()
+    principal_cache.invalidate(user_id)
+    db.refresh(user)
+    return user
+
+@router.delete("/users/{user_id}")
+def deactivate_user(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Deactivate user (Admin only)
+    """
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    if user.is_active and user.role:
+        db.execute(counter_update(active_users_counter(user.role.name), -1))
+    user.is_active = False
+    user.updated_by = current_user.id
+    db.commit()
+    principal_cache.invalidate(user_id)
+    return {"message": "User deactivated successfully"}
+
+@router.get("/results", response_model=List[UserScoreResponse])
+def get_all_results(
+    response: Response,
+    topic_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    certificate_issued: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Get exam results with user and topic details, newest first
+    Paginated: pass the X-Next-Cursor response header back as `cursor`
+    """
+    return fetch_results_page(
+        db, response, limit, cursor,
+        topic_id=topic_id,
+        date_from=date_from,
+        date_to=date_to,
+        certificate_issued=certificate_issued
+    )
+
+@router.get("/results/export")
+def export_results(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    user_id: Optional[int] = None,
+    topic_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    certificate_issued: Optional[bool] = None,
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Stream all matching exam results as CSV or NDJSON (optionally gzipped)
+    Memory use is constant regardless of the number of results
+    """
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"results.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        iter_results_export(
+            export_format=format,
+            compress=gzip,
+            user_id=user_id,
+            topic_id=topic_id,
+            date_from=date_from,
+            date_to=date_to,
+            certificate_issued=certificate_issued
+        ),
+        media_type=media_type,
+        headers=headers
+    )
+
+@router.get("/results/user/{user_id}", response_model=List[UserScoreResponse])
+def get_user_results(
+    user_id: int,
+    response: Response,
+    topic_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    certificate_issued: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Get exam results for specific user, newest first
+    Paginated like /results
+    """
+    return fetch_results_page(
+        db, response, limit, cursor,
+        user_id=user_id,
+        topic_id=topic_id,
+        date_from=date_from,
+        date_to=date_to,
+        certificate_issued=certificate_issued
+    )
+
+@router.get("/analytics/topics/{topic_id}/questions", response_model=ItemAnalyticsResponse)
+def get_item_analytics(
+    topic_id: int,
+    min_attempts: int = Query(1, ge=1),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Per-question statistics for a topic, from the stored graded answers
+    - correct_rate: share of attempts answered correctly (difficulty)
+    - discrimination: point-biserial correlation between answering the
+      question correctly and the score on the rest of the exam; low or
+      negative values flag questions that do not separate strong and weak students
+    Cached; each request only reads submissions made since the previous one
+    """
+    submissions, items = item_analytics.items(db, topic_id)
+    items = [item for item in items if item["attempts"] >= min_attempts]
+    
+    questions = {}
+    if items:
+        questions = {
+            row.id: row for row in db.query(
+                Question.id, Question.question_text, Question.is_active
+            ).filter(Question.id.in_([item["question_id"] for item in items]))
+        }
+    
+    return ItemAnalyticsResponse(
+        topic_id=topic_id,
+        submissions=submissions,
+        items=[
+            ItemStatistics(
+                **item,
+                question_text=getattr(questions.get(item["question_id"]), "question_text", None),
+                is_active=getattr(questions.get(item["question_id"]), "is_active", None)
+            ) for item in items
+        ]
+    )
+
+def fetch_results_page(db: Session, response: Response, limit: int, cursor: Optional[str], **filters):
+    """
+    Run the joined results query for one page
+    Sets X-Next-Cursor when more rows follow
+    """
+    try:
+        stmt = results_query(cursor=cursor, limit=limit, **filters)
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    rows = db.execute(stmt).mappings().all()
+    
+    cursor_after = next_cursor(rows, limit)
+    if cursor_after:
+        response.headers["X-Next-Cursor"] = cursor_after
+    return rows
+
+@router.get("/metrics")
+def get_metrics(
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Runtime metrics for capacity planning
+    - Password hashing pool: queue wait vs hash time, rejections
+    - Database pools: checked out, overflow, checkout wait time
+    - SMTP pool: connections opened vs messages sent, reconnects
+    - Exam autosave: autosaves received vs session store writes
+    - Exam deadlines: sessions tracked, auto-submitted at the deadline
+    """
+    return {
+        "password_hashing": password_hasher.stats(),
+        "db_pool": {
+            "sync": pool_stats(engine),
+            "async": pool_stats(async_engine.sync_engine)
+        },
+        "smtp": smtp_pool.stats(),
+        "autosave": autosave_buffer.stats(),
+        "exam_deadlines": exam_deadlines.stats()
+    }
@@ -1,41 +1,66 @@
-"""
-Authentication routes: login, token refresh
-"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import verify_password, create_access_token, create_refresh_token
-from app.schemas.schemas import LoginRequest, TokenResponse
-from app.models.models import User
-
-router = APIRouter()
-
-@router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
-    """
-    User/Admin login endpoint
-    Validates credentials and returns JWT tokens with role information
-    """
-    # Find user by email
-    user = db.query(User).filter(User.email == request.email, User.is_active == True).first()
-    
-    print(user)
-    
-    if not user or not verify_password(request.password, user.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid email or password"
-        )
-    
-    # Create tokens
-    token_data = {"sub": str(user.id), "role": user.role.name}
-    access_token = create_access_token(token_data)
-    refresh_token = create_refresh_token(token_data)
-    
-    return TokenResponse(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        role=user.role.name,
-        user_id=user.id,
-        name=user.name
-    )
+"""
+Authentication routes: login, token refresh
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.security import (
+    password_hasher, PasswordHasherBusy, create_access_token, create_refresh_token
+)
+from app.schemas.schemas import LoginRequest, TokenResponse
+from app.models.models import User, Role
+
+router = APIRouter()
+
+async def find_login_user(db: AsyncSession, email: str):
+    """Load the columns login needs for an active user, role included"""
+    result = await db.execute(
+        select(
+            User.id, User.name, User.password, Role.name.label("role_name")
+        ).outerjoin(
+            Role, Role.id == User.role_id
+        ).where(
+            User.email == email,
+            User.is_active == True
+        )
+    )
+    return result.first()
+
+@router.post("/login", response_model=TokenResponse)
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    User/Admin login endpoint
+    Validates credentials and returns JWT tokens with role information
+    bcrypt runs on the bounded password hashing pool; returns 503 when it is saturated
+    """
+    # Find user by email
+    user = await find_login_user(db, request.email)
+    
+    try:
+        valid = user is not None and await password_hasher.verify(request.password, user.password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry",
+            headers={"Retry-After": "1"}
+        )
+    
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password"
+        )
+    
+    # Create tokens
+    token_data = {"sub": str(user.id), "role": user.role_name, "name": user.name}
+    access_token = create_access_token(token_data)
+    refresh_token = create_refresh_token(token_data)
+    
+    return TokenResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        role=user.role_name,
+        user_id=user.id,
+        name=user.name
+    )
@@ -1,91 +1,283 @@
-"""
-Certificate generation and email delivery
-"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.auth.dependencies import require_role
-from app.models.models import User, UserScore
-from app.schemas.schemas import CertificateRequest
-from app.services.certificate_service import generate_certificate_pdf
-from app.services.email_service import send_certificate_email
-
-router = APIRouter()
-
-@router.post("/publish")
-def publish_certificate(
-    request: CertificateRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Generate and email certificate to user
-    Updates certificate_issued flag
-    """
-    # Get user score record
-    user_score = db.query(UserScore).filter(
-        UserScore.id == request.user_score_id,
-        UserScore.is_active == True
-    ).first()
-    
-    if not user_score:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Score record not found"
-        )
-    
-    if user_score.certificate_issued:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Certificate already issued"
-        )
-    
-    # Get user and topic details
-    user = user_score.user
-    topic = user_score.topic
-    
-    # Calculate grade
-    # Assuming questions count from topic
-    from app.models.models import Question
-    total_questions = db.query(Question).filter(
-        Question.topic_id == topic.id,
-        Question.is_active == True
-    ).count()
-    
-    percentage = (user_score.score / total_questions * 100) if total_questions > 0 else 0
-    
-    if percentage >= 90:
-        grade = "A"
-    elif percentage >= 75:
-        grade = "B"
-    elif percentage >= 60:
-        grade = "C"
-    else:
-        grade = "D"
-    
-    # Generate PDF certificate
-    pdf_path = generate_certificate_pdf(
-        user_name=user.name,
-        topic_name=topic.name,
-        score=user_score.score,
-        total=total_questions,
-        grade=grade
-    )
-    
-    # Send email
-    send_certificate_email(
-        recipient_email=user.email,
-        recipient_name=user.name,
-        topic_name=topic.name,
-        pdf_path=pdf_path
-    )
-    
-    # Update certificate_issued flag
-    user_score.certificate_issued = True
-    user_score.updated_by = current_user.id
-    db.commit()
-    
-    return {
-        "message": "Certificate generated and sent successfully",
-        "user_email": user.email
-    }
+"""
+Certificate generation and email delivery
+"""
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import RedirectResponse
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.database import get_db
+from app.core.responses import conditional_file_response
+from app.auth.dependencies import get_current_user, require_role
+from app.auth.principal import Principal
+from app.models.models import CertificateOutbox, Question, UserScore
+from app.schemas.schemas import (
+    CertificateRequest, CertificateBatchRequest, CertificateJobResponse,
+    CertificateQueuedResponse, CertificateOutboxResponse
+)
+from app.services.certificate_service import calculate_grade
+from app.services.certificate_jobs import (
+    find_certificate_targets, get_certificate_batch, publish_certificates, CertificateBatch
+)
+from app.services.certificate_outbox import certificate_outbox, enqueue_certificate
+from app.services.certificate_storage import certificate_storage, key_digest
+
+router = APIRouter()
+
+@router.post("/publish", response_model=CertificateQueuedResponse, status_code=status.HTTP_202_ACCEPTED)
+def publish_certificate(
+    request: CertificateRequest,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Queue the certificate email for a user
+    Sets the certificate_issued flag and writes the outbox row in one
+    transaction; the outbox worker renders and sends the email
+    """
+    # Get user score record
+    user_score = db.query(UserScore).filter(
+        UserScore.id == request.user_score_id,
+        UserScore.is_active == True
+    ).first()
+    
+    if not user_score:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Score record not found"
+        )
+    
+    if user_score.certificate_issued:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Certificate already issued"
+        )
+    
+    # Calculate grade against the exam's own question count; scores saved
+    # before it was stored fall back to the topic's active questions
+    total_questions = user_score.total_questions
+    if total_questions is None:
+        total_questions = db.query(Question).filter(
+            Question.topic_id == user_score.topic_id,
+            Question.is_active == True
+        ).count()
+    
+    grade = calculate_grade(user_score.score, total_questions)
+    
+    # Claim the certificate; a concurrent publish or batch job may have taken it
+    claimed = db.execute(
+        update(UserScore).where(
+            UserScore.id == user_score.id,
+            UserScore.certificate_issued != True
+        ).values(certificate_issued=True, updated_by=current_user.id)
+    ).rowcount
+    if not claimed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Certificate already issued"
+        )
+    
+    entry = enqueue_certificate(db, user_score, total_questions, grade, issued_by=current_user.id)
+    db.commit()
+    certificate_outbox.notify()
+    
+    return CertificateQueuedResponse(
+        message="Certificate queued for delivery",
+        user_email=entry.recipient_email,
+        outbox_id=entry.id
+    )
+
+@router.get("/outbox", response_model=List[CertificateOutboxResponse])
+def list_certificate_outbox(
+    status_filter: Optional[str] = Query("dead", alias="status", pattern="^(pending|sent|dead)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Certificate emails by delivery status, newest first (dead letters by default)
+    """
+    return db.query(CertificateOutbox).filter(
+        CertificateOutbox.status == status_filter
+    ).order_by(CertificateOutbox.id.desc()).limit(limit).all()
+
+@router.post("/outbox/{outbox_id}/retry", response_model=CertificateOutboxResponse)
+def retry_certificate_email(
+    outbox_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Put a dead-lettered certificate email back in the queue
+    """
+    entry = db.query(CertificateOutbox).filter(CertificateOutbox.id == outbox_id).first()
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Outbox entry not found"
+        )
+    if entry.status != "dead":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only dead-lettered emails can be retried"
+        )
+    
+    # Dead-lettering cleared certificate_issued; claim it again
+    claimed = db.execute(
+        update(UserScore).where(
+            UserScore.id == entry.user_score_id,
+            UserScore.certificate_issued != True
+        ).values(certificate_issued=True, updated_by=current_user.id)
+    ).rowcount
+    if not claimed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Certificate already issued"
+        )
+    
+    entry.status = "pending"
+    entry.attempts = 0
+    entry.next_attempt_at = datetime.utcnow()
+    entry.last_error = None
+    db.commit()
+    certificate_outbox.notify()
+    
+    db.refresh(entry)
+    return entry
+
+def job_response(job: CertificateBatch) -> CertificateJobResponse:
+    return CertificateJobResponse(
+        job_id=job.id,
+        status=job.status,
+        total=job.total,
+        pending=job.pending,
+        sent=job.sent,
+        failed=job.failed,
+        errors=list(job.errors),
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+@router.post("/publish/batch", response_model=CertificateJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def publish_certificates_batch(
+    request: CertificateBatchRequest,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Queue certificates for many scores at once
+    - Either a list of user_score_ids, or a topic_id with an optional min_score
+    - Already issued certificates are skipped
+    - Claims the scores and writes their outbox rows in one transaction;
+      the outbox worker renders and sends the emails
+    Returns the job; poll /jobs/{job_id} for progress. When every certificate
+    is already issued, answers 200 with total 0 and no job_id
+    """
+    if request.user_score_ids is None and request.topic_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide user_score_ids or topic_id"
+        )
+    
+    targets = find_certificate_targets(
+        db,
+        user_score_ids=request.user_score_ids,
+        topic_id=request.topic_id,
+        min_score=request.min_score
+    )
+    job = publish_certificates(db, targets, issued_by=current_user.id)
+    if job is None:
+        response.status_code = status.HTTP_200_OK
+        now = datetime.utcnow()
+        return CertificateJobResponse(
+            status="completed",
+            total=0,
+            pending=0,
+            sent=0,
+            failed=0,
+            errors=[],
+            created_at=now,
+            finished_at=now
+        )
+    certificate_outbox.notify()
+    return job_response(job)
+
+@router.get("/jobs/{job_id}", response_model=CertificateJobResponse)
+def get_certificate_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Progress of a batch certificate job
+    """
+    job = get_certificate_batch(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job_response(job)
+
+@router.get("/{user_score_id}/download")
+def download_certificate(
+    user_score_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Download an issued certificate from storage (no re-render)
+    - Available once the certificate is stored, whether or not its email was delivered
+    - Available to the certificate's owner and to admins
+    - Local storage: served from disk with ETag, Range and If-None-Match support
+    - Object storage: redirects to a short-lived presigned URL
+    """
+    row = db.execute(
+        select(UserScore.user_id, UserScore.certificate_issued, UserScore.certificate_key).where(
+            UserScore.id == user_score_id,
+            UserScore.is_active == True
+        )
+    ).first()
+    
+    if not row or not (row.certificate_issued or row.certificate_key):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Certificate not found"
+        )
+    
+    if row.user_id != current_user.id and current_user.role_name != "Admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to download this certificate"
+        )
+    
+    if not row.certificate_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Certificate is still being generated"
+        )
+    
+    url = certificate_storage.download_url(row.certificate_key, settings.CERTIFICATE_DOWNLOAD_URL_TTL_SECONDS)
+    if url:
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    
+    path = certificate_storage.local_path(row.certificate_key)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Certificate file missing from storage"
+        )
+    
+    # Keys are content hashes, so the digest is a strong validator
+    return conditional_file_response(
+        request,
+        path,
+        etag=f'"{key_digest(row.certificate_key)}"',
+        filename="certificate.pdf",
+        media_type="application/pdf",
+        cache_control="private, no-cache"
+    )
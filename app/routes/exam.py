@@ -1,159 +1,306 @@
-"""
-Exam flow routes: start exam, submit answers
-Handles malpractice detection and score calculation
-"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-import uuid
-import json
-from app.core.database import get_db
-from app.auth.dependencies import get_current_user, require_role
-from app.models.models import User, Topic, Question, UserScore
-from app.schemas.schemas import (
-    ExamStartRequest, ExamStartResponse, ExamSubmitRequest, 
-    ExamSubmitResponse, QuestionResponse
-)
-from app.config import settings
-
-router = APIRouter()
-
-# In-memory store for active exam sessions (use Redis in production)
-active_exams = {}
-
-@router.post("/start", response_model=ExamStartResponse)
-def start_exam(
-    request: ExamStartRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["User"]))
-):
-    """
-    Start exam for a topic
-    - Checks if user already completed this topic
-    - Fetches all active questions
-    - Creates exam session
-    """
-    # Check if user already took this exam
-    existing_score = db.query(UserScore).filter(
-        UserScore.user_id == current_user.id,
-        UserScore.topic_id == request.topic_id,
-        UserScore.is_active == True
-    ).first()
-    
-    if existing_score:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You have already completed this exam"
-        )
-    
-    # Get topic
-    topic = db.query(Topic).filter(
-        Topic.id == request.topic_id,
-        Topic.is_active == True
-    ).first()
-    
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-    
-    # Get all questions for this topic
-    questions = db.query(Question).filter(
-        Question.topic_id == request.topic_id,
-        Question.is_active == True
-    ).all()
-    
-    if not questions:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No questions available for this topic"
-        )
-    
-    # Create exam session
-    exam_session_id = str(uuid.uuid4())
-    active_exams[exam_session_id] = {
-        "user_id": current_user.id,
-        "topic_id": request.topic_id,
-        "questions": {q.id: q.correct_answer for q in questions}
-    }
-    
-    # Return questions without correct answers
-    question_responses = [
-        QuestionResponse(
-            id=q.id,
-            uuid=q.uuid,
-            question_text=q.question_text,
-            options=json.loads(q.options) if isinstance(q.options, str) else q.options,
-            question_type=q.question_type
-        ) for q in questions
-    ]
-    
-    return ExamStartResponse(
-        exam_session_id=exam_session_id,
-        questions=question_responses,
-        duration_minutes=settings.EXAM_DURATION_MINUTES,
-        total_questions=len(questions)
-    )
-
-@router.post("/submit", response_model=ExamSubmitResponse)
-def submit_exam(
-    request: ExamSubmitRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["User"]))
-):
-    """
-    Submit exam answers
-    - Validates answers
-    - Detects malpractice (tab switches)
-    - Calculates score
-    - Saves to database
-    """
-    # Check malpractice
-    malpractice_detected = request.tab_switch_count >= settings.MAX_TAB_SWITCHES
-    
-    # Get questions for this topic
-    questions = db.query(Question).filter(
-        Question.topic_id == request.topic_id,
-        Question.is_active == True
-    ).all()
-    
-    if not questions:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No questions found for this topic"
-        )
-    
-    # Calculate score
-    correct_answers = {q.id: q.correct_answer for q in questions}
-    score = 0
-    
-    for answer in request.answers:
-        if answer.question_id in correct_answers:
-            if answer.selected_answer == correct_answers[answer.question_id]:
-                score += 1
-    
-    # Save score to database
-    user_score = UserScore(
-        user_id=current_user.id,
-        topic_id=request.topic_id,
-        score=score,
-        created_by=current_user.id
-    )
-    db.add(user_score)
-    db.commit()
-    
-    total_questions = len(questions)
-    percentage = (score / total_questions * 100) if total_questions > 0 else 0
-    
-    message = "Quiz completed. Certificate will be emailed shortly."
-    if malpractice_detected:
-        message = "Exam auto-submitted due to malpractice detection. Certificate will be emailed shortly."
-    
-    return ExamSubmitResponse(
-        score=score,
-        total_questions=total_questions,
-        percentage=round(percentage, 2),
-        malpractice_detected=malpractice_detected,
-        message=message
-    )
+"""
+Exam flow routes: start exam, autosave / restore progress, submit answers
+Handles malpractice detection, deadline enforcement and score calculation
+"""
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+import time
+import uuid
+from app.core.database import get_async_db
+from app.auth.dependencies import get_current_user, require_role
+from app.auth.principal import Principal
+from app.models.models import Topic, UserScore
+from app.schemas.schemas import (
+    ExamStartRequest, ExamStartResponse, ExamSubmitRequest, 
+    ExamSubmitResponse, ExamProgressRequest, ExamProgressResponse
+)
+from app.services.autosave import autosave_buffer
+from app.services.exam_deadlines import exam_deadlines
+from app.services.exam_service import (
+    ExamAlreadyCompleted, ExamPlan, finalize_session, new_seed, session_deadline, submit_cutoff
+)
+from app.services.question_cache import question_cache, dump_json, TopicQuestionBank
+from app.services.session_store import restore_session, session_store, session_ttl_seconds
+from app.services.score_stats import score_stats
+from app.config import settings
+
+router = APIRouter()
+
+async def run_store(fn, *args):
+    """
+    Call a session store (or autosave buffer) function from an async handler
+    The redis / sqlite backends block on I/O, so they run in the threadpool
+    """
+    if not session_store.blocking:
+        return fn(*args)
+    return await run_in_threadpool(fn, *args)
+
+def render_exam_start(bank: TopicQuestionBank, plan: ExamPlan, exam_session_id: str) -> bytes:
+    """
+    Build the ExamStartResponse JSON body from the topic's pre-rendered
+    questions; only the session id and counters are formatted per request
+    """
+    return b"".join((
+        b'{"exam_session_id":"', exam_session_id.encode("ascii"),
+        b'","questions":', plan.render_questions(bank),
+        b',"duration_minutes":', str(settings.EXAM_DURATION_MINUTES).encode("ascii"),
+        b',"total_questions":', str(len(plan)).encode("ascii"),
+        b"}"
+    ))
+
+def render_exam_progress(bank: TopicQuestionBank, exam_session_id: str, session: dict, progress: dict) -> bytes:
+    """Build the ExamProgressResponse JSON body around the re-rendered questions"""
+    plan = ExamPlan.from_session(session)
+    deadline = session_deadline(session)
+    return b"".join((
+        b'{"exam_session_id":', dump_json(exam_session_id),
+        b',"topic_id":', dump_json(session["topic_id"]),
+        b',"questions":', plan.render_questions(bank),
+        b',"answers":', dump_json([
+            {"question_id": question_id, "selected_answer": answer}
+            for question_id, answer in progress.get("answers", [])
+        ]),
+        b',"tab_switch_count":', dump_json(progress.get("tab_switch_count", 0)),
+        b',"remaining_seconds":', dump_json(max(0, int(deadline - time.time()))),
+        b',"duration_minutes":', dump_json(settings.EXAM_DURATION_MINUTES),
+        b',"total_questions":', dump_json(len(plan)),
+        b"}"
+    ))
+
+@router.post("/start", response_model=ExamStartResponse)
+async def start_exam(
+    request: ExamStartRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role(["User"]))
+):
+    """
+    Start exam for a topic
+    - Checks if user already completed this topic
+    - Returns the user's live session for the topic if there is one, so
+      starting again neither resets the clock nor draws new questions
+    - Samples the exam's questions per the topic's exam settings
+    - Creates exam session and schedules its auto-submit at the deadline
+    """
+    # Check if user already took this exam
+    existing_score = await db.scalar(
+        select(UserScore.id).where(
+            UserScore.user_id == current_user.id,
+            UserScore.topic_id == request.topic_id,
+            UserScore.is_active == True
+        ).limit(1)
+    )
+    
+    if existing_score:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already completed this exam"
+        )
+    
+    # Get topic
+    topic = await db.scalar(
+        select(Topic.id).where(
+            Topic.id == request.topic_id,
+            Topic.is_active == True
+        )
+    )
+    
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+    
+    # Get the topic's question bank
+    bank = await question_cache.load_async(db, request.topic_id)
+    
+    if not bank.questions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No questions available for this topic"
+        )
+    
+    # Resume the live session of this exam, if any
+    existing = await run_store(session_store.find, current_user.id, request.topic_id)
+    if existing:
+        exam_session_id, session = existing
+        if time.time() >= session_deadline(session):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Exam time is up; your answers are being submitted"
+            )
+        return Response(
+            content=render_exam_start(bank, ExamPlan.from_session(session), exam_session_id),
+            media_type="application/json"
+        )
+    
+    # Sample the questions; the session keeps only their ids and the seed
+    plan = ExamPlan.sample(bank, new_seed())
+    exam_session_id = str(uuid.uuid4())
+    ttl_seconds = session_ttl_seconds()
+    now = time.time()
+    session = {
+        "user_id": current_user.id,
+        "topic_id": request.topic_id,
+        "deadline": now + settings.EXAM_DURATION_MINUTES * 60,
+        "expires_at": now + ttl_seconds,
+        **plan.to_session()
+    }
+    await run_store(session_store.create, exam_session_id, session, ttl_seconds)
+    exam_deadlines.track(exam_session_id, session)
+    
+    # Return questions without correct answers (pre-serialized per topic)
+    return Response(
+        content=render_exam_start(bank, plan, exam_session_id),
+        media_type="application/json"
+    )
+
+@router.put("/{exam_session_id}/progress", status_code=status.HTTP_204_NO_CONTENT)
+async def autosave_progress(
+    exam_session_id: str,
+    request: ExamProgressRequest,
+    current_user: Principal = Depends(require_role(["User"]))
+):
+    """
+    Autosave the answers given so far
+    Send the full current state on every change; only the latest one is kept.
+    Saves are buffered in memory and written to the session store every few seconds.
+    Refused once the submit cutoff (deadline + grace period) has passed
+    """
+    owner = await run_store(autosave_buffer.owner, exam_session_id)
+    
+    if not owner or owner.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam session not found or expired"
+        )
+    
+    autosave_buffer.save(
+        exam_session_id,
+        owner,
+        ((answer.question_id, answer.selected_answer) for answer in request.answers),
+        request.tab_switch_count
+    )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/{exam_session_id}/progress", response_model=ExamProgressResponse)
+async def restore_progress(
+    exam_session_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role(["User"]))
+):
+    """
+    Restore an exam in progress (e.g. after a browser crash)
+    Returns the session's questions in their original order with the last
+    autosaved answers and the time left
+    """
+    session = await run_store(session_store.get, exam_session_id)
+    
+    if not session or session["user_id"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam session not found or expired"
+        )
+    
+    progress = await run_store(autosave_buffer.progress, exam_session_id, session) or {}
+    bank = await question_cache.load_async(db, session["topic_id"])
+    return Response(
+        content=render_exam_progress(bank, exam_session_id, session, progress),
+        media_type="application/json"
+    )
+
+@router.post("/submit", response_model=ExamSubmitResponse)
+async def submit_exam(
+    request: ExamSubmitRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role(["User"]))
+):
+    """
+    Submit exam answers
+    - Validates the exam session
+    - Past the cutoff (deadline + grace period) the submitted answers are
+      ignored and the last autosave is graded instead, as the deadline
+      scheduler would
+    - Detects malpractice (tab switches)
+    - Calculates score against the session's questions
+    - Saves the score and the graded answers
+    """
+    # Claim the session; popping it makes a second submit of the same session fail
+    session = await run_store(session_store.delete, request.exam_session_id)
+    
+    if session and session["user_id"] != current_user.id:
+        await run_store(restore_session, request.exam_session_id, session)
+        session = None
+    
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam session not found or expired"
+        )
+    
+    if request.topic_id is not None and request.topic_id != session["topic_id"]:
+        await run_store(restore_session, request.exam_session_id, session)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Exam session does not belong to this topic"
+        )
+    
+    # Enforce the deadline: too late for these answers, grade the last autosave
+    timed_out = time.time() > submit_cutoff(session)
+    if timed_out:
+        progress = autosave_buffer.take(request.exam_session_id, session)
+        answers = progress.get("answers", [])
+        tab_switch_count = progress.get("tab_switch_count", 0)
+    else:
+        answers = [(answer.question_id, answer.selected_answer) for answer in request.answers]
+        tab_switch_count = request.tab_switch_count
+    
+    # Check malpractice
+    malpractice_detected = tab_switch_count >= settings.MAX_TAB_SWITCHES
+    
+    # Calculate score; save it with the packed answers in one transaction
+    try:
+        user_score, answer_key, correct = await db.run_sync(finalize_session, session, answers)
+        await db.commit()
+    except ExamAlreadyCompleted:
+        # Another session of this exam was graded first; this one is dropped
+        await db.rollback()
+        exam_deadlines.cancel(request.exam_session_id)
+        autosave_buffer.discard(request.exam_session_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already completed this exam"
+        )
+    except Exception:
+        # Give the session back so the student can retry the submit
+        if timed_out:
+            session["progress"] = progress
+        await run_store(restore_session, request.exam_session_id, session)
+        raise
+    score = sum(correct)
+    
+    # The session is final; drop its deadline and any autosave still buffered
+    exam_deadlines.cancel(request.exam_session_id)
+    autosave_buffer.discard(request.exam_session_id)
+    score_stats.record(user_score.id, user_score.topic_id, current_user.id, current_user.name, score)
+    percentile, _ = score_stats.percentile(user_score.topic_id, score)
+    
+    total_questions = len(answer_key)
+    percentage = (score / total_questions * 100) if total_questions > 0 else 0
+    
+    message = "Quiz completed. Certificate will be emailed shortly."
+    if timed_out:
+        message = "Time is up; your last autosaved answers were graded. Certificate will be emailed shortly."
+    elif malpractice_detected:
+        message = "Exam auto-submitted due to malpractice detection. Certificate will be emailed shortly."
+    
+    return ExamSubmitResponse(
+        score=score,
+        total_questions=total_questions,
+        percentage=round(percentage, 2),
+        malpractice_detected=malpractice_detected,
+        message=message,
+        percentile=percentile
+    )
@@ -1,50 +1,85 @@
-"""
-Question management routes (Admin only)
-"""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
-from app.auth.dependencies import require_role
-from app.models.models import User, Question
-from app.schemas.schemas import QuestionCreate, QuestionAdmin
-
-router = APIRouter()
-
-@router.post("/", response_model=QuestionAdmin)
-def create_question(
-    request: QuestionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Create new question (Admin only)
-    """
-    import json
-    question = Question(
-        question_text=request.question_text,
-        options = "{" + ",".join(f'"{o}"' for o in request.options) + "}",  # Convert list to JSON string
-        question_type=request.question_type,
-        correct_answer=request.correct_answer,
-        topic_id=request.topic_id,
-        created_by=current_user.id
-    )
-    db.add(question)
-    db.commit()
-    db.refresh(question)
-    return question
-
-@router.get("/topic/{topic_id}", response_model=List[QuestionAdmin])
-def get_questions_by_topic(
-    topic_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Get all questions for a topic (Admin only)
-    """
-    questions = db.query(Question).filter(
-        Question.topic_id == topic_id,
-        Question.is_active == True
-    ).all()
-    return questions
+"""
+Question management routes (Admin only)
+"""
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import codecs
+import csv
+from app.core.database import get_db
+from app.auth.dependencies import require_role
+from app.auth.principal import Principal
+from app.models.models import Question
+from app.schemas.schemas import QuestionCreate, QuestionAdmin, QuestionImportResult
+from app.services.question_cache import question_cache
+from app.services.question_import import import_questions
+
+router = APIRouter()
+
+@router.post("/", response_model=QuestionAdmin)
+def create_question(
+    request: QuestionCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Create new question (Admin only)
+    """
+    question = Question(
+        question_text=request.question_text,
+        options=request.options,
+        question_type=request.question_type,
+        correct_answer=request.correct_answer,
+        topic_id=request.topic_id,
+        category=request.category,
+        created_by=current_user.id
+    )
+    db.add(question)
+    db.commit()
+    question_cache.invalidate(question.topic_id)
+    db.refresh(question)
+    return question
+
+@router.post("/import", response_model=QuestionImportResult)
+def import_questions_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(jsonl|csv)$"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Bulk import questions from a JSON Lines or CSV file (Admin only)
+    Each row needs question_text, options, question_type, correct_answer, topic_id
+    and may set category; CSV options are a JSON array or "|"-separated
+    Valid rows are inserted in one transaction; invalid rows are reported by line
+    """
+    file_format = format
+    if file_format is None:
+        filename = (file.filename or "").lower()
+        file_format = "csv" if filename.endswith(".csv") else "jsonl"
+    
+    # Decode the upload incrementally instead of reading it into memory
+    stream = codecs.getreader("utf-8-sig")(file.file)
+    try:
+        return import_questions(db, stream, file_format, created_by=current_user.id)
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not read import file: {e}"
+        )
+
+@router.get("/topic/{topic_id}", response_model=List[QuestionAdmin])
+def get_questions_by_topic(
+    topic_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Get all questions for a topic (Admin only)
+    """
+    questions = db.query(Question).filter(
+        Question.topic_id == topic_id,
+        Question.is_active == True
+    ).all()
+    return questions
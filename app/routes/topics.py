@@ -1,54 +1,209 @@
-"""
-Topic management routes
-"""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-from app.core.database import get_db
-from app.auth.dependencies import get_current_user, require_role
-from app.models.models import User, Topic, Question
-from app.schemas.schemas import TopicResponse, TopicCreate
-
-router = APIRouter()
-
-@router.get("/", response_model=List[TopicResponse])
-def get_topics(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """
-    Get all active topics with question count
-    Available to all authenticated users
-    """
-    topics = db.query(
-        Topic,
-        func.count(Question.id).label("question_count")
-    ).outerjoin(
-        Question, (Question.topic_id == Topic.id) & (Question.is_active == True)
-    ).filter(
-        Topic.is_active == True
-    ).group_by(Topic.id).all()
-    
-    result = []
-    for topic, count in topics:
-        topic_dict = TopicResponse.from_orm(topic).dict()
-        topic_dict["question_count"] = count
-        result.append(topic_dict)
-    
-    return result
-
-@router.post("/", response_model=TopicResponse)
-def create_topic(
-    request: TopicCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["Admin"]))
-):
-    """
-    Create new topic (Admin only)
-    """
-    topic = Topic(name=request.name, created_by=current_user.id)
-    db.add(topic)
-    db.commit()
-    db.refresh(topic)
-    return topic
+"""
+Topic management routes
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from typing import List
+from app.core.database import get_db, get_async_db
+from app.auth.dependencies import get_current_user, require_role
+from app.auth.principal import Principal
+from app.models.models import Topic, Question, TopicExamSettings
+from app.schemas.schemas import (
+    TopicResponse, TopicCreate, TopicExamSettingsResponse, TopicExamSettingsUpdate,
+    ScorePercentileResponse, LeaderboardEntryResponse, ScoreSummaryResponse
+)
+from app.services.question_cache import question_cache
+from app.services.score_stats import score_stats
+from app.services.stats_service import counter_update, ACTIVE_TOPICS
+from app.config import settings
+
+router = APIRouter()
+
+@router.get("/", response_model=List[TopicResponse])
+async def get_topics(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Get all active topics with the number of questions per exam
+    (the topic's exam settings question_count, capped by its active questions)
+    Available to all authenticated users
+    """
+    topics = await db.execute(
+        select(
+            Topic.id,
+            Topic.uuid,
+            Topic.name,
+            Topic.is_active,
+            func.count(Question.id).label("active_questions"),
+            TopicExamSettings.question_count
+        ).outerjoin(
+            Question, (Question.topic_id == Topic.id) & (Question.is_active == True)
+        ).outerjoin(
+            TopicExamSettings, TopicExamSettings.topic_id == Topic.id
+        ).where(
+            Topic.is_active == True
+        ).group_by(Topic.id, TopicExamSettings.question_count)
+    )
+    
+    return [
+        TopicResponse(
+            id=topic.id,
+            uuid=topic.uuid,
+            name=topic.name,
+            is_active=topic.is_active,
+            question_count=(
+                topic.active_questions if topic.question_count is None
+                else min(topic.question_count, topic.active_questions)
+            )
+        ) for topic in topics
+    ]
+
+@router.post("/", response_model=TopicResponse)
+def create_topic(
+    request: TopicCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Create new topic (Admin only)
+    """
+    topic = Topic(name=request.name, created_by=current_user.id)
+    db.add(topic)
+    db.execute(counter_update(ACTIVE_TOPICS, 1))
+    db.commit()
+    db.refresh(topic)
+    return topic
+
+def get_active_topic(db: Session, topic_id: int) -> Topic:
+    topic = db.get(Topic, topic_id)
+    if not topic or not topic.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+    return topic
+
+@router.get("/{topic_id}/exam-settings", response_model=TopicExamSettingsResponse)
+def get_exam_settings(
+    topic_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Get a topic's exam composition (Admin only)
+    Topics without settings serve every active question in order
+    """
+    get_active_topic(db, topic_id)
+    exam_settings = db.get(TopicExamSettings, topic_id)
+    if exam_settings is None:
+        return TopicExamSettingsResponse(topic_id=topic_id, shuffle_questions=False)
+    return exam_settings
+
+@router.put("/{topic_id}/exam-settings", response_model=TopicExamSettingsResponse)
+def update_exam_settings(
+    topic_id: int,
+    request: TopicExamSettingsUpdate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role(["Admin"]))
+):
+    """
+    Set a topic's exam composition (Admin only)
+    - question_count: questions per exam, drawn at random (null = all)
+    - category_quotas: minimum questions per category, part of question_count
+    - shuffle_questions / shuffle_options: per-exam order, fixed by the session's seed
+    """
+    get_active_topic(db, topic_id)
+    
+    if request.question_count is not None and request.question_count < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="question_count must be at least 1"
+        )
+    if any(quota < 0 for quota in request.category_quotas.values()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Category quotas must not be negative"
+        )
+    if request.category_quotas and (
+        request.question_count is None
+        or sum(request.category_quotas.values()) > request.question_count
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Category quotas must add up to at most question_count"
+        )
+    
+    exam_settings = db.get(TopicExamSettings, topic_id)
+    if exam_settings is None:
+        exam_settings = TopicExamSettings(topic_id=topic_id)
+        db.add(exam_settings)
+    exam_settings.question_count = request.question_count
+    exam_settings.category_quotas = request.category_quotas
+    exam_settings.shuffle_questions = request.shuffle_questions
+    exam_settings.shuffle_options = request.shuffle_options
+    exam_settings.updated_at = func.now()
+    exam_settings.updated_by = current_user.id
+    db.commit()
+    question_cache.invalidate(topic_id)
+    db.refresh(exam_settings)
+    return exam_settings
+
+@router.get("/{topic_id}/scores/percentile", response_model=ScorePercentileResponse)
+def get_score_percentile(
+    topic_id: int,
+    score: int = Query(..., ge=0),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Percentile rank of a score within a topic: share of exams scoring lower,
+    counting equal scores as half
+    Served from the in-memory score distribution
+    """
+    get_active_topic(db, topic_id)
+    score_stats.refresh(db)
+    percentile, total_scores = score_stats.percentile(topic_id, score)
+    return ScorePercentileResponse(
+        topic_id=topic_id,
+        score=score,
+        percentile=percentile,
+        total_scores=total_scores
+    )
+
+@router.get("/{topic_id}/leaderboard", response_model=List[LeaderboardEntryResponse])
+def get_leaderboard(
+    topic_id: int,
+    limit: int = Query(10, ge=1, le=settings.SCORE_LEADERBOARD_SIZE),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Top scores of a topic, best first (earliest submission wins ties)
+    """
+    get_active_topic(db, topic_id)
+    score_stats.refresh(db)
+    return [
+        LeaderboardEntryResponse(
+            rank=entry.rank,
+            user_id=entry.user_id,
+            user_name=entry.user_name,
+            score=entry.score
+        ) for entry in score_stats.leaderboard(topic_id, limit)
+    ]
+
+@router.get("/{topic_id}/scores/summary", response_model=ScoreSummaryResponse)
+def get_score_summary(
+    topic_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Score distribution of a topic: count, mean, standard deviation,
+    quartiles / p90 and the full histogram
+    """
+    get_active_topic(db, topic_id)
+    score_stats.refresh(db)
+    return ScoreSummaryResponse(topic_id=topic_id, **score_stats.summary(topic_id))
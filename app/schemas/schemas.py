@@ -1,137 +1,282 @@
-"""
-Pydantic schemas for request/response validation
-"""
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
-from uuid import UUID
-
-# Auth Schemas
-class LoginRequest(BaseModel):
-    email: EmailStr
-    password: str
-
-class TokenResponse(BaseModel):
-    access_token: str
-    refresh_token: str
-    token_type: str = "bearer"
-    role: str
-    user_id: int
-    name: str
-
-# User Schemas
-class UserBase(BaseModel):
-    name: str
-    email: EmailStr
-
-class UserCreate(UserBase):
-    password: str
-    role_id: int
-
-class UserUpdate(BaseModel):
-    name: Optional[str] = None
-    email: Optional[EmailStr] = None
-
-class UserResponse(UserBase):
-    id: int
-    uuid: UUID
-    is_active: bool
-    role_id: int
-    created_at: datetime
-    
-    class Config:
-        from_attributes = True
-
-# Topic Schemas
-class TopicBase(BaseModel):
-    name: str
-
-class TopicCreate(TopicBase):
-    pass
-
-class TopicResponse(TopicBase):
-    id: int
-    uuid: UUID
-    is_active: bool
-    question_count: Optional[int] = 0
-    
-    class Config:
-        from_attributes = True
-
-# Question Schemas
-class QuestionBase(BaseModel):
-    question_text: str
-    options: List[str]
-    question_type: str
-    correct_answer: str
-    topic_id: int
-
-class QuestionCreate(QuestionBase):
-    pass
-
-class QuestionResponse(BaseModel):
-    id: int
-    uuid: UUID
-    question_text: str
-    options: List[str]
-    question_type: str
-    # Note: correct_answer excluded for user view
-    
-    class Config:
-        from_attributes = True
-
-class QuestionAdmin(QuestionResponse):
-    correct_answer: str
-    topic_id: int
-    is_active: bool
-
-# Exam Schemas
-class ExamStartRequest(BaseModel):
-    topic_id: int
-
-class ExamStartResponse(BaseModel):
-    exam_session_id: str
-    questions: List[QuestionResponse]
-    duration_minutes: int
-    total_questions: int
-
-class AnswerSubmission(BaseModel):
-    question_id: int
-    selected_answer: str
-
-class ExamSubmitRequest(BaseModel):
-    topic_id: int
-    answers: List[AnswerSubmission]
-    tab_switch_count: int
-
-class ExamSubmitResponse(BaseModel):
-    score: int
-    total_questions: int
-    percentage: float
-    malpractice_detected: bool
-    message: str
-
-# Score Schemas
-class UserScoreResponse(BaseModel):
-    id: int
-    score: int
-    certificate_issued: bool
-    created_at: datetime
-    user_id: int
-    topic_id: int
-    user_name: str
-    topic_name: str
-    
-    class Config:
-        from_attributes = True
-
-# Admin Dashboard
-class DashboardStats(BaseModel):
-    total_users: int
-    total_admins: int
-    total_topics: int
-    total_exams_taken: int
-
-# Certificate
-class CertificateRequest(BaseModel):
-    user_score_id: int
+"""
+Pydantic schemas for request/response validation
+"""
+from pydantic import BaseModel, EmailStr
+from typing import Any, Dict, Optional, List
+from datetime import datetime
+from uuid import UUID
+
+# Auth Schemas
+class LoginRequest(BaseModel):
+    email: EmailStr
+    password: str
+
+class TokenResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+    role: str
+    user_id: int
+    name: str
+
+# User Schemas
+class UserBase(BaseModel):
+    name: str
+    email: EmailStr
+
+class UserCreate(UserBase):
+    password: str
+    role_id: int
+
+class UserUpdate(BaseModel):
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+
+class UserResponse(UserBase):
+    id: int
+    uuid: UUID
+    is_active: bool
+    role_id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class BulkUserCreate(BaseModel):
+    # Rows are validated one by one so a bad row does not reject the batch
+    users: List[Dict[str, Any]]
+
+class BulkUserRowResult(BaseModel):
+    row: int
+    email: Optional[str] = None
+    status: str  # created | skipped | error
+    error: Optional[str] = None
+    user_id: Optional[int] = None
+
+class BulkUserResult(BaseModel):
+    created: int
+    skipped: int
+    failed: int
+    results: List[BulkUserRowResult]
+
+class BulkUserJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued | running | completed | failed
+    total: int
+    error: Optional[str] = None
+    result: Optional[BulkUserResult] = None  # once completed
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+# Topic Schemas
+class TopicBase(BaseModel):
+    name: str
+
+class TopicCreate(TopicBase):
+    pass
+
+class TopicResponse(TopicBase):
+    id: int
+    uuid: UUID
+    is_active: bool
+    question_count: Optional[int] = 0
+    
+    class Config:
+        from_attributes = True
+
+class TopicExamSettingsUpdate(BaseModel):
+    question_count: Optional[int] = None  # None = all active questions
+    category_quotas: Dict[str, int] = {}  # minimum questions drawn from each category
+    shuffle_questions: bool = True
+    shuffle_options: bool = False
+
+class TopicExamSettingsResponse(TopicExamSettingsUpdate):
+    topic_id: int
+    
+    class Config:
+        from_attributes = True
+
+# Score distribution Schemas
+class ScorePercentileResponse(BaseModel):
+    topic_id: int
+    score: int
+    percentile: Optional[float] = None  # None while the topic has no scores
+    total_scores: int
+
+class LeaderboardEntryResponse(BaseModel):
+    rank: int
+    user_id: int
+    user_name: str
+    score: int
+
+class ScoreSummaryResponse(BaseModel):
+    topic_id: int
+    count: int
+    mean: Optional[float] = None
+    stdev: Optional[float] = None
+    min: Optional[int] = None
+    max: Optional[int] = None
+    p25: Optional[int] = None
+    median: Optional[int] = None
+    p75: Optional[int] = None
+    p90: Optional[int] = None
+    histogram: List[int]  # number of exams per score, from 0 to max
+
+# Question Schemas
+class QuestionBase(BaseModel):
+    question_text: str
+    options: List[str]
+    question_type: str
+    correct_answer: str
+    topic_id: int
+    category: Optional[str] = None
+
+class QuestionCreate(QuestionBase):
+    pass
+
+class QuestionResponse(BaseModel):
+    id: int
+    uuid: UUID
+    question_text: str
+    options: List[str]
+    question_type: str
+    # Note: correct_answer excluded for user view
+    
+    class Config:
+        from_attributes = True
+
+class QuestionAdmin(QuestionResponse):
+    correct_answer: str
+    topic_id: int
+    category: Optional[str] = None
+    is_active: bool
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class QuestionImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[ImportRowError]
+
+# Exam Schemas
+class ExamStartRequest(BaseModel):
+    topic_id: int
+
+class ExamStartResponse(BaseModel):
+    exam_session_id: str
+    questions: List[QuestionResponse]
+    duration_minutes: int
+    total_questions: int
+
+class AnswerSubmission(BaseModel):
+    question_id: int
+    selected_answer: str
+
+class ExamSubmitRequest(BaseModel):
+    exam_session_id: str
+    topic_id: Optional[int] = None  # Optional cross-check against the session
+    answers: List[AnswerSubmission]
+    tab_switch_count: int
+
+class ExamProgressRequest(BaseModel):
+    answers: List[AnswerSubmission]  # every answer given so far, not just the changed ones
+    tab_switch_count: int = 0
+
+class ExamProgressResponse(BaseModel):
+    exam_session_id: str
+    topic_id: int
+    questions: List[QuestionResponse]
+    answers: List[AnswerSubmission]
+    tab_switch_count: int
+    remaining_seconds: int
+    duration_minutes: int
+    total_questions: int
+
+class ExamSubmitResponse(BaseModel):
+    score: int
+    total_questions: int
+    percentage: float
+    malpractice_detected: bool
+    message: str
+    percentile: Optional[float] = None  # rank among the topic's scores, 0-100
+
+# Score Schemas
+class UserScoreResponse(BaseModel):
+    id: int
+    score: int
+    certificate_issued: bool
+    created_at: datetime
+    user_id: int
+    topic_id: int
+    user_name: str
+    topic_name: str
+    
+    class Config:
+        from_attributes = True
+
+# Admin Dashboard
+class ItemStatistics(BaseModel):
+    question_id: int
+    question_text: Optional[str] = None
+    is_active: Optional[bool] = None
+    attempts: int
+    correct_rate: float
+    discrimination: Optional[float] = None  # point-biserial vs the rest of the exam, -1..1
+
+class ItemAnalyticsResponse(BaseModel):
+    topic_id: int
+    submissions: int
+    items: List[ItemStatistics]
+
+class DashboardStats(BaseModel):
+    total_users: int
+    total_admins: int
+    total_topics: int
+    total_exams_taken: int
+
+# Certificate
+class CertificateRequest(BaseModel):
+    user_score_id: int
+
+class CertificateBatchRequest(BaseModel):
+    # Either explicit score ids, or a topic (optionally with a minimum score)
+    user_score_ids: Optional[List[int]] = None
+    topic_id: Optional[int] = None
+    min_score: Optional[int] = None
+
+class CertificateJobError(BaseModel):
+    user_score_id: int
+    error: str
+
+class CertificateJobResponse(BaseModel):
+    job_id: Optional[str] = None  # None when there was nothing to publish
+    status: str  # running | completed
+    total: int  # certificates claimed by the batch
+    pending: int
+    sent: int
+    failed: int
+    errors: List[CertificateJobError]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+class CertificateQueuedResponse(BaseModel):
+    message: str
+    user_email: str
+    outbox_id: int
+
+class CertificateOutboxResponse(BaseModel):
+    id: int
+    user_score_id: int
+    recipient_email: str
+    topic_name: str
+    status: str
+    attempts: int
+    next_attempt_at: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
@@ -1 +1 @@
-# Business services
+# Business services
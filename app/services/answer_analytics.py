@@ -0,0 +1,160 @@
+"""
+Per-answer persistence and item analytics
+Each submission stores its graded answers packed into an ExamAnswers row;
+item statistics are computed from those rows with NumPy
+
+Per topic and question the cache keeps additive sums over the submissions
+that contained the question: attempts, correct answers, and the sums behind
+the point-biserial correlation between answering it correctly and the rest
+of the exam (share of the submission's other questions answered correctly).
+New submissions are folded in by id on each request; like score_stats, ids
+within ITEM_ANALYTICS_ID_OVERLAP of the watermark are re-read and deduplicated
+"""
+import threading
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import ExamAnswers
+
+ANALYTICS_CHUNK_SIZE = 10000
+# attempts, correct, rest, rest^2, correct * rest
+N_SUMS = 5
+
+
+def pack_answers(question_ids: Sequence[int], correct: Sequence[int]) -> Tuple[bytes, bytes]:
+    """Pack an exam's correct flags into (question id blob, bitmap) ordered by question id"""
+    ids = np.asarray(question_ids, dtype=np.int64)
+    flags = np.asarray(correct, dtype=np.uint8) != 0
+    order = np.argsort(ids, kind="stable")
+    return ids[order].astype("<u4").tobytes(), np.packbits(flags[order]).tobytes()
+
+
+def unpack_answers(question_ids: bytes, correct: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    ids = np.frombuffer(question_ids, dtype="<u4").astype(np.int64)
+    flags = np.unpackbits(np.frombuffer(correct, dtype=np.uint8), count=len(ids))
+    return ids, flags
+
+
+def unpack_batch(rows) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Unpack many (question_ids, correct) blob pairs at once
+    Returns flat (question id, correct flag, row index) arrays plus the
+    question count of each row
+    """
+    id_blobs = [row[0] for row in rows]
+    bitmaps = [row[1] for row in rows]
+    lengths = np.fromiter((len(b) // 4 for b in id_blobs), dtype=np.int64, count=len(rows))
+    question_ids = np.frombuffer(b"".join(id_blobs), dtype="<u4").astype(np.int64)
+
+    # Bitmaps are padded to whole bytes per row: unpack them all, then drop the padding
+    bits = np.unpackbits(np.frombuffer(b"".join(bitmaps), dtype=np.uint8))
+    padded = (lengths + 7) // 8 * 8
+    offset = np.arange(len(bits)) - np.repeat(np.cumsum(padded) - padded, padded)
+    flags = bits[offset < np.repeat(lengths, padded)]
+
+    row_index = np.repeat(np.arange(len(rows)), lengths)
+    return question_ids, flags, row_index, lengths
+
+
+class TopicItemStats:
+    """Additive per-question sums for one topic"""
+
+    def __init__(self):
+        self.positions: Dict[int, int] = {}  # question id -> column in sums
+        self.sums = np.zeros((N_SUMS, 0))
+        self.submissions = 0
+        self.watermark = 0
+        self.applied: Set[int] = set()  # applied ExamAnswers ids above watermark - overlap
+        self.lock = threading.Lock()
+
+    def add(self, rows) -> None:
+        """Fold in (question_ids blob, correct blob) rows"""
+        if not rows:
+            return
+        question_ids, flags, row_index, lengths = unpack_batch(rows)
+        correct = flags.astype(np.float64)
+        totals = np.bincount(row_index, weights=correct, minlength=len(rows))
+        # Share of the other questions of the same submission answered correctly
+        rest = (totals[row_index] - correct) / np.maximum(lengths[row_index] - 1, 1)
+
+        unique_ids, inverse = np.unique(question_ids, return_inverse=True)
+        for question_id in unique_ids.tolist():
+            if question_id not in self.positions:
+                self.positions[question_id] = len(self.positions)
+        if len(self.positions) > self.sums.shape[1]:
+            self.sums = np.pad(self.sums, ((0, 0), (0, len(self.positions) - self.sums.shape[1])))
+        columns = np.fromiter(
+            (self.positions[q] for q in unique_ids.tolist()), dtype=np.int64, count=len(unique_ids)
+        )[inverse]
+
+        size = self.sums.shape[1]
+        for k, weights in enumerate((None, correct, rest, rest * rest, correct * rest)):
+            self.sums[k] += np.bincount(columns, weights=weights, minlength=size)
+        self.submissions += len(rows)
+
+    def items(self) -> List[Dict]:
+        attempts, correct, rest, rest_sq, correct_rest = self.sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correct_rate = correct / attempts
+            covariance = attempts * correct_rest - correct * rest
+            # correct flags are 0/1, so their sum of squares is their sum
+            spread = np.sqrt((attempts * correct - correct ** 2) * (attempts * rest_sq - rest ** 2))
+            discrimination = np.where(spread > 1e-12, covariance / spread, np.nan)
+        return [
+            {
+                "question_id": question_id,
+                "attempts": int(attempts[i]),
+                "correct_rate": float(correct_rate[i]),
+                "discrimination": None if np.isnan(discrimination[i]) else float(discrimination[i])
+            } for question_id, i in sorted(self.positions.items())
+        ]
+
+
+class ItemAnalytics:
+    """
+    Per-topic TopicItemStats, refreshed incrementally from exam_answers
+    Each topic has its own lock, so a cold topic being read from the
+    database does not hold up requests for other topics
+    """
+
+    def __init__(self, id_overlap: int):
+        self.id_overlap = id_overlap
+        self._topics: Dict[int, TopicItemStats] = {}
+        self._lock = threading.Lock()  # guards _topics only
+
+    def refresh(self, db: Session, topic_id: int) -> TopicItemStats:
+        """Fold in the topic's submissions since the last refresh"""
+        with self._lock:
+            stats = self._topics.get(topic_id)
+            if stats is None:
+                stats = self._topics[topic_id] = TopicItemStats()
+        with stats.lock:
+            stmt = select(
+                ExamAnswers.id, ExamAnswers.question_ids, ExamAnswers.correct
+            ).where(
+                ExamAnswers.topic_id == topic_id,
+                ExamAnswers.id > stats.watermark - self.id_overlap
+            ).order_by(ExamAnswers.id).execution_options(
+                stream_results=True, yield_per=ANALYTICS_CHUNK_SIZE
+            )
+            for rows in db.connection().execute(stmt).partitions(ANALYTICS_CHUNK_SIZE):
+                new_rows = [row[1:] for row in rows if row[0] not in stats.applied]
+                stats.applied.update(row[0] for row in rows)
+                stats.watermark = max(stats.watermark, rows[-1][0])
+                stats.add(new_rows)
+                low = stats.watermark - self.id_overlap
+                stats.applied = {i for i in stats.applied if i > low}
+            return stats
+
+    def items(self, db: Session, topic_id: int) -> Tuple[int, List[Dict]]:
+        """(submission count, per-question statistics) for a topic"""
+        stats = self.refresh(db, topic_id)
+        with stats.lock:
+            return stats.submissions, stats.items()
+
+
+item_analytics = ItemAnalytics(id_overlap=settings.ITEM_ANALYTICS_ID_OVERLAP)
@@ -0,0 +1,176 @@
+"""
+Exam progress autosave
+Write-behind buffer in front of the session store: an autosave only
+replaces its session's pending progress in memory, and a background thread
+writes the latest progress of each changed session every
+AUTOSAVE_FLUSH_SECONDS. However often a student autosaves, their session
+costs at most one store read + write per flush interval.
+
+Progress is {"answers": [[question_id, answer], ...], "tab_switch_count": n,
+"saved_at": epoch seconds}, stored under the session's "progress" key.
+Pending progress is only visible to the worker that buffered it until it
+is flushed. Autosaves are refused after the session's submit cutoff.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from app.config import settings
+from app.services.exam_service import submit_cutoff
+from app.services.session_store import ExamSessionStore, session_store
+
+
+@dataclass(frozen=True)
+class SessionOwner:
+    """What autosave needs to validate a session without reading the store"""
+    user_id: int
+    question_ids: FrozenSet[int]
+    expires_at: float  # submit cutoff
+
+
+class AutosaveBuffer:
+    """
+    Latest unflushed progress per exam session, plus the owner of each
+    session seen so far (so repeat autosaves are validated in memory)
+    """
+
+    def __init__(self, store: ExamSessionStore, flush_seconds: float, max_pending: int):
+        self.store = store
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending: Dict[str, Dict] = {}
+        self._owners: Dict[str, SessionOwner] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.saves = 0
+        self.writes = 0
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="exam-autosave", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing exam autosaves: {e}")
+
+    def owner(self, session_id: str) -> Optional[SessionOwner]:
+        """Owner of a live session, loading it from the store on first use"""
+        owner = self._owners.get(session_id)
+        if owner is None:
+            session = self.store.get(session_id)
+            if session is None:
+                return None
+            owner = SessionOwner(
+                user_id=session["user_id"],
+                question_ids=frozenset(session["question_ids"]),
+                expires_at=submit_cutoff(session)
+            )
+            with self._lock:
+                self._owners[session_id] = owner
+        # Past the cutoff; pending progress is kept for the auto-submit
+        if owner.expires_at <= time.time():
+            return None
+        return owner
+
+    def save(
+        self,
+        session_id: str,
+        owner: SessionOwner,
+        answers: Iterable[Tuple[int, str]],
+        tab_switch_count: int
+    ) -> None:
+        """Buffer the latest progress of a session, replacing any pending one"""
+        progress = {
+            # Last answer per question wins, as in grading; unknown questions are dropped
+            "answers": [[q, a] for q, a in dict(answers).items() if q in owner.question_ids],
+            "tab_switch_count": tab_switch_count,
+            "saved_at": time.time()
+        }
+        with self._lock:
+            self._pending[session_id] = progress
+            self.saves += 1
+            pending = len(self._pending)
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def progress(self, session_id: str, session: Optional[Dict] = None) -> Optional[Dict]:
+        """Latest progress of a session: pending in this worker, else as stored"""
+        pending = self._pending.get(session_id)
+        if pending is not None:
+            return pending
+        if session is None:
+            session = self.store.get(session_id)
+        return session.get("progress") if session else None
+
+    def discard(self, session_id: str) -> Optional[Dict]:
+        """Forget a finished session; returns its unflushed progress, if any"""
+        with self._lock:
+            self._owners.pop(session_id, None)
+            return self._pending.pop(session_id, None)
+
+    def take(self, session_id: str, session: Dict) -> Dict:
+        """
+        Final progress of a claimed session: the newer of this worker's
+        unflushed progress and the stored one; forgets the session
+        """
+        pending = self.discard(session_id)
+        stored = session.get("progress")
+        if pending is None or (stored and stored.get("saved_at", 0) > pending["saved_at"]):
+            return stored or {}
+        return pending
+
+    def flush(self) -> int:
+        """Write every pending progress to the store; returns sessions written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            now = time.time()
+            for session_id in [s for s, o in self._owners.items() if o.expires_at <= now]:
+                del self._owners[session_id]
+        written = 0
+        for session_id, progress in pending.items():
+            session = self.store.get(session_id)
+            if session is None:
+                continue
+            stored = session.get("progress")
+            # Another worker may have flushed a newer autosave of the same session
+            if stored and stored.get("saved_at", 0) > progress["saved_at"]:
+                continue
+            session["progress"] = progress
+            if self.store.update(session_id, session):
+                written += 1
+        self.writes += written
+        return written
+
+    def stats(self) -> Dict:
+        return {
+            "pending": len(self._pending),
+            "tracked_sessions": len(self._owners),
+            "saves": self.saves,
+            "writes": self.writes
+        }
+
+    def shutdown(self) -> None:
+        if self._thread:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+
+autosave_buffer = AutosaveBuffer(
+    session_store,
+    flush_seconds=settings.AUTOSAVE_FLUSH_SECONDS,
+    max_pending=settings.AUTOSAVE_MAX_PENDING
+)
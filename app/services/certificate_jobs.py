@@ -0,0 +1,169 @@
+"""
+Batch certificate publishing
+A batch claims its scores (sets certificate_issued with one conditional
+UPDATE) and writes their certificate_outbox rows in the same transaction,
+tagged with a batch id; the outbox worker renders, stores and sends them.
+Scores already claimed by another batch or by /publish are skipped, and a
+batch survives restarts. Progress is read back from the outbox rows
+"""
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.models import CertificateOutbox, Question, Topic, User, UserScore
+from app.services.certificate_service import calculate_grade
+
+CLAIM_CHUNK_SIZE = 1000
+MAX_JOB_ERRORS = 100
+
+
+@dataclass
+class CertificateBatch:
+    id: str
+    total: int
+    pending: int = 0
+    sent: int = 0
+    failed: int = 0
+    errors: List[Dict] = field(default_factory=list)
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def status(self) -> str:
+        return "running" if self.pending else "completed"
+
+
+def find_certificate_targets(
+    db: Session,
+    user_score_ids: Optional[List[int]] = None,
+    topic_id: Optional[int] = None,
+    min_score: Optional[int] = None
+) -> List[Dict]:
+    """
+    Active, not yet certified scores with everything needed to render and send
+    One query: the total is the exam's own question count; scores saved before
+    it was stored fall back to the topic's active questions (grouped subquery)
+    """
+    totals = select(
+        Question.topic_id,
+        func.count(Question.id).label("total")
+    ).where(
+        Question.is_active == True
+    ).group_by(Question.topic_id).subquery()
+
+    stmt = select(
+        UserScore.id.label("user_score_id"),
+        UserScore.score,
+        User.name.label("user_name"),
+        User.email,
+        Topic.name.label("topic_name"),
+        func.coalesce(UserScore.total_questions, totals.c.total, 0).label("total")
+    ).join(
+        User, User.id == UserScore.user_id
+    ).join(
+        Topic, Topic.id == UserScore.topic_id
+    ).outerjoin(
+        totals, totals.c.topic_id == UserScore.topic_id
+    ).where(
+        UserScore.is_active == True,
+        UserScore.certificate_issued != True
+    )
+
+    if user_score_ids is not None:
+        stmt = stmt.where(UserScore.id.in_(user_score_ids))
+    if topic_id is not None:
+        stmt = stmt.where(UserScore.topic_id == topic_id)
+    if min_score is not None:
+        stmt = stmt.where(UserScore.score >= min_score)
+
+    return [dict(row) for row in db.execute(stmt.order_by(UserScore.id)).mappings()]
+
+
+def publish_certificates(db: Session, targets: List[Dict], issued_by: int) -> Optional[CertificateBatch]:
+    """
+    Claim the targets' certificates and queue their emails in one transaction
+    Targets whose certificate_issued was set in the meantime are left out
+    Commits; None when nothing was left to claim (no batch is created)
+    """
+    batch_id = str(uuid.uuid4())
+    by_id = {target["user_score_id"]: target for target in targets}
+    ids = list(by_id)
+    claimed: List[int] = []
+    for i in range(0, len(ids), CLAIM_CHUNK_SIZE):
+        claimed.extend(db.execute(
+            update(UserScore).where(
+                UserScore.id.in_(ids[i:i + CLAIM_CHUNK_SIZE]),
+                UserScore.is_active == True,
+                UserScore.certificate_issued != True
+            ).values(
+                certificate_issued=True,
+                updated_by=issued_by,
+                updated_at=func.now()
+            ).returning(UserScore.id)
+        ).scalars())
+
+    if not claimed:
+        db.rollback()
+        return None
+
+    now = datetime.utcnow()
+    db.execute(insert(CertificateOutbox), [
+        {
+            "user_score_id": user_score_id,
+            "recipient_email": by_id[user_score_id]["email"],
+            "recipient_name": by_id[user_score_id]["user_name"],
+            "topic_name": by_id[user_score_id]["topic_name"],
+            "score": by_id[user_score_id]["score"],
+            "total": by_id[user_score_id]["total"],
+            "grade": calculate_grade(by_id[user_score_id]["score"], by_id[user_score_id]["total"]),
+            "batch_id": batch_id,
+            "next_attempt_at": now,
+            "created_at": now,
+            "created_by": issued_by
+        }
+        for user_score_id in sorted(claimed)
+    ])
+    db.commit()
+    return CertificateBatch(id=batch_id, total=len(claimed), pending=len(claimed), created_at=now)
+
+
+def get_certificate_batch(db: Session, batch_id: str) -> Optional[CertificateBatch]:
+    """Progress of a batch from its outbox rows; None for unknown (or empty) batches"""
+    rows = db.execute(
+        select(
+            CertificateOutbox.status,
+            func.count(CertificateOutbox.id),
+            func.min(CertificateOutbox.created_at),
+            func.max(CertificateOutbox.sent_at)
+        ).where(
+            CertificateOutbox.batch_id == batch_id
+        ).group_by(CertificateOutbox.status)
+    ).all()
+    if not rows:
+        return None
+    counts = {status: count for status, count, _, _ in rows}
+    batch = CertificateBatch(
+        id=batch_id,
+        total=sum(counts.values()),
+        pending=counts.get("pending", 0),
+        sent=counts.get("sent", 0),
+        failed=counts.get("dead", 0),
+        created_at=min(created_at for _, _, created_at, _ in rows)
+    )
+    if not batch.pending:
+        batch.finished_at = max((sent_at for _, _, _, sent_at in rows if sent_at), default=None)
+    if batch.failed:
+        batch.errors = [
+            {"user_score_id": user_score_id, "error": error or ""}
+            for user_score_id, error in db.execute(
+                select(CertificateOutbox.user_score_id, CertificateOutbox.last_error).where(
+                    CertificateOutbox.batch_id == batch_id,
+                    CertificateOutbox.status == "dead"
+                ).order_by(CertificateOutbox.id).limit(MAX_JOB_ERRORS)
+            ).all()
+        ]
+    return batch
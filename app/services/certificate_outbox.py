@@ -0,0 +1,207 @@
+"""
+Certificate email outbox
+publish_certificate only writes an outbox row; this worker renders, stores
+and sends the certificates in the background with bounded concurrency, retries failures
+with exponential backoff and dead-letters rows that keep failing.
+A certificate's storage key is recorded as soon as it is stored, so it can
+be downloaded even while (or if) its email keeps failing
+"""
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import Row, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.database import SessionLocal
+from app.models.models import CertificateOutbox, UserScore
+from app.services.certificate_storage import render_and_store_certificate
+from app.services.email_service import send_certificate_email
+
+MAX_ERROR_LENGTH = 1000
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before the next try: base * 2^(attempts-1), capped, with +/-20% jitter"""
+    delay = min(
+        settings.CERTIFICATE_OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.CERTIFICATE_OUTBOX_BACKOFF_MAX_SECONDS
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+def enqueue_certificate(db: Session, user_score: UserScore, total: int, grade: str, issued_by: int) -> CertificateOutbox:
+    """
+    Add the outbox row for a certificate; the caller commits it together with
+    the certificate_issued update
+    """
+    entry = CertificateOutbox(
+        user_score_id=user_score.id,
+        recipient_email=user_score.user.email,
+        recipient_name=user_score.user.name,
+        topic_name=user_score.topic.name,
+        score=user_score.score,
+        total=total,
+        grade=grade,
+        created_by=issued_by
+    )
+    db.add(entry)
+    return entry
+
+
+class CertificateOutboxWorker:
+    """
+    Background thread that drains due outbox rows
+    - Rows are claimed with one conditional UPDATE that pushes next_attempt_at
+      out by the lease, so several app processes can drain the same table and
+      a row claimed by a crashed process becomes due again
+    - Claimed rows are sent on a pool of `concurrency` threads
+    """
+
+    def __init__(self, concurrency: int, batch_size: int, poll_seconds: float):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="certificate-outbox")
+        self._thread = threading.Thread(target=self._run, name="certificate-outbox", daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        """Check for due rows now instead of at the next poll"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = self.drain_once()
+            except Exception as e:
+                print(f"Certificate outbox error: {e}")
+                claimed = 0
+            # A full batch means there is probably more due right away
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def _claim(self) -> List[Row]:
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            due = select(CertificateOutbox.id).where(
+                CertificateOutbox.status == "pending",
+                CertificateOutbox.next_attempt_at <= now
+            ).order_by(CertificateOutbox.next_attempt_at).limit(self.batch_size)
+            rows = db.execute(
+                update(CertificateOutbox).where(
+                    CertificateOutbox.id.in_(due.scalar_subquery()),
+                    CertificateOutbox.status == "pending",
+                    CertificateOutbox.next_attempt_at <= now
+                ).values(
+                    attempts=CertificateOutbox.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=settings.CERTIFICATE_OUTBOX_LEASE_SECONDS)
+                ).returning(*CertificateOutbox.__table__.columns)
+            ).all()
+            db.commit()
+            return rows
+        finally:
+            db.close()
+
+    def drain_once(self) -> int:
+        """Claim one batch of due rows and send them; returns the number claimed"""
+        entries = self._claim()
+        if entries:
+            list(self._executor.map(self._deliver, entries))
+        return len(entries)
+
+    def _deliver(self, entry: Row) -> None:
+        try:
+            key, pdf_bytes = render_and_store_certificate(
+                user_name=entry.recipient_name,
+                topic_name=entry.topic_name,
+                score=entry.score,
+                total=entry.total,
+                grade=entry.grade,
+                issued_on=entry.created_at
+            )
+            self._store_key(entry.user_score_id, key)
+            send_certificate_email(
+                recipient_email=entry.recipient_email,
+                recipient_name=entry.recipient_name,
+                topic_name=entry.topic_name,
+                pdf_bytes=pdf_bytes
+            )
+        except Exception as e:
+            self._record_failure(entry, f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH])
+            return
+        self._update(entry.id, status="sent", sent_at=datetime.utcnow(), last_error=None)
+
+    @staticmethod
+    def _store_key(user_score_id: int, key: str) -> None:
+        """Make the stored certificate downloadable before its email is sent"""
+        db = SessionLocal()
+        try:
+            db.execute(update(UserScore).where(UserScore.id == user_score_id).values(certificate_key=key))
+            db.commit()
+        finally:
+            db.close()
+
+    def _record_failure(self, entry: Row, error: str) -> None:
+        if entry.attempts < settings.CERTIFICATE_OUTBOX_MAX_ATTEMPTS:
+            self._update(
+                entry.id,
+                last_error=error,
+                next_attempt_at=datetime.utcnow() + timedelta(seconds=backoff_seconds(entry.attempts))
+            )
+            return
+        # Dead letter: clear certificate_issued so the certificate can be published
+        # again; a certificate that was already stored stays downloadable
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(CertificateOutbox).where(
+                    CertificateOutbox.id == entry.id
+                ).values(status="dead", last_error=error)
+            )
+            db.execute(
+                update(UserScore).where(
+                    UserScore.id == entry.user_score_id
+                ).values(certificate_issued=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _update(outbox_id: int, **values) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(update(CertificateOutbox).where(CertificateOutbox.id == outbox_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def shutdown(self) -> None:
+        if self._thread:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=5)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._thread = None
+
+
+certificate_outbox = CertificateOutboxWorker(
+    concurrency=settings.CERTIFICATE_OUTBOX_CONCURRENCY,
+    batch_size=settings.CERTIFICATE_OUTBOX_BATCH_SIZE,
+    poll_seconds=settings.CERTIFICATE_OUTBOX_POLL_SECONDS
+)
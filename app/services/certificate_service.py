@@ -1,63 +1,147 @@
-"""
-Certificate PDF generation service
-Uses reportlab for PDF creation
-"""
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from datetime import datetime
-import os
-
-def generate_certificate_pdf(user_name: str, topic_name: str, score: int, total: int, grade: str) -> str:
-    """
-    Generate a certificate PDF
-    Returns the file path of generated PDF
-    """
-    # Create certificates directory if not exists
-    cert_dir = "certificates"
-    os.makedirs(cert_dir, exist_ok=True)
-    
-    # Generate filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{cert_dir}/certificate_{user_name.replace(' ', '_')}_{timestamp}.pdf"
-    
-    # Create PDF
-    c = canvas.Canvas(filename, pagesize=A4)
-    width, height = A4
-    
-    # Title
-    c.setFont("Helvetica-Bold", 32)
-    c.drawCentredString(width / 2, height - 2 * inch, "CERTIFICATE OF ACHIEVEMENT")
-    
-    # Subtitle
-    c.setFont("Helvetica", 16)
-    c.drawCentredString(width / 2, height - 2.8 * inch, "This is to certify that")
-    
-    # User name
-    c.setFont("Helvetica-Bold", 24)
-    c.drawCentredString(width / 2, height - 3.5 * inch, user_name)
-    
-    # Achievement text
-    c.setFont("Helvetica", 16)
-    c.drawCentredString(width / 2, height - 4.2 * inch, "has successfully completed the quiz on")
-    
-    # Topic name
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(width / 2, height - 4.9 * inch, topic_name)
-    
-    # Score details
-    c.setFont("Helvetica", 14)
-    score_text = f"Score: {score}/{total} | Grade: {grade}"
-    c.drawCentredString(width / 2, height - 5.6 * inch, score_text)
-    
-    # Date
-    c.setFont("Helvetica", 12)
-    date_text = f"Date: {datetime.now().strftime('%B %d, %Y')}"
-    c.drawCentredString(width / 2, height - 6.3 * inch, date_text)
-    
-    # Border
-    c.setLineWidth(3)
-    c.rect(0.5 * inch, 0.5 * inch, width - inch, height - inch)
-    
-    c.save()
-    return filename
+"""
+Certificate PDF generation service
+Uses reportlab for fonts and text metrics
+The PDF is built from a per-process template: catalog, fonts, page and the
+static layout (title, fixed text, border) as a form XObject are rendered
+once, so each certificate only adds a small content stream and an xref
+"""
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.rl_accel import escapePDF, fp_str
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import getFont, stringWidth, unicode2T1
+from datetime import date, datetime
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import zlib
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+
+# (font, size, y, text) for the fixed text on every certificate
+STATIC_TEXT = (
+    ("Helvetica-Bold", 32, PAGE_HEIGHT - 2 * inch, "CERTIFICATE OF ACHIEVEMENT"),
+    ("Helvetica", 16, PAGE_HEIGHT - 2.8 * inch, "This is to certify that"),
+    ("Helvetica", 16, PAGE_HEIGHT - 4.2 * inch, "has successfully completed the quiz on"),
+)
+
+# (font, size, y) for the per-certificate fields
+NAME_STYLE = ("Helvetica-Bold", 24, PAGE_HEIGHT - 3.5 * inch)
+TOPIC_STYLE = ("Helvetica-Bold", 20, PAGE_HEIGHT - 4.9 * inch)
+SCORE_STYLE = ("Helvetica", 14, PAGE_HEIGHT - 5.6 * inch)
+DATE_STYLE = ("Helvetica", 12, PAGE_HEIGHT - 6.3 * inch)
+
+BORDER_WIDTH = 3
+BORDER_MARGIN = 0.5 * inch
+
+# Page fonts plus reportlab's substitution fonts for characters outside WinAnsi
+FONT_RESOURCES = (
+    ("F1", "Helvetica", "/Encoding /WinAnsiEncoding "),
+    ("F2", "Helvetica-Bold", "/Encoding /WinAnsiEncoding "),
+    ("F3", "Symbol", ""),
+    ("F4", "ZapfDingbats", ""),
+)
+FONT_NAMES = {font: name for name, font, _ in FONT_RESOURCES}
+
+def calculate_grade(score: int, total: int) -> str:
+    """
+    Letter grade from the percentage of correct answers
+    """
+    percentage = (score / total * 100) if total > 0 else 0
+    
+    if percentage >= 90:
+        return "A"
+    elif percentage >= 75:
+        return "B"
+    elif percentage >= 60:
+        return "C"
+    return "D"
+
+def centred_text(style: Tuple[str, int, float], text: str) -> str:
+    """
+    PDF operators for one line of text centred on the page
+    Characters missing from the font fall back to Symbol/ZapfDingbats like reportlab
+    """
+    font_name, size, y = style
+    font = getFont(font_name)
+    x = (PAGE_WIDTH - stringWidth(text, font_name, size)) / 2
+    ops = [f"BT {fp_str(x, y)} Td"]
+    for chunk_font, chunk in unicode2T1(text, [font] + font.substitutionFonts):
+        ops.append(f"/{FONT_NAMES[chunk_font.fontName]} {fp_str(size)} Tf ({escapePDF(chunk)}) Tj")
+    ops.append("ET")
+    return " ".join(ops)
+
+class CertificateTemplate:
+    """
+    Pre-rendered certificate document
+    Objects 1-8 never change; object 9 is the page's content stream, which
+    draws the layout form and then the per-certificate fields
+    """
+
+    def __init__(self):
+        font_dict = " ".join(f"/{name} {3 + i} 0 R" for i, (name, _, _) in enumerate(FONT_RESOURCES))
+        layout = zlib.compress("\n".join(
+            [centred_text((font, size, y), text) for font, size, y, text in STATIC_TEXT] + [
+                f"{BORDER_WIDTH} w {fp_str(BORDER_MARGIN, BORDER_MARGIN, PAGE_WIDTH - 2 * BORDER_MARGIN, PAGE_HEIGHT - 2 * BORDER_MARGIN)} re S"
+            ]
+        ).encode("ascii"))
+        media_box = fp_str(0, 0, PAGE_WIDTH, PAGE_HEIGHT)
+
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [8 0 R] /Count 1 >>",
+        ] + [
+            f"<< /Type /Font /Subtype /Type1 /BaseFont /{font} {encoding}>>".encode("ascii")
+            for _, font, encoding in FONT_RESOURCES
+        ] + [
+            (f"<< /Type /XObject /Subtype /Form /BBox [{media_box}] /Resources << /Font << {font_dict} >> >> "
+             f"/Filter /FlateDecode /Length {len(layout)} >>\nstream\n").encode("ascii") + layout + b"\nendstream",
+            (f"<< /Type /Page /Parent 2 0 R /MediaBox [{media_box}] /Contents 9 0 R "
+             f"/Resources << /Font << {font_dict} >> /XObject << /Layout 7 0 R >> /ProcSet [/PDF /Text] >> >>").encode("ascii"),
+        ]
+
+        prefix = bytearray(b"%PDF-1.4\n%\x93\x8c\x8b\x9e\n")
+        self._offsets: List[int] = []
+        for number, body in enumerate(objects, start=1):
+            self._offsets.append(len(prefix))
+            prefix += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        self._prefix = bytes(prefix)
+        self._xref_head = b"xref\n0 10\n0000000000 65535 f \n" + b"".join(
+            b"%010d 00000 n \n" % offset for offset in self._offsets
+        )
+
+    def render(self, fields: List[Tuple[Tuple[str, int, float], str]]) -> bytes:
+        content = ("q /Layout Do Q\n" + "\n".join(
+            centred_text(style, text) for style, text in fields
+        )).encode("ascii")
+        contents = b"9 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n" % (len(content), content)
+        xref_offset = len(self._prefix) + len(contents)
+        return b"".join((
+            self._prefix,
+            contents,
+            self._xref_head,
+            b"%010d 00000 n \n" % len(self._prefix),
+            b"trailer\n<< /Size 10 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % xref_offset
+        ))
+
+@lru_cache(maxsize=1)
+def certificate_template() -> CertificateTemplate:
+    """Built on first use in each process (render pool workers included)"""
+    return CertificateTemplate()
+
+def generate_certificate_pdf(
+    user_name: str,
+    topic_name: str,
+    score: int,
+    total: int,
+    grade: str,
+    issued_on: Optional[date] = None
+) -> bytes:
+    """
+    Generate a certificate PDF in memory
+    Returns the PDF bytes, ready to attach or store
+    """
+    return certificate_template().render([
+        (NAME_STYLE, user_name),
+        (TOPIC_STYLE, topic_name),
+        (SCORE_STYLE, f"Score: {score}/{total} | Grade: {grade}"),
+        (DATE_STYLE, f"Date: {(issued_on or datetime.now()).strftime('%B %d, %Y')}"),
+    ])
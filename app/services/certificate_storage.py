@@ -0,0 +1,164 @@
+"""
+Certificate storage
+Rendered certificates are stored under content-addressed keys
+("ab/abcdef....pdf", from the SHA-256 of the PDF), so storing the same
+certificate twice is a no-op and keys never collide
+
+Backends:
+- local: files under CERTIFICATE_STORAGE_DIR, served with FileResponse
+- s3:    any S3-compatible object store, downloads go through presigned URLs
+"""
+import hashlib
+import os
+import tempfile
+from typing import Optional, Tuple
+
+from app.config import settings
+from app.services.certificate_service import generate_certificate_pdf
+
+
+def certificate_key(pdf_bytes: bytes) -> str:
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    return f"{digest[:2]}/{digest}.pdf"
+
+
+def key_digest(key: str) -> str:
+    """The SHA-256 part of a key, usable as a strong ETag"""
+    return os.path.basename(key).split(".", 1)[0]
+
+
+class CertificateStorage:
+    """
+    Base interface for certificate storage
+    """
+
+    def put(self, pdf_bytes: bytes) -> str:
+        """Store a certificate and return its key"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path for backends that keep files locally, else None"""
+        return None
+
+    def download_url(self, key: str, expires_seconds: int) -> Optional[str]:
+        """Direct, time-limited URL for backends that can serve files themselves"""
+        return None
+
+
+class LocalCertificateStorage(CertificateStorage):
+    """Files in a local directory (or a shared volume across workers)"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid certificate key: {key}")
+        return path
+
+    def put(self, pdf_bytes: bytes) -> str:
+        key = certificate_key(pdf_bytes)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+
+class S3CertificateStorage(CertificateStorage):
+    """S3-compatible object store (AWS S3, MinIO, R2, ...)"""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError(
+                "CERTIFICATE_STORAGE_BACKEND=s3 requires the 'boto3' package"
+            ) from e
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = boto3.client("s3", endpoint_url=endpoint_url or None)
+
+    def _object_key(self, key: str) -> str:
+        return self.prefix + key
+
+    def put(self, pdf_bytes: bytes) -> str:
+        key = certificate_key(pdf_bytes)
+        # Same key means same bytes, so overwriting is harmless
+        self._client.put_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=pdf_bytes,
+            ContentType="application/pdf",
+            CacheControl="private, max-age=31536000, immutable"
+        )
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            response = self._client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self._client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def download_url(self, key: str, expires_seconds: int) -> Optional[str]:
+        return self._client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._object_key(key),
+                "ResponseContentDisposition": 'attachment; filename="certificate.pdf"'
+            },
+            ExpiresIn=expires_seconds
+        )
+
+
+def create_certificate_storage() -> CertificateStorage:
+    """Build the storage configured by CERTIFICATE_STORAGE_BACKEND"""
+    backend = settings.CERTIFICATE_STORAGE_BACKEND.lower()
+    if backend == "local":
+        return LocalCertificateStorage(settings.CERTIFICATE_STORAGE_DIR)
+    if backend == "s3":
+        return S3CertificateStorage(
+            settings.CERTIFICATE_S3_BUCKET,
+            settings.CERTIFICATE_S3_PREFIX,
+            settings.CERTIFICATE_S3_ENDPOINT_URL
+        )
+    raise ValueError(f"Unknown CERTIFICATE_STORAGE_BACKEND: {settings.CERTIFICATE_STORAGE_BACKEND}")
+
+
+certificate_storage = create_certificate_storage()
+
+
+def render_and_store_certificate(**fields) -> Tuple[str, bytes]:
+    """
+    Render a certificate and store it; returns (key, pdf bytes)
+    Module-level so it can run on the batch render process pool
+    """
+    pdf_bytes = generate_certificate_pdf(**fields)
+    return certificate_storage.put(pdf_bytes), pdf_bytes
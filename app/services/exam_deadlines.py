@@ -0,0 +1,169 @@
+"""
+Exam deadline enforcement
+A single scheduler thread keeps a min-heap of (due time, session id) and
+sleeps until the earliest one. When a session's submit cutoff has passed
+(plus two autosave flush intervals, so every worker's buffered progress
+has reached the store) it claims the session, grades the last autosaved
+answers and evicts it. A session whose user already has an active score
+for the topic is evicted without grading.
+
+Scheduling is O(log n); cancelling only drops the session from a dict and
+leaves its heap entry to be skipped when it comes due (the heap is
+compacted once stale entries outnumber live ones). Each worker tracks the
+sessions it started plus, at startup, every live session in the store;
+claiming through session_store.delete makes sure only one of them grades.
+"""
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.core.database import SessionLocal
+from app.models.models import User
+from app.services.autosave import autosave_buffer
+from app.services.exam_service import ExamAlreadyCompleted, finalize_session, submit_cutoff
+from app.services.score_stats import score_stats
+from app.services.session_store import ExamSessionStore, restore_session, session_store
+
+# Failed auto-submits (e.g. database down) are retried after this long
+RETRY_SECONDS = 30
+# Compact the heap when it holds this many more entries than live sessions
+COMPACT_SLACK = 1024
+
+
+class DeadlineScheduler:
+    """Auto-submits exam sessions that are not submitted before their cutoff"""
+
+    def __init__(self, store: ExamSessionStore, delay_seconds: float):
+        self.store = store
+        self.delay_seconds = delay_seconds
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.auto_submitted = 0
+        self.already_completed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="exam-deadlines", daemon=True)
+        self._thread.start()
+
+    def load(self) -> None:
+        """Track every live session in the store (sessions started before a restart)"""
+        try:
+            for session_id, session in self.store.live_sessions():
+                self.track(session_id, session)
+        except Exception as e:
+            print(f"Error loading exam deadlines: {e}")
+
+    def track(self, session_id: str, session: Dict) -> None:
+        self.schedule(session_id, submit_cutoff(session) + self.delay_seconds)
+
+    def schedule(self, session_id: str, due_at: float) -> None:
+        with self._cond:
+            self._due[session_id] = due_at
+            heapq.heappush(self._heap, (due_at, session_id))
+            # Only a new earliest deadline changes how long the thread sleeps
+            if self._heap[0][1] == session_id:
+                self._cond.notify()
+
+    def cancel(self, session_id: str) -> None:
+        """Stop tracking a session (it was submitted)"""
+        with self._cond:
+            if self._due.pop(session_id, None) is None:
+                return
+            if len(self._heap) > 2 * len(self._due) + COMPACT_SLACK:
+                self._heap = [(due_at, s) for s, due_at in self._due.items()]
+                heapq.heapify(self._heap)
+
+    def _next_due(self) -> List[str]:
+        """Block until sessions come due; returns them, or [] when stopping"""
+        with self._cond:
+            while not self._stop:
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due_at, session_id = heapq.heappop(self._heap)
+                    # Skip entries of cancelled or rescheduled sessions
+                    if self._due.get(session_id) == due_at:
+                        del self._due[session_id]
+                        due.append(session_id)
+                if due:
+                    return due
+                self._cond.wait(self._heap[0][0] - now if self._heap else None)
+            return []
+
+    def _run(self) -> None:
+        while True:
+            due = self._next_due()
+            if not due:
+                return
+            for session_id in due:
+                self.expire(session_id)
+
+    def expire(self, session_id: str) -> bool:
+        """
+        Auto-submit a session past its cutoff; False if it was already
+        submitted or its user already completed the topic
+        """
+        session = self.store.delete(session_id)
+        if session is None:
+            return False
+        progress = autosave_buffer.take(session_id, session)
+        db = SessionLocal()
+        try:
+            user_score, _, _ = finalize_session(db, session, progress.get("answers", []))
+            user_name = db.scalar(select(User.name).where(User.id == session["user_id"]))
+            # Read before commit expires the instance
+            score = (user_score.id, user_score.topic_id, user_score.user_id, user_name, user_score.score)
+            db.commit()
+        except ExamAlreadyCompleted:
+            db.rollback()
+            self.already_completed += 1
+            return False
+        except Exception as e:
+            print(f"Error auto-submitting exam session {session_id}: {e}")
+            db.rollback()
+            self.failed += 1
+            # Put it back with its final progress and try again later
+            session["progress"] = progress
+            restore_session(session_id, session)
+            self.schedule(session_id, time.time() + RETRY_SECONDS)
+            return False
+        finally:
+            db.close()
+        score_stats.record(*score)
+        self.auto_submitted += 1
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "tracked_sessions": len(self._due),
+            "heap_entries": len(self._heap),
+            "auto_submitted": self.auto_submitted,
+            "already_completed": self.already_completed,
+            "failed": self.failed
+        }
+
+    def shutdown(self) -> None:
+        # Sessions stay in the store; a shared store's next worker picks them up in load()
+        if self._thread:
+            with self._cond:
+                self._stop = True
+                self._cond.notify()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+exam_deadlines = DeadlineScheduler(
+    session_store,
+    delay_seconds=2 * settings.AUTOSAVE_FLUSH_SECONDS
+)
@@ -0,0 +1,256 @@
+"""
+Exam composition and grading service
+Exam plans (sampled question ids + shuffle seed) are captured at exam start;
+answer keys are rebuilt from the question bank at submit, and the graded
+answers are stored packed alongside the score
+"""
+import random
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import ExamAnswers, Question, UserScore
+from app.services.answer_analytics import pack_answers
+from app.services.question_cache import question_cache, TopicQuestionBank
+from app.services.stats_service import counter_update, EXAMS_TAKEN
+
+
+class ExamAlreadyCompleted(Exception):
+    """Raised when a session is finalized for a topic the user already has an active score in"""
+
+
+def normalize_answer(answer: str) -> str:
+    """Canonical form used when comparing a selected answer to the key"""
+    return answer.strip()
+
+
+def session_deadline(session: Dict) -> float:
+    """End of the exam's duration (epoch seconds)"""
+    if "deadline" in session:
+        return session["deadline"]
+    # Sessions created before deadlines were stored expired right after the grace period
+    return session["expires_at"] - settings.EXAM_SESSION_GRACE_MINUTES * 60
+
+
+def submit_cutoff(session: Dict) -> float:
+    """Last moment answers are accepted: the deadline plus the grace period for late submits"""
+    return session_deadline(session) + settings.EXAM_SESSION_GRACE_MINUTES * 60
+
+
+def new_seed() -> int:
+    return random.SystemRandom().getrandbits(63)
+
+
+def permutation(key: int, n: int) -> List[int]:
+    """Fisher-Yates shuffle of range(n) driven by the digits of a random key"""
+    order = list(range(n))
+    for i in range(n - 1, 0, -1):
+        key, j = divmod(key, i + 1)
+        order[i], order[j] = order[j], order[i]
+    return order
+
+
+@dataclass(frozen=True)
+class ExamPlan:
+    """
+    The questions of one exam in presentation order, plus the seed that
+    fixes their option order; this is all the session keeps about them
+    """
+    seed: int
+    question_ids: Tuple[int, ...]
+    shuffle_options: bool = False
+
+    @classmethod
+    def sample(cls, bank: TopicQuestionBank, seed: int) -> "ExamPlan":
+        """
+        Pick the exam's questions from the bank according to its exam settings
+        Category quotas are drawn first, the rest of question_count uniformly
+        from the remaining questions; the same seed gives the same exam
+        """
+        config = bank.exam_settings
+        if config is None:
+            return cls(seed=seed, question_ids=bank.question_ids)
+
+        rng = random.Random(seed)
+        if config.question_count is None:
+            chosen = list(range(len(bank)))
+        else:
+            chosen = []
+            for category, quota in config.category_quotas:
+                pool = bank.by_category.get(category, ())
+                chosen.extend(rng.sample(pool, min(quota, len(pool))))
+            remaining = min(config.question_count, len(bank)) - len(chosen)
+            if remaining > 0:
+                if chosen:
+                    taken = set(chosen)
+                    rest = [i for i in range(len(bank)) if i not in taken]
+                else:
+                    rest = range(len(bank))
+                chosen.extend(rng.sample(rest, remaining))
+
+        if config.shuffle_questions:
+            rng.shuffle(chosen)
+        else:
+            chosen.sort()
+        return cls(
+            seed=seed,
+            question_ids=tuple(bank.question_ids[i] for i in chosen),
+            shuffle_options=config.shuffle_options
+        )
+
+    @classmethod
+    def from_session(cls, data: Dict) -> "ExamPlan":
+        return cls(
+            seed=data.get("seed", 0),
+            question_ids=tuple(data["question_ids"]),
+            shuffle_options=data.get("shuffle_options", False)
+        )
+
+    def to_session(self) -> Dict:
+        return {
+            "seed": self.seed,
+            "question_ids": list(self.question_ids),
+            "shuffle_options": self.shuffle_options
+        }
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def render_questions(self, bank: TopicQuestionBank) -> bytes:
+        """
+        The plan's questions as a JSON list (QuestionResponse shape), joined
+        from the bank's pre-rendered fragments; questions no longer in the
+        bank are left out
+        """
+        if not self.shuffle_options and self.question_ids == bank.question_ids:
+            return bank.public_json
+        rng = random.Random(self.seed) if self.shuffle_options else None
+        parts = []
+        for question_id in self.question_ids:
+            # One draw per planned question, so a question leaving the bank
+            # does not change the option order of the ones after it
+            key = rng.getrandbits(128) if rng else None
+            i = bank.positions.get(question_id)
+            if i is None:
+                continue
+            fragment = bank.fragments[i]
+            order = None if key is None else permutation(key, len(fragment.options))
+            parts.append(fragment.render(order))
+        return b"[" + b",".join(parts) + b"]"
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """
+    Answer key for one exam: question ids and normalized correct answers
+    as parallel arrays; None marks a question that can no longer be answered
+    """
+    question_ids: Tuple[int, ...]
+    answers: Tuple[Optional[str], ...]
+
+    @classmethod
+    def from_session(cls, data: Dict) -> "AnswerKey":
+        # Sessions created before exam plans carry their own answer key
+        return cls(
+            question_ids=tuple(data["question_ids"]),
+            answers=tuple(data["answer_key"])
+        )
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def grade(self, answers: Iterable[Tuple[int, str]]) -> bytearray:
+        """
+        Grade (question_id, selected_answer) pairs against the key
+        Returns one correct flag per key position; unknown ids are ignored
+        and the last answer given for a question wins
+        """
+        index = {question_id: i for i, question_id in enumerate(self.question_ids)}
+        correct = bytearray(len(self.question_ids))
+        for question_id, selected_answer in answers:
+            i = index.get(question_id)
+            if i is not None and self.answers[i] is not None:
+                correct[i] = normalize_answer(selected_answer) == self.answers[i]
+        return correct
+
+
+def load_answer_key(db: Session, session: Dict) -> AnswerKey:
+    """
+    Answer key for an exam session, read from the cached question bank
+    Questions that left the bank since the exam started (deactivated or
+    moved) are looked up in the database; deleted ones score nothing
+    Sync so async handlers can run it with AsyncSession.run_sync
+    """
+    if "answer_key" in session:
+        return AnswerKey.from_session(session)
+
+    question_ids = session["question_ids"]
+    bank = question_cache.load(db, session["topic_id"])
+    answers = {}
+    missing = []
+    for question_id in question_ids:
+        i = bank.positions.get(question_id)
+        if i is None:
+            missing.append(question_id)
+        else:
+            answers[question_id] = bank.questions[i].correct_answer
+    if missing:
+        answers.update(db.execute(
+            select(Question.id, Question.correct_answer).where(Question.id.in_(missing))
+        ).all())
+
+    return AnswerKey(
+        question_ids=tuple(question_ids),
+        answers=tuple(
+            normalize_answer(answers[question_id]) if question_id in answers else None
+            for question_id in question_ids
+        )
+    )
+
+
+def save_submission(db: Session, user_id: int, topic_id: int, answer_key: AnswerKey, correct: bytearray) -> UserScore:
+    """
+    Add the score, its packed answers and the exams_taken count to the
+    session's transaction; the caller commits (and rolls back on
+    ExamAlreadyCompleted)
+    """
+    user_score = UserScore(
+        user_id=user_id,
+        topic_id=topic_id,
+        score=sum(correct),
+        total_questions=len(answer_key),
+        created_by=user_id
+    )
+    db.add(user_score)
+    try:
+        db.flush()
+    except IntegrityError as e:
+        # ix_user_scores_user_topic_active: one active score per user and topic
+        raise ExamAlreadyCompleted(f"User {user_id} already completed topic {topic_id}") from e
+    
+    question_ids, correct_bitmap = pack_answers(answer_key.question_ids, correct)
+    db.add(ExamAnswers(
+        user_score_id=user_score.id,
+        topic_id=topic_id,
+        question_ids=question_ids,
+        correct=correct_bitmap
+    ))
+    db.execute(counter_update(EXAMS_TAKEN, 1))
+    return user_score
+
+
+def finalize_session(db: Session, session: Dict, answers: Iterable[Tuple[int, str]]) -> Tuple[UserScore, AnswerKey, bytearray]:
+    """
+    Grade a claimed exam session and add its score to the transaction;
+    the caller commits. Shared by submit and the deadline scheduler.
+    Raises ExamAlreadyCompleted if the user already has an active score for
+    the topic (e.g. another session of the same exam was submitted first)
+    """
+    answer_key = load_answer_key(db, session)
+    correct = answer_key.grade(answers)
+    user_score = save_submission(db, session["user_id"], session["topic_id"], answer_key, correct)
+    return user_score, answer_key, correct
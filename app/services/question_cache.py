@@ -0,0 +1,279 @@
+"""
+Per-topic question bank cache
+Keeps the active questions of recently used topics in memory so exam start
+and grading do not reload question content from the database
+
+Each topic has a version counter; writes to a topic's questions or exam
+settings must call invalidate(topic_id), which bumps the version and drops
+the cached bank. Entries also expire after QUESTION_CACHE_TTL_SECONDS so
+that edits made through another worker process are picked up eventually.
+
+Each bank also carries its public question list (no correct answers)
+already rendered to JSON bytes, so exam start never re-serializes it, and
+the same JSON per question (split around the options) for sampled exams.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import Question, TopicExamSettings
+
+
+@dataclass(frozen=True)
+class CachedQuestion:
+    id: int
+    uuid: str
+    question_text: str
+    options: Tuple[str, ...]
+    question_type: str
+    correct_answer: str
+    category: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ExamSettings:
+    question_count: Optional[int]
+    category_quotas: Tuple[Tuple[str, int], ...]
+    shuffle_questions: bool
+    shuffle_options: bool
+
+
+@dataclass(frozen=True)
+class QuestionFragment:
+    """
+    One question's public JSON split around its options, so an exam can
+    present the options in another order without re-encoding the question
+    """
+    head: bytes
+    options: Tuple[bytes, ...]
+    tail: bytes
+
+    def render(self, order: Optional[Sequence[int]] = None) -> bytes:
+        options = self.options if order is None else [self.options[i] for i in order]
+        return b"".join((self.head, b",".join(options), self.tail))
+
+
+@dataclass(frozen=True)
+class TopicQuestionBank:
+    topic_id: int
+    version: int
+    loaded_at: float
+    questions: Tuple[CachedQuestion, ...]
+    public_json: bytes
+    fragments: Tuple[QuestionFragment, ...]
+    question_ids: Tuple[int, ...]
+    positions: Dict[int, int]  # question id -> index in questions
+    by_category: Dict[Optional[str], Tuple[int, ...]]  # category -> indexes in questions
+    exam_settings: Optional[ExamSettings] = None
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+
+def _decode_options(options) -> Tuple[str, ...]:
+    # Question.options is already decoded by its column type
+    return tuple(options or ())
+
+
+def _exam_settings(row) -> Optional[ExamSettings]:
+    if row is None:
+        return None
+    return ExamSettings(
+        question_count=row.question_count,
+        category_quotas=tuple(sorted((row.category_quotas or {}).items())),
+        shuffle_questions=row.shuffle_questions,
+        shuffle_options=row.shuffle_options
+    )
+
+
+def dump_json(content) -> bytes:
+    """Encode JSON the same way Starlette's JSONResponse does"""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def question_fragment(q: CachedQuestion) -> QuestionFragment:
+    """Render one question in the QuestionResponse shape (no correct answer)"""
+    return QuestionFragment(
+        head=b"".join((
+            b'{"id":', dump_json(q.id),
+            b',"uuid":', dump_json(q.uuid),
+            b',"question_text":', dump_json(q.question_text),
+            b',"options":['
+        )),
+        options=tuple(dump_json(o) for o in q.options),
+        tail=b'],"question_type":' + dump_json(q.question_type) + b"}"
+    )
+
+
+def render_public_questions(questions: Iterable[CachedQuestion]) -> bytes:
+    """Render the user-facing question list (QuestionResponse shape) as JSON"""
+    return b"[" + b",".join(question_fragment(q).render() for q in questions) + b"]"
+
+
+def build_bank(
+    topic_id: int,
+    version: int,
+    questions: Tuple[CachedQuestion, ...],
+    exam_settings: Optional[ExamSettings] = None
+) -> TopicQuestionBank:
+    fragments = tuple(question_fragment(q) for q in questions)
+    by_category: Dict[Optional[str], list] = {}
+    for i, q in enumerate(questions):
+        by_category.setdefault(q.category, []).append(i)
+    return TopicQuestionBank(
+        topic_id=topic_id,
+        version=version,
+        loaded_at=time.monotonic(),
+        questions=questions,
+        public_json=b"[" + b",".join(f.render() for f in fragments) + b"]",
+        fragments=fragments,
+        question_ids=tuple(q.id for q in questions),
+        positions={q.id: i for i, q in enumerate(questions)},
+        by_category={category: tuple(indexes) for category, indexes in by_category.items()},
+        exam_settings=exam_settings
+    )
+
+
+class QuestionCache:
+    """
+    Bounded LRU of TopicQuestionBank objects keyed by topic id
+    """
+
+    def __init__(self, max_topics: int, ttl_seconds: int):
+        self.max_topics = max_topics
+        self.ttl_seconds = ttl_seconds
+        self._banks: "OrderedDict[int, TopicQuestionBank]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, topic_id: int) -> int:
+        return self._versions.get(topic_id, 0)
+
+    def get(self, topic_id: int) -> Optional[TopicQuestionBank]:
+        with self._lock:
+            bank = self._banks.get(topic_id)
+            if bank is None:
+                return None
+            if (
+                bank.version != self._versions.get(topic_id, 0)
+                or time.monotonic() - bank.loaded_at > self.ttl_seconds
+            ):
+                del self._banks[topic_id]
+                return None
+            self._banks.move_to_end(topic_id)
+            return bank
+
+    def put(self, bank: TopicQuestionBank) -> None:
+        with self._lock:
+            # A concurrent invalidate() may have happened while loading
+            if bank.version != self._versions.get(bank.topic_id, 0):
+                return
+            self._banks[bank.topic_id] = bank
+            self._banks.move_to_end(bank.topic_id)
+            while len(self._banks) > self.max_topics:
+                self._banks.popitem(last=False)
+
+    def invalidate(self, topic_id: int) -> None:
+        with self._lock:
+            self._versions[topic_id] = self._versions.get(topic_id, 0) + 1
+            self._banks.pop(topic_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            for topic_id in self._banks:
+                self._versions[topic_id] = self._versions.get(topic_id, 0) + 1
+            self._banks.clear()
+
+    def _lookup(self, topic_id: int) -> Optional[TopicQuestionBank]:
+        bank = self.get(topic_id)
+        if bank is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return bank
+
+    @staticmethod
+    def _query(topic_id: int):
+        return select(
+            Question.id,
+            Question.uuid,
+            Question.question_text,
+            Question.options,
+            Question.question_type,
+            Question.correct_answer,
+            Question.category
+        ).where(
+            Question.topic_id == topic_id,
+            Question.is_active == True
+        ).order_by(Question.id)
+
+    @staticmethod
+    def _settings_query(topic_id: int):
+        return select(
+            TopicExamSettings.question_count,
+            TopicExamSettings.category_quotas,
+            TopicExamSettings.shuffle_questions,
+            TopicExamSettings.shuffle_options
+        ).where(TopicExamSettings.topic_id == topic_id)
+
+    def load(self, db: Session, topic_id: int) -> TopicQuestionBank:
+        """
+        Return the cached bank for a topic, loading it on a miss
+        """
+        bank = self._lookup(topic_id)
+        if bank is None:
+            version = self.version(topic_id)
+            rows = db.execute(self._query(topic_id)).all()
+            settings_row = db.execute(self._settings_query(topic_id)).first()
+            bank = self._store(topic_id, version, rows, settings_row)
+        return bank
+
+    async def load_async(self, db: AsyncSession, topic_id: int) -> TopicQuestionBank:
+        """
+        Async variant of load() for handlers using the async engine
+        """
+        bank = self._lookup(topic_id)
+        if bank is None:
+            version = self.version(topic_id)
+            rows = (await db.execute(self._query(topic_id))).all()
+            settings_row = (await db.execute(self._settings_query(topic_id))).first()
+            bank = self._store(topic_id, version, rows, settings_row)
+        return bank
+
+    def _store(self, topic_id: int, version: int, rows, settings_row) -> TopicQuestionBank:
+        questions = tuple(
+            CachedQuestion(
+                id=row.id,
+                uuid=row.uuid,
+                question_text=row.question_text,
+                options=_decode_options(row.options),
+                question_type=row.question_type,
+                correct_answer=row.correct_answer,
+                category=row.category
+            ) for row in rows
+        )
+        bank = build_bank(topic_id, version, questions, _exam_settings(settings_row))
+        self.put(bank)
+        return bank
+
+
+question_cache = QuestionCache(
+    max_topics=settings.QUESTION_CACHE_MAX_TOPICS,
+    ttl_seconds=settings.QUESTION_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,119 @@
+"""
+Bulk question import
+Parses JSON Lines or CSV uploads row by row and inserts valid rows in
+batched executemany chunks inside a single transaction
+"""
+import csv
+import json
+from typing import Dict, IO, Iterator, List, Set, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Question, Topic
+from app.schemas.schemas import QuestionCreate
+from app.services.question_cache import question_cache
+
+IMPORT_BATCH_SIZE = 500
+
+
+def _parse_csv_options(value: str) -> List[str]:
+    """CSV options are a JSON array, or a "|"-separated list"""
+    value = (value or "").strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [o.strip() for o in value.split("|") if o.strip()]
+
+
+def iter_jsonl_rows(stream: IO[str]) -> Iterator[Tuple[int, Union[Dict, Exception]]]:
+    """Yield (line number, row) pairs; unparsable lines yield the error instead"""
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+
+
+def iter_csv_rows(stream: IO[str]) -> Iterator[Tuple[int, Union[Dict, Exception]]]:
+    """Yield (line number, row) pairs; unparsable rows yield the error instead"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        row = dict(row)
+        try:
+            row["options"] = _parse_csv_options(row.get("options"))
+        except ValueError as e:
+            yield reader.line_num, e
+            continue
+        yield reader.line_num, row
+
+
+def _format_error(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+        )
+    return str(e)
+
+
+def import_questions(
+    db: Session,
+    stream: IO[str],
+    file_format: str,
+    created_by: int
+) -> Dict:
+    """
+    Validate and insert questions from an uploaded file
+    Invalid rows are skipped and reported; valid rows are committed together
+    Returns {"inserted", "failed", "errors": [{"row", "error"}]}
+    """
+    active_topics: Set[int] = set(
+        db.execute(select(Topic.id).where(Topic.is_active == True)).scalars()
+    )
+    rows = iter_jsonl_rows(stream) if file_format == "jsonl" else iter_csv_rows(stream)
+
+    batch: List[Dict] = []
+    affected_topics: Set[int] = set()
+    errors: List[Dict] = []
+    inserted = 0
+
+    for line_no, raw in rows:
+        try:
+            if isinstance(raw, Exception):
+                raise raw
+            question = QuestionCreate.model_validate(raw)
+            if question.topic_id not in active_topics:
+                raise ValueError(f"topic_id {question.topic_id} does not exist")
+            if not question.options:
+                raise ValueError("options must not be empty")
+        except ValueError as e:
+            # Covers json.JSONDecodeError and pydantic's ValidationError
+            errors.append({"row": line_no, "error": _format_error(e)})
+            continue
+
+        batch.append({
+            "question_text": question.question_text,
+            "options": question.options,
+            "question_type": question.question_type,
+            "correct_answer": question.correct_answer,
+            "topic_id": question.topic_id,
+            "category": question.category or None,
+            "created_by": created_by
+        })
+        affected_topics.add(question.topic_id)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            db.execute(insert(Question), batch)
+            inserted += len(batch)
+            batch = []
+
+    if batch:
+        db.execute(insert(Question), batch)
+        inserted += len(batch)
+
+    db.commit()
+    for topic_id in affected_topics:
+        question_cache.invalidate(topic_id)
+
+    return {"inserted": inserted, "failed": len(errors), "errors": errors}
@@ -0,0 +1,178 @@
+"""
+Exam results queries
+Single joined, column-only query over user_scores with filters and
+keyset pagination on (created_at, id), newest first
+Also streams full exports (CSV / NDJSON) in constant memory
+"""
+import base64
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import literal, or_, select, DateTime
+from sqlalchemy.dialects import sqlite
+
+from app.core.database import SessionLocal
+from app.models.models import User, Topic, UserScore
+
+
+# created_at is filled by CURRENT_TIMESTAMP, which SQLite stores as text
+# without fractional seconds; bind timestamps in the same format so the
+# text comparison (and equality in the keyset predicate) is exact
+Timestamp = DateTime().with_variant(
+    sqlite.DATETIME(
+        storage_format="%(year)04d-%(month)02d-%(day)02d "
+                       "%(hour)02d:%(minute)02d:%(second)02d"
+    ),
+    "sqlite"
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, score_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{score_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii")
+        created_at, score_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(score_id)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def results_query(
+    user_id: Optional[int] = None,
+    topic_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    certificate_issued: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    """
+    Build the results SELECT; rows carry the UserScoreResponse fields
+    date_from is inclusive, date_to exclusive
+    """
+    stmt = select(
+        UserScore.id,
+        UserScore.score,
+        UserScore.certificate_issued,
+        UserScore.created_at,
+        UserScore.user_id,
+        UserScore.topic_id,
+        User.name.label("user_name"),
+        Topic.name.label("topic_name")
+    ).join(
+        User, User.id == UserScore.user_id
+    ).join(
+        Topic, Topic.id == UserScore.topic_id
+    ).where(
+        UserScore.is_active == True
+    )
+
+    if user_id is not None:
+        stmt = stmt.where(UserScore.user_id == user_id)
+    if topic_id is not None:
+        stmt = stmt.where(UserScore.topic_id == topic_id)
+    if date_from is not None:
+        stmt = stmt.where(UserScore.created_at >= literal(date_from, Timestamp))
+    if date_to is not None:
+        stmt = stmt.where(UserScore.created_at < literal(date_to, Timestamp))
+    if certificate_issued is not None:
+        stmt = stmt.where(UserScore.certificate_issued == certificate_issued)
+
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        after_created_at = literal(after_created_at, Timestamp)
+        # The redundant upper bound lets the planner seek the (created_at, id)
+        # index instead of scanning it to evaluate the OR
+        stmt = stmt.where(
+            UserScore.created_at <= after_created_at,
+            or_(
+                UserScore.created_at < after_created_at,
+                UserScore.id < after_id
+            )
+        )
+
+    stmt = stmt.order_by(UserScore.created_at.desc(), UserScore.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def next_cursor(rows, limit: int) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this was the last page"""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last["created_at"], last["id"])
+
+
+EXPORT_COLUMNS = (
+    "id", "score", "certificate_issued", "created_at",
+    "user_id", "topic_id", "user_name", "topic_name"
+)
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_chunk(rows, export_format: str) -> bytes:
+    if export_format == "ndjson":
+        return "".join(
+            json.dumps({c: _export_value(row[c]) for c in EXPORT_COLUMNS}, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_export_value(row[c]) for c in EXPORT_COLUMNS] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def iter_results_export(
+    export_format: str = "csv",
+    compress: bool = False,
+    chunk_size: int = 1000,
+    **filters
+) -> Iterator[bytes]:
+    """
+    Yield the export body chunk by chunk
+    Rows are fetched through a server-side cursor (stream_results + yield_per),
+    so memory stays bounded by chunk_size regardless of table size
+    Uses its own session because it runs while the response is being sent
+    """
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        return gzip.compress(data) if gzip else data
+
+    if export_format == "csv":
+        header = io.StringIO()
+        csv.writer(header).writerow(EXPORT_COLUMNS)
+        yield emit(header.getvalue().encode("utf-8"))
+
+    db = SessionLocal()
+    try:
+        stmt = results_query(**filters).execution_options(
+            stream_results=True, yield_per=chunk_size
+        )
+        result = db.execute(stmt).mappings()
+        for rows in result.partitions(chunk_size):
+            data = emit(_encode_chunk(rows, export_format))
+            if data:
+                yield data
+    finally:
+        db.close()
+
+    if gzip:
+        yield gzip.flush()
@@ -0,0 +1,322 @@
+"""
+Per-topic score distributions
+Histograms of active exam scores per topic plus a top-N leaderboard, kept
+in memory so percentile ranks, leaderboards and summaries never scan
+user_scores
+
+Each worker rebuilds them from the database (vectorized with NumPy) at
+startup and in the background every SCORE_STATS_REBUILD_SECONDS, records
+its own submissions directly and catches up on other workers' rows by id. The catch-up re-reads
+SCORE_STATS_ID_OVERLAP ids below the highest one applied and skips ids it
+has already seen, so rows committed out of id order are not missed.
+Deactivated scores drop out at the next full rebuild.
+"""
+import bisect
+import threading
+import time
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.database import SessionLocal
+from app.models.models import User, UserScore
+
+REBUILD_CHUNK_SIZE = 100000
+QUANTILES = (("p25", 0.25), ("median", 0.5), ("p75", 0.75), ("p90", 0.9))
+
+
+@dataclass(frozen=True)
+class LeaderboardEntry:
+    rank: int
+    user_score_id: int
+    user_id: int
+    user_name: str
+    score: int
+
+
+class TopicScores:
+    """Score histogram (index = score) and leaderboard of one topic"""
+
+    def __init__(self, leaderboard_size: int):
+        self.histogram = np.zeros(1, dtype=np.int64)
+        self._cumulative: Optional[np.ndarray] = None
+        # (-score, user_score_id, user_id, user_name): best score first, earliest on ties
+        self.leaderboard: List[Tuple[int, int, int, str]] = []
+        self.leaderboard_size = leaderboard_size
+
+    @property
+    def cumulative(self) -> np.ndarray:
+        if self._cumulative is None:
+            self._cumulative = np.cumsum(self.histogram)
+        return self._cumulative
+
+    @property
+    def count(self) -> int:
+        return int(self.cumulative[-1])
+
+    def _grow(self, size: int) -> None:
+        if size > len(self.histogram):
+            self.histogram = np.pad(self.histogram, (0, size - len(self.histogram)))
+
+    def add_counts(self, counts: np.ndarray) -> None:
+        self._grow(len(counts))
+        self.histogram[:len(counts)] += counts
+        self._cumulative = None
+
+    def add(self, score: int) -> None:
+        self._grow(score + 1)
+        self.histogram[score] += 1
+        self._cumulative = None
+
+    def offer(self, user_score_id: int, user_id: int, user_name: str, score: int) -> None:
+        entry = (-score, user_score_id, user_id, user_name)
+        board = self.leaderboard
+        if len(board) < self.leaderboard_size or entry < board[-1]:
+            if any(e[1] == user_score_id for e in board):
+                return
+            bisect.insort(board, entry)
+            del board[self.leaderboard_size:]
+
+    def percentile(self, score: int) -> Optional[float]:
+        """
+        Percentile rank of a score: share of exams scoring lower, counting
+        equal scores as half
+        """
+        n = self.count
+        if n == 0:
+            return None
+        cumulative = self.cumulative
+        below = int(cumulative[min(score, len(cumulative)) - 1]) if score > 0 else 0
+        equal = int(self.histogram[score]) if 0 <= score < len(self.histogram) else 0
+        return 100.0 * (below + 0.5 * equal) / n
+
+    def summary(self) -> Dict:
+        n = self.count
+        if n == 0:
+            return {"count": 0, "histogram": []}
+        histogram = self.histogram
+        scores = np.arange(len(histogram))
+        mean = float(scores @ histogram) / n
+        variance = float(((scores - mean) ** 2) @ histogram) / n
+        nonzero = np.flatnonzero(histogram)
+        positions = np.searchsorted(self.cumulative, [q * n for _, q in QUANTILES], side="left")
+        return {
+            "count": n,
+            "mean": mean,
+            "stdev": variance ** 0.5,
+            "min": int(nonzero[0]),
+            "max": int(nonzero[-1]),
+            **{name: int(p) for (name, _), p in zip(QUANTILES, positions)},
+            "histogram": histogram[:nonzero[-1] + 1].tolist()
+        }
+
+
+class ScoreStats:
+    """
+    Per-topic TopicScores of one worker, with the id watermark used to catch
+    up on submissions made elsewhere
+    """
+
+    def __init__(self, leaderboard_size: int, refresh_seconds: int, rebuild_seconds: int, id_overlap: int):
+        self.leaderboard_size = leaderboard_size
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.id_overlap = id_overlap
+        self._topics: Dict[int, TopicScores] = {}
+        self._watermark = 0
+        self._applied: Set[int] = set()  # applied ids above watermark - id_overlap
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._rebuilt_at: Optional[float] = None
+
+    def _topic(self, topics: Dict[int, TopicScores], topic_id: int) -> TopicScores:
+        topic = topics.get(topic_id)
+        if topic is None:
+            topic = topics[topic_id] = TopicScores(self.leaderboard_size)
+        return topic
+
+    def _apply(self, user_score_id: int, topic_id: int, user_id: int, user_name: str, score: int) -> None:
+        """Add one score unless already applied; caller holds the lock"""
+        if user_score_id in self._applied or user_score_id <= self._watermark - self.id_overlap:
+            return
+        self._applied.add(user_score_id)
+        self._watermark = max(self._watermark, user_score_id)
+        topic = self._topic(self._topics, topic_id)
+        topic.add(score)
+        topic.offer(user_score_id, user_id, user_name, score)
+
+    def record(self, user_score_id: int, topic_id: int, user_id: int, user_name: str, score: int) -> None:
+        """Apply a submission made by this worker (after its commit)"""
+        with self._lock:
+            self._apply(user_score_id, topic_id, user_id, user_name, score)
+
+    def rebuild(self, db: Session) -> None:
+        """Recompute every topic from the active user_scores rows"""
+        topics: Dict[int, TopicScores] = {}
+        watermark = 0
+        recent_ids = np.zeros(0, dtype=np.int64)
+        stmt = select(
+            UserScore.id, UserScore.topic_id, UserScore.score
+        ).where(
+            UserScore.is_active == True
+        ).execution_options(stream_results=True, yield_per=REBUILD_CHUNK_SIZE)
+        # Core execution on the session's connection skips the ORM result wrapping
+        for rows in db.connection().execute(stmt).partitions(REBUILD_CHUNK_SIZE):
+            # fromiter over the flattened rows; np.array() on Row objects is far slower
+            ids, topic_ids, scores = np.fromiter(
+                chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)
+            ).reshape(-1, 3).T
+            scores = np.maximum(scores, 0)
+            # One bincount over (topic, score) pairs for the whole chunk
+            chunk_topics, topic_index = np.unique(topic_ids, return_inverse=True)
+            width = int(scores.max()) + 1
+            counts = np.bincount(
+                topic_index * width + scores, minlength=len(chunk_topics) * width
+            ).reshape(len(chunk_topics), width)
+            for topic_id, topic_counts in zip(chunk_topics.tolist(), counts):
+                self._topic(topics, topic_id).add_counts(topic_counts)
+            watermark = max(watermark, int(ids.max()))
+            # Ids that can still fall inside the final overlap window
+            recent_ids = np.concatenate((recent_ids, ids))
+            recent_ids = recent_ids[recent_ids > watermark - self.id_overlap]
+
+        ranked = select(
+            UserScore.id,
+            UserScore.topic_id,
+            UserScore.score,
+            UserScore.user_id,
+            func.row_number().over(
+                partition_by=UserScore.topic_id,
+                order_by=(UserScore.score.desc(), UserScore.id)
+            ).label("rank")
+        ).where(UserScore.is_active == True).subquery()
+        leaders = db.execute(
+            select(
+                ranked.c.id, ranked.c.topic_id, ranked.c.score, ranked.c.user_id, User.name
+            ).join(
+                User, User.id == ranked.c.user_id
+            ).where(ranked.c.rank <= self.leaderboard_size)
+        ).all()
+        for user_score_id, topic_id, score, user_id, user_name in leaders:
+            self._topic(topics, topic_id).offer(user_score_id, user_id, user_name, score)
+
+        with self._lock:
+            self._topics = topics
+            self._watermark = watermark
+            self._applied = set(recent_ids.tolist())
+            self._rebuilt_at = self._refreshed_at = time.monotonic()
+
+    def catch_up(self, db: Session) -> int:
+        """Apply user_scores rows committed since the last catch-up; returns rows applied"""
+        with self._lock:
+            since = self._watermark - self.id_overlap
+        rows = db.execute(
+            select(
+                UserScore.id, UserScore.topic_id, UserScore.user_id, User.name, UserScore.score
+            ).join(
+                User, User.id == UserScore.user_id
+            ).where(
+                UserScore.id > since,
+                UserScore.is_active == True
+            ).order_by(UserScore.id)
+        ).all()
+        with self._lock:
+            before = len(self._applied)
+            for row in rows:
+                self._apply(*row)
+            applied = len(self._applied) - before
+            low = self._watermark - self.id_overlap
+            self._applied = {i for i in self._applied if i > low}
+            self._refreshed_at = time.monotonic()
+        return applied
+
+    def refresh(self, db: Session) -> None:
+        """
+        Catch up if the last refresh is older than refresh_seconds; a due
+        full rebuild runs on a background thread while every caller keeps
+        reading the current data (inline only when there is no data yet)
+        """
+        now = time.monotonic()
+        if now - self._refreshed_at < self.refresh_seconds:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        if self._rebuilt_at is not None and now - self._rebuilt_at >= self.rebuild_seconds:
+            # The thread releases _refresh_lock when the new snapshot is in place
+            try:
+                threading.Thread(target=self._background_rebuild, name="score-stats-rebuild", daemon=True).start()
+            except Exception:
+                self._refresh_lock.release()
+                raise
+            return
+        try:
+            if self._rebuilt_at is None:
+                self.rebuild(db)
+            else:
+                self.catch_up(db)
+        finally:
+            self._refresh_lock.release()
+
+    def _background_rebuild(self) -> None:
+        db = SessionLocal()
+        try:
+            self.rebuild(db)
+        except Exception as e:
+            print(f"Error rebuilding score distributions: {e}")
+            # Retry at the next refresh interval, not on every request
+            with self._lock:
+                self._refreshed_at = time.monotonic()
+        finally:
+            db.close()
+            self._refresh_lock.release()
+
+    def load(self) -> None:
+        """Initial rebuild at startup; on failure the first refresh retries"""
+        db = SessionLocal()
+        try:
+            self.rebuild(db)
+        except Exception as e:
+            print(f"Error loading score distributions: {e}")
+        finally:
+            db.close()
+
+    def percentile(self, topic_id: int, score: int) -> Tuple[Optional[float], int]:
+        """(percentile rank, number of scores) for a score in a topic"""
+        with self._lock:
+            topic = self._topics.get(topic_id)
+            if topic is None:
+                return None, 0
+            return topic.percentile(score), topic.count
+
+    def leaderboard(self, topic_id: int, limit: int) -> List[LeaderboardEntry]:
+        with self._lock:
+            topic = self._topics.get(topic_id)
+            board = topic.leaderboard[:limit] if topic else []
+        return [
+            LeaderboardEntry(
+                rank=rank,
+                user_score_id=user_score_id,
+                user_id=user_id,
+                user_name=user_name,
+                score=-negative_score
+            ) for rank, (negative_score, user_score_id, user_id, user_name) in enumerate(board, start=1)
+        ]
+
+    def summary(self, topic_id: int) -> Dict:
+        with self._lock:
+            topic = self._topics.get(topic_id)
+            return topic.summary() if topic else {"count": 0, "histogram": []}
+
+
+score_stats = ScoreStats(
+    leaderboard_size=settings.SCORE_LEADERBOARD_SIZE,
+    refresh_seconds=settings.SCORE_STATS_REFRESH_SECONDS,
+    rebuild_seconds=settings.SCORE_STATS_REBUILD_SECONDS,
+    id_overlap=settings.SCORE_STATS_ID_OVERLAP
+)
@@ -0,0 +1,398 @@
+"""
+Exam session store
+Pluggable storage for active exam sessions with per-session TTL
+
+Each backend also indexes the latest session per (user_id, topic_id), so a
+student's live exam for a topic can be found without scanning
+
+Backends:
+- memory: process-local dict, single worker / development only
+- redis:  shared across workers and restarts (Redis protocol, native TTL)
+- sqlite: shared local stand-in for tests and single-host deployments
+"""
+import heapq
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from app.config import settings
+
+
+class ExamSessionStore:
+    """
+    Base interface for exam session storage
+    Sessions are JSON-serializable dicts keyed by exam_session_id
+    """
+
+    # Calls do network / disk I/O; async callers run them in a threadpool
+    blocking = True
+
+    def create(self, session_id: str, data: Dict, ttl_seconds: int) -> None:
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def update(self, session_id: str, data: Dict) -> bool:
+        """Replace session data, keeping its original expiry"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> Optional[Dict]:
+        """Remove a session and return its last data (if it was still live)"""
+        raise NotImplementedError
+
+    def _owned_id(self, user_id: int, topic_id: int) -> Optional[str]:
+        """Id of the session last created for a user and topic (may be gone)"""
+        raise NotImplementedError
+
+    def find(self, user_id: int, topic_id: int) -> Optional[Tuple[str, Dict]]:
+        """(session_id, data) of a user's live session for a topic, if any"""
+        session_id = self._owned_id(user_id, topic_id)
+        if session_id is None:
+            return None
+        data = self.get(session_id)
+        if data is None or data.get("user_id") != user_id or data.get("topic_id") != topic_id:
+            return None
+        return session_id, data
+
+    def purge_expired(self) -> int:
+        """Remove expired sessions, returns number removed"""
+        return 0
+
+    def live_sessions(self) -> Iterator[Tuple[str, Dict]]:
+        """(session_id, data) of every live session"""
+        return iter(())
+
+    def close(self) -> None:
+        pass
+
+
+class _SweeperMixin:
+    """Runs purge_expired() periodically on a daemon thread"""
+
+    _sweeper: Optional[threading.Thread] = None
+
+    def _start_sweeper(self, interval_seconds: int) -> None:
+        self._stop = threading.Event()
+        self._sweeper = threading.Thread(
+            target=self._sweep_loop,
+            args=(interval_seconds,),
+            name=f"{type(self).__name__}-sweeper",
+            daemon=True
+        )
+        self._sweeper.start()
+
+    def _sweep_loop(self, interval_seconds: int) -> None:
+        while not self._stop.wait(interval_seconds):
+            try:
+                self.purge_expired()
+            except Exception as e:
+                print(f"Error purging exam sessions: {e}")
+
+    def close(self) -> None:
+        if self._sweeper is not None:
+            self._stop.set()
+
+
+class InMemorySessionStore(_SweeperMixin, ExamSessionStore):
+    """
+    Process-local store: dict for O(1) lookup, min-heap of expiries for sweeping
+    Not visible to other workers; use redis or sqlite when running more than one
+    """
+
+    blocking = False
+
+    def __init__(self, sweep_interval_seconds: int = 60):
+        self._sessions: Dict[str, tuple] = {}
+        self._owners: Dict[Tuple[int, int], str] = {}
+        self._expiries = []
+        self._lock = threading.Lock()
+        self._start_sweeper(sweep_interval_seconds)
+
+    def create(self, session_id: str, data: Dict, ttl_seconds: int) -> None:
+        expires_at = time.monotonic() + ttl_seconds
+        payload = json.dumps(data)
+        with self._lock:
+            self._sessions[session_id] = (expires_at, payload)
+            heapq.heappush(self._expiries, (expires_at, session_id))
+            if "user_id" in data:
+                self._owners[data["user_id"], data["topic_id"]] = session_id
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        entry = self._sessions.get(session_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return json.loads(entry[1])
+
+    def update(self, session_id: str, data: Dict) -> bool:
+        payload = json.dumps(data)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] <= time.monotonic():
+                return False
+            self._sessions[session_id] = (entry[0], payload)
+        return True
+
+    def delete(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        data = json.loads(entry[1])
+        self._drop_owner(data, session_id)
+        return data
+
+    def _drop_owner(self, data: Dict, session_id: str) -> None:
+        key = (data.get("user_id"), data.get("topic_id"))
+        with self._lock:
+            if self._owners.get(key) == session_id:
+                del self._owners[key]
+
+    def _owned_id(self, user_id: int, topic_id: int) -> Optional[str]:
+        return self._owners.get((user_id, topic_id))
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            while self._expiries and self._expiries[0][0] <= now:
+                expires_at, session_id = heapq.heappop(self._expiries)
+                entry = self._sessions.get(session_id)
+                # Skip heap entries for sessions that were deleted or re-created
+                if entry is not None and entry[0] == expires_at:
+                    del self._sessions[session_id]
+                    removed += 1
+            if removed:
+                self._owners = {k: s for k, s in self._owners.items() if s in self._sessions}
+        return removed
+
+    def live_sessions(self) -> Iterator[Tuple[str, Dict]]:
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._sessions.items())
+        for session_id, (expires_at, payload) in entries:
+            if expires_at > now:
+                yield session_id, json.loads(payload)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class RedisSessionStore(ExamSessionStore):
+    """
+    Shared store over the Redis protocol
+    Expiry is handled by Redis itself (SET ... EX), so no sweeper is needed
+    """
+
+    key_prefix = "exam_session:"
+    owner_prefix = "exam_session_owner:"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "EXAM_SESSION_BACKEND=redis requires the 'redis' package"
+            ) from e
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, session_id: str) -> str:
+        return self.key_prefix + session_id
+
+    def _owner_key(self, user_id: int, topic_id: int) -> str:
+        return f"{self.owner_prefix}{user_id}:{topic_id}"
+
+    def create(self, session_id: str, data: Dict, ttl_seconds: int) -> None:
+        pipe = self._client.pipeline()
+        pipe.set(self._key(session_id), json.dumps(data), ex=ttl_seconds)
+        if "user_id" in data:
+            # Expires with the session; a stale pointer is ignored by find()
+            pipe.set(self._owner_key(data["user_id"], data["topic_id"]), session_id, ex=ttl_seconds)
+        pipe.execute()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        payload = self._client.get(self._key(session_id))
+        return json.loads(payload) if payload is not None else None
+
+    def update(self, session_id: str, data: Dict) -> bool:
+        # XX: only if it still exists, KEEPTTL: keep the original deadline
+        return bool(self._client.set(
+            self._key(session_id), json.dumps(data), xx=True, keepttl=True
+        ))
+
+    def delete(self, session_id: str) -> Optional[Dict]:
+        payload = self._client.getdel(self._key(session_id))
+        return json.loads(payload) if payload is not None else None
+
+    def _owned_id(self, user_id: int, topic_id: int) -> Optional[str]:
+        session_id = self._client.get(self._owner_key(user_id, topic_id))
+        return session_id.decode() if session_id is not None else None
+
+    def live_sessions(self) -> Iterator[Tuple[str, Dict]]:
+        keys = []
+        for key in self._client.scan_iter(match=self.key_prefix + "*", count=1000):
+            keys.append(key)
+            if len(keys) == 1000:
+                yield from self._load(keys)
+                keys = []
+        yield from self._load(keys)
+
+    def _load(self, keys) -> Iterator[Tuple[str, Dict]]:
+        if not keys:
+            return
+        for key, payload in zip(keys, self._client.mget(keys)):
+            # Expired or deleted between SCAN and MGET
+            if payload is not None:
+                yield key.decode()[len(self.key_prefix):], json.loads(payload)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class SQLiteSessionStore(_SweeperMixin, ExamSessionStore):
+    """
+    Shared store in a local SQLite file
+    Visible to every worker on the same host; stand-in for Redis in tests
+    """
+
+    def __init__(self, path: str, sweep_interval_seconds: int = 60):
+        self._local = threading.local()
+        self._path = path
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS exam_sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_exam_sessions_expires_at"
+            " ON exam_sessions (expires_at)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS exam_session_owners ("
+            " user_id INTEGER NOT NULL,"
+            " topic_id INTEGER NOT NULL,"
+            " session_id TEXT NOT NULL,"
+            " PRIMARY KEY (user_id, topic_id))"
+        )
+        self._start_sweeper(sweep_interval_seconds)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit mode
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, session_id: str, data: Dict, ttl_seconds: int) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO exam_sessions (session_id, data, expires_at)"
+            " VALUES (?, ?, ?)",
+            (session_id, json.dumps(data), time.time() + ttl_seconds)
+        )
+        if "user_id" in data:
+            conn.execute(
+                "INSERT OR REPLACE INTO exam_session_owners (user_id, topic_id, session_id)"
+                " VALUES (?, ?, ?)",
+                (data["user_id"], data["topic_id"], session_id)
+            )
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT data FROM exam_sessions WHERE session_id = ? AND expires_at > ?",
+            (session_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, session_id: str, data: Dict) -> bool:
+        cursor = self._conn().execute(
+            "UPDATE exam_sessions SET data = ? WHERE session_id = ? AND expires_at > ?",
+            (json.dumps(data), session_id, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, session_id: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "DELETE FROM exam_sessions WHERE session_id = ? AND expires_at > ?"
+            " RETURNING data",
+            (session_id, time.time())
+        ).fetchone()
+        if row is None:
+            # Drop an already-expired row too, if any
+            self._conn().execute(
+                "DELETE FROM exam_sessions WHERE session_id = ?", (session_id,)
+            )
+            return None
+        self._conn().execute(
+            "DELETE FROM exam_session_owners WHERE session_id = ?", (session_id,)
+        )
+        return json.loads(row[0])
+
+    def _owned_id(self, user_id: int, topic_id: int) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT session_id FROM exam_session_owners WHERE user_id = ? AND topic_id = ?",
+            (user_id, topic_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self) -> int:
+        conn = self._conn()
+        cursor = conn.execute(
+            "DELETE FROM exam_sessions WHERE expires_at <= ?", (time.time(),)
+        )
+        conn.execute(
+            "DELETE FROM exam_session_owners WHERE session_id NOT IN"
+            " (SELECT session_id FROM exam_sessions)"
+        )
+        return cursor.rowcount
+
+    def live_sessions(self) -> Iterator[Tuple[str, Dict]]:
+        rows = self._conn().execute(
+            "SELECT session_id, data FROM exam_sessions WHERE expires_at > ?",
+            (time.time(),)
+        ).fetchall()
+        for session_id, payload in rows:
+            yield session_id, json.loads(payload)
+
+
+def session_ttl_seconds() -> int:
+    """
+    Session lifetime: exam duration plus a grace period for late submits,
+    then kept long enough for the deadline scheduler to auto-submit it
+    """
+    return (
+        (settings.EXAM_DURATION_MINUTES + settings.EXAM_SESSION_GRACE_MINUTES) * 60
+        + settings.EXAM_SESSION_RETAIN_SECONDS
+    )
+
+
+def create_session_store() -> ExamSessionStore:
+    """Build the session store configured by EXAM_SESSION_BACKEND"""
+    backend = settings.EXAM_SESSION_BACKEND.lower()
+    if backend == "memory":
+        return InMemorySessionStore(settings.EXAM_SESSION_SWEEP_SECONDS)
+    if backend == "redis":
+        return RedisSessionStore(settings.EXAM_SESSION_REDIS_URL)
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            settings.EXAM_SESSION_SQLITE_PATH,
+            settings.EXAM_SESSION_SWEEP_SECONDS
+        )
+    raise ValueError(f"Unknown EXAM_SESSION_BACKEND: {settings.EXAM_SESSION_BACKEND}")
+
+
+session_store = create_session_store()
+
+
+def restore_session(session_id: str, session: Dict) -> None:
+    """Put a claimed session back with its remaining lifetime"""
+    remaining = int(session["expires_at"] - time.time())
+    if remaining > 0:
+        session_store.create(session_id, session, ttl_seconds=remaining)
@@ -0,0 +1,201 @@
+"""
+Pooled SMTP connections
+Keeps authenticated SMTP sessions open and reuses them across sends, so the
+connect / STARTTLS / AUTH round trips are paid once per connection instead
+of once per email
+"""
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from email.message import Message
+from typing import Dict
+
+from app.config import settings
+
+
+class SMTPPoolTimeout(Exception):
+    """Raised when no connection frees up within the pool timeout"""
+
+
+class _Connection:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class SMTPConnectionPool:
+    """
+    Thread-safe pool of at most `size` SMTP sessions
+    - Idle connections are reused most-recent first
+    - A connection idle longer than `idle_check_seconds` is NOOP-checked first
+    - A connection is retired after `max_messages` sends
+    - A send that fails because the connection dropped is retried once on a
+      fresh connection; rejections from the server are raised as is
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str = "",
+        password: str = "",
+        starttls: bool = True,
+        size: int = 4,
+        timeout: float = 30,
+        idle_check_seconds: float = 30,
+        max_messages: int = 100
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self.idle_check_seconds = idle_check_seconds
+        self.max_messages = max_messages
+        self._idle: "queue.LifoQueue[_Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._opened = 0
+        self._reconnects = 0
+        self._sent = 0
+        self._failed = 0
+
+    def _open(self) -> _Connection:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.starttls:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if self.user:
+                smtp.login(self.user, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self._opened += 1
+        return _Connection(smtp)
+
+    @staticmethod
+    def _discard(conn: _Connection) -> None:
+        try:
+            conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    @staticmethod
+    def _alive(conn: _Connection) -> bool:
+        try:
+            return conn.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _drain_idle(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def _checkout(self) -> _Connection:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise SMTPPoolTimeout(f"No SMTP connection available after {self.timeout}s")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                if conn.messages >= self.max_messages:
+                    self._discard(conn)
+                elif time.monotonic() - conn.last_used > self.idle_check_seconds and not self._alive(conn):
+                    conn.smtp.close()
+                else:
+                    return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn: _Connection, healthy: bool) -> None:
+        if healthy and not self._closed:
+            conn.last_used = time.monotonic()
+            self._idle.put(conn)
+        else:
+            self._discard(conn)
+        self._slots.release()
+
+    def send(self, msg: Message) -> None:
+        """
+        Send one message over a pooled connection
+        """
+        for attempt in (1, 2):
+            conn = self._checkout()
+            try:
+                conn.smtp.send_message(msg)
+            except smtplib.SMTPServerDisconnected as e:
+                error = e
+            except smtplib.SMTPException:
+                # Refused sender/recipient/data: smtplib has already sent RSET.
+                # SMTPException subclasses OSError, so it must be caught before it
+                self._checkin(conn, healthy=True)
+                with self._lock:
+                    self._failed += 1
+                raise
+            except OSError as e:
+                error = e
+            except BaseException:
+                # Anything else (e.g. ValueError for a malformed message) leaves the
+                # session in an unknown state; drop it but always free its slot
+                self._checkin(conn, healthy=False)
+                with self._lock:
+                    self._failed += 1
+                raise
+            else:
+                conn.messages += 1
+                self._checkin(conn, healthy=True)
+                with self._lock:
+                    self._sent += 1
+                return
+            # The server went away; other idle sessions are likely dead too
+            self._checkin(conn, healthy=False)
+            self._drain_idle()
+            if attempt == 2:
+                with self._lock:
+                    self._failed += 1
+                raise error
+            with self._lock:
+                self._reconnects += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "connections_opened": self._opened,
+                "reconnects": self._reconnects,
+                "sent": self._sent,
+                "failed": self._failed
+            }
+
+    def close(self) -> None:
+        self._closed = True
+        self._drain_idle()
+
+
+smtp_pool = SMTPConnectionPool(
+    host=settings.SMTP_HOST,
+    port=settings.SMTP_PORT,
+    user=settings.SMTP_USER,
+    password=settings.SMTP_PASSWORD,
+    starttls=settings.SMTP_STARTTLS,
+    size=settings.SMTP_POOL_SIZE,
+    timeout=settings.SMTP_TIMEOUT_SECONDS,
+    idle_check_seconds=settings.SMTP_POOL_IDLE_CHECK_SECONDS,
+    max_messages=settings.SMTP_MAX_MESSAGES_PER_CONNECTION
+)
@@ -0,0 +1,152 @@
+"""
+Dashboard statistics service
+Counters in stat_counters are updated in the same transaction as the
+writes they count, so the dashboard reads a handful of rows instead of
+scanning users / topics / user_scores
+"""
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import delete, event, func, insert, literal, select, update, String
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import Role, StatCounter, Topic, User, UserScore
+
+# Session.info flag: the transaction changed a counter
+COUNTERS_CHANGED = "stat_counters_changed"
+
+ACTIVE_USERS_PREFIX = "active_users:"
+ACTIVE_TOPICS = "active_topics"
+EXAMS_TAKEN = "exams_taken"
+
+
+def active_users_counter(role_name: str) -> str:
+    return ACTIVE_USERS_PREFIX + role_name
+
+
+def counter_update(name: str, delta: int = 1):
+    """
+    UPDATE statement adding `delta` to one shard of a counter
+    Execute it on the session that performs the counted write; the dashboard
+    cache is invalidated when that session commits
+    Counters that were never seeded are left alone; rebuild_counters seeds them
+    """
+    shard = random.randrange(settings.STAT_COUNTER_SHARDS)
+    return update(StatCounter).where(
+        StatCounter.name == name,
+        StatCounter.shard == shard
+    ).values(value=StatCounter.value + delta).execution_options(**{COUNTERS_CHANGED: True})
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_counters_changed(orm_execute_state) -> None:
+    if orm_execute_state.execution_options.get(COUNTERS_CHANGED):
+        orm_execute_state.session.info[COUNTERS_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    # Invalidating before the commit would let a concurrent read re-cache the old totals
+    if session.info.pop(COUNTERS_CHANGED, False):
+        dashboard_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(COUNTERS_CHANGED, None)
+
+
+def compute_counters(db: Session) -> Dict[str, int]:
+    """Count everything from the source tables in a single aggregate query"""
+    active_users = select(
+        func.count(User.id)
+    ).where(
+        User.role_id == Role.id,
+        User.is_active == True
+    ).correlate(Role).scalar_subquery()
+
+    rows = db.execute(
+        select(
+            literal(ACTIVE_USERS_PREFIX, String) + Role.name,
+            active_users
+        ).union_all(
+            select(
+                literal(ACTIVE_TOPICS, String),
+                select(func.count(Topic.id)).where(
+                    Topic.is_active == True
+                ).scalar_subquery()
+            ),
+            select(
+                literal(EXAMS_TAKEN, String),
+                select(func.count(UserScore.id)).where(
+                    UserScore.is_active == True
+                ).scalar_subquery()
+            )
+        )
+    ).all()
+    return {name: value for name, value in rows}
+
+
+def rebuild_counters(db: Session) -> Dict[str, int]:
+    """
+    Recompute every counter from the source tables and reseed all shards
+    Commits; safe to re-run at any time
+    """
+    counters = compute_counters(db)
+    db.execute(delete(StatCounter))
+    db.execute(insert(StatCounter), [
+        {"name": name, "shard": shard, "value": value if shard == 0 else 0}
+        for name, value in counters.items()
+        for shard in range(settings.STAT_COUNTER_SHARDS)
+    ])
+    db.commit()
+    dashboard_cache.invalidate()
+    return counters
+
+
+def read_counters(db: Session) -> Dict[str, int]:
+    """
+    Current counter totals (one query). Read-only: until migrate.py or
+    init_db.py has seeded the counters, they are counted from the source tables
+    """
+    rows = db.execute(
+        select(StatCounter.name, func.sum(StatCounter.value)).group_by(StatCounter.name)
+    ).all()
+    if not rows:
+        return compute_counters(db)
+    return {name: int(value) for name, value in rows}
+
+
+class DashboardCache:
+    """Short-TTL in-process cache of the dashboard counter totals"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._value: Optional[Dict[str, int]] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Dict[str, int]:
+        value = self._value
+        if value is not None and time.monotonic() < self._expires_at:
+            return value
+        generation = self._generation
+        value = read_counters(db)
+        with self._lock:
+            # An invalidation during the read means the totals may predate it
+            if generation == self._generation:
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl_seconds
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+
+dashboard_cache = DashboardCache(settings.DASHBOARD_CACHE_TTL_SECONDS)
@@ -0,0 +1,271 @@
+"""
+Bulk user provisioning
+Validates a cohort of users, dedupes emails with one IN query, hashes
+passwords across a process pool and inserts users in batches
+
+The admin endpoint runs imports as background jobs, one at a time, on a
+single long-lived process pool; job status and reports are stored in
+provisioning_jobs so they can be polled from any app process. The CLI
+hashes on a pool of its own
+"""
+import multiprocessing
+import queue
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.database import SessionLocal
+from app.core.security import hash_password
+from app.models.models import ProvisioningJob, Role, User
+from app.schemas.schemas import UserCreate
+from app.services.stats_service import active_users_counter, counter_update
+
+INSERT_BATCH_SIZE = 500
+LOOKUP_CHUNK_SIZE = 10000
+
+
+def bulk_hash_workers() -> int:
+    return settings.PASSWORD_HASH_BULK_WORKERS or multiprocessing.cpu_count()
+
+
+def hash_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn: never fork a threaded server process
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def hash_passwords(passwords: List[str], pool: Optional[Executor] = None) -> List[str]:
+    """
+    bcrypt every password on `pool`, or on a throwaway pool of
+    PASSWORD_HASH_BULK_WORKERS processes when none is given
+    """
+    if len(passwords) <= 1:
+        return [hash_password(p) for p in passwords]
+    workers = min(bulk_hash_workers(), len(passwords))
+    chunksize = max(len(passwords) // (workers * 4), 1)
+    if pool is not None:
+        return list(pool.map(hash_password, passwords, chunksize=chunksize))
+    with hash_pool(workers) as own_pool:
+        return list(own_pool.map(hash_password, passwords, chunksize=chunksize))
+
+
+def _existing_emails(db: Session, emails: List[str]) -> set:
+    existing = set()
+    for i in range(0, len(emails), LOOKUP_CHUNK_SIZE):
+        chunk = emails[i:i + LOOKUP_CHUNK_SIZE]
+        existing.update(db.execute(
+            select(User.email).where(User.email.in_(chunk))
+        ).scalars())
+    return existing
+
+
+def provision_users(
+    db: Session,
+    rows: Iterable[Dict[str, Any]],
+    created_by: Optional[int] = None,
+    pool: Optional[Executor] = None
+) -> Dict:
+    """
+    Create users from raw row dicts (name, email, password, role_id)
+    Every row gets a result: created (with user_id), skipped or error
+    All created users are committed in one transaction
+    """
+    results: List[Dict] = []
+    valid: List[tuple] = []
+
+    for index, raw in enumerate(rows, start=1):
+        try:
+            valid.append((index, UserCreate.model_validate(raw)))
+        except ValidationError as e:
+            results.append({
+                "row": index,
+                "email": raw.get("email") if isinstance(raw, dict) else None,
+                "status": "error",
+                "error": "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+            })
+
+    role_names = dict(db.execute(select(Role.id, Role.name)).all())
+    existing = _existing_emails(db, list({user.email for _, user in valid}))
+
+    seen = set()
+    to_create = []
+    for index, user in valid:
+        if user.email in existing:
+            results.append({"row": index, "email": user.email, "status": "skipped",
+                            "error": "Email already registered"})
+        elif user.email in seen:
+            results.append({"row": index, "email": user.email, "status": "skipped",
+                            "error": "Duplicate email in request"})
+        elif user.role_id not in role_names:
+            results.append({"row": index, "email": user.email, "status": "error",
+                            "error": f"role_id {user.role_id} does not exist"})
+        else:
+            seen.add(user.email)
+            to_create.append((index, user))
+
+    hashed = hash_passwords([user.password for _, user in to_create], pool)
+
+    created_ids = {}
+    for i in range(0, len(to_create), INSERT_BATCH_SIZE):
+        batch = [
+            {
+                "name": user.name,
+                "email": user.email,
+                "password": password,
+                "role_id": user.role_id,
+                "created_by": created_by
+            }
+            for (_, user), password in zip(
+                to_create[i:i + INSERT_BATCH_SIZE], hashed[i:i + INSERT_BATCH_SIZE]
+            )
+        ]
+        created_ids.update(db.execute(
+            insert(User).returning(User.email, User.id), batch
+        ).tuples().all())
+
+    for role_id, count in Counter(user.role_id for _, user in to_create).items():
+        db.execute(counter_update(active_users_counter(role_names[role_id]), count))
+    db.commit()
+
+    for index, user in to_create:
+        results.append({"row": index, "email": user.email, "status": "created",
+                        "user_id": created_ids.get(user.email)})
+    results.sort(key=lambda r: r["row"])
+
+    return {
+        "created": len(to_create),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "results": results
+    }
+
+
+class ProvisioningBusy(Exception):
+    """Raised when PROVISIONING_MAX_QUEUED_JOBS imports are already waiting; callers should answer 503"""
+
+
+class ProvisioningJobQueue:
+    """
+    In-process job queue: one worker thread runs imports in order, hashing on
+    a process pool created on first use and kept for the life of the app.
+    Only the rows waiting to be imported live in memory
+    """
+
+    def __init__(self, max_queued: int):
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._pending: "queue.Queue[Optional[Tuple[str, List[Dict[str, Any]], int]]]" = queue.Queue()
+        self._running: Optional[str] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _start(self) -> None:
+        if self._thread:
+            return
+        self._pool = hash_pool(bulk_hash_workers())
+        self._thread = threading.Thread(target=self._run, name="user-provisioning", daemon=True)
+        self._thread.start()
+
+    def submit(self, db: Session, rows: List[Dict[str, Any]], created_by: int) -> ProvisioningJob:
+        """Record a queued job and hand its rows to the worker thread"""
+        with self._lock:
+            if self._pending.qsize() >= self.max_queued:
+                raise ProvisioningBusy()
+            job = ProvisioningJob(id=str(uuid.uuid4()), status="queued", total=len(rows), created_by=created_by)
+            db.add(job)
+            db.commit()
+            self._start()
+            self._pending.put((job.id, rows, created_by))
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def _update(job_id: str, **values) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(update(ProvisioningJob).where(ProvisioningJob.id == job_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            job_id, rows, created_by = item
+            self._running = job_id
+            db = SessionLocal()
+            try:
+                self._update(job_id, status="running")
+                report = provision_users(db, rows, created_by=created_by, pool=self._pool)
+                self._update(
+                    job_id,
+                    status="completed",
+                    created_count=report["created"],
+                    skipped_count=report["skipped"],
+                    failed_count=report["failed"],
+                    results=report["results"],
+                    finished_at=datetime.utcnow()
+                )
+            except Exception as e:
+                db.rollback()
+                try:
+                    self._update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+                except Exception as update_error:
+                    print(f"Error recording failed provisioning job {job_id}: {update_error}")
+            finally:
+                db.close()
+                self._running = None
+
+    def shutdown(self) -> None:
+        """Stop the worker; jobs it did not finish are marked failed so polls end"""
+        if not self._thread:
+            return
+        unfinished = []
+        while True:
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                unfinished.append(item[0])
+        self._pending.put(None)
+        self._thread.join(timeout=5)
+        if self._running:
+            unfinished.append(self._running)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._thread = None
+        if unfinished:
+            db = SessionLocal()
+            try:
+                db.execute(update(ProvisioningJob).where(
+                    ProvisioningJob.id.in_(unfinished),
+                    ProvisioningJob.status.in_(("queued", "running"))
+                ).values(
+                    status="failed",
+                    error="Interrupted by a server shutdown; submit the import again",
+                    finished_at=datetime.utcnow()
+                ))
+                db.commit()
+            finally:
+                db.close()
+
+
+def get_provisioning_job(db: Session, job_id: str) -> Optional[ProvisioningJob]:
+    return db.get(ProvisioningJob, job_id)
+
+
+provisioning_jobs = ProvisioningJobQueue(max_queued=settings.PROVISIONING_MAX_QUEUED_JOBS)
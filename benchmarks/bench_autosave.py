@@ -0,0 +1,72 @@
+"""
+Benchmark: exam autosaves written straight to the session store vs
+through the write-behind buffer
+Uses a throwaway SQLite session store; every session autosaves --saves
+times within one flush interval
+
+Usage: python -m benchmarks.bench_autosave [--sessions 2000] [--saves 10] [--questions 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.services.autosave import AutosaveBuffer
+from app.services.session_store import SQLiteSessionStore
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--saves", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteSessionStore(os.path.join(tmp, "sessions.db"), sweep_interval_seconds=3600)
+        question_ids = list(range(1, args.questions + 1))
+        session_ids = [f"session-{i}" for i in range(args.sessions)]
+        for session_id in session_ids:
+            store.create(session_id, {
+                "user_id": 1,
+                "topic_id": 1,
+                "expires_at": time.time() + 3600,
+                "seed": 1,
+                "question_ids": question_ids
+            }, ttl_seconds=3600)
+
+        def answers(k: int):
+            return [(q, f"Option {q % 4}") for q in question_ids[:k * args.questions // args.saves]]
+
+        # Direct: read-modify-write the session on every autosave
+        start = time.perf_counter()
+        for k in range(1, args.saves + 1):
+            for session_id in session_ids:
+                session = store.get(session_id)
+                session["progress"] = {
+                    "answers": [list(a) for a in answers(k)],
+                    "tab_switch_count": 0,
+                    "saved_at": time.time()
+                }
+                store.update(session_id, session)
+        direct = time.perf_counter() - start
+
+        buffer = AutosaveBuffer(store, flush_seconds=5, max_pending=10 ** 9)
+        start = time.perf_counter()
+        owners = {session_id: buffer.owner(session_id) for session_id in session_ids}
+        for k in range(1, args.saves + 1):
+            for session_id in session_ids:
+                buffer.save(session_id, owners[session_id], answers(k), 0)
+        written = buffer.flush()
+        buffered = time.perf_counter() - start
+        store.close()
+
+    total = args.sessions * args.saves
+    print(f"{total} autosaves ({args.sessions} sessions x {args.saves})")
+    print(f"  direct:   {total} store writes, {direct * 1e3:8.0f} ms")
+    print(f"  buffered: {written} store writes, {buffered * 1e3:8.0f} ms")
+    print(f"  speedup: {direct / buffered:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: certificate rendering throughput
+Compares the old path (full page redrawn per certificate, written to disk
+and read back for the mailer) with the in-memory template render, single
+core and across a process pool
+
+Usage: python -m benchmarks.bench_certificates [--certificates 2000] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from app.services.certificate_service import generate_certificate_pdf
+
+
+def old_render(path: str, user_name: str, topic_name: str, score: int, total: int, grade: str) -> bytes:
+    """The previous generate_certificate_pdf plus the mailer's read-back"""
+    c = canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+    c.setFont("Helvetica-Bold", 32)
+    c.drawCentredString(width / 2, height - 2 * inch, "CERTIFICATE OF ACHIEVEMENT")
+    c.setFont("Helvetica", 16)
+    c.drawCentredString(width / 2, height - 2.8 * inch, "This is to certify that")
+    c.setFont("Helvetica-Bold", 24)
+    c.drawCentredString(width / 2, height - 3.5 * inch, user_name)
+    c.setFont("Helvetica", 16)
+    c.drawCentredString(width / 2, height - 4.2 * inch, "has successfully completed the quiz on")
+    c.setFont("Helvetica-Bold", 20)
+    c.drawCentredString(width / 2, height - 4.9 * inch, topic_name)
+    c.setFont("Helvetica", 14)
+    c.drawCentredString(width / 2, height - 5.6 * inch, f"Score: {score}/{total} | Grade: {grade}")
+    c.setFont("Helvetica", 12)
+    c.drawCentredString(width / 2, height - 6.3 * inch, "Date: January 01, 2024")
+    c.setLineWidth(3)
+    c.rect(0.5 * inch, 0.5 * inch, width - inch, height - inch)
+    c.save()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def run_old(n: int) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(n):
+            old_render(os.path.join(tmp, f"certificate_{i}.pdf"), f"Student {i}", "JavaScript", 8, 10, "B")
+    return n
+
+
+def run_new(n: int) -> int:
+    for i in range(n):
+        generate_certificate_pdf(f"Student {i}", "JavaScript", 8, 10, "B")
+    return n
+
+
+def throughput(fn, n: int, workers: int) -> float:
+    """Certificates per second, single process or split over a spawn pool"""
+    if workers <= 1:
+        start = time.perf_counter()
+        fn(n)
+        return n / (time.perf_counter() - start)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        # Warm the workers so process start-up is not measured
+        list(pool.map(fn, [1] * workers))
+        start = time.perf_counter()
+        done = sum(pool.map(fn, [n // workers] * workers))
+        return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--certificates", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=min(4, multiprocessing.cpu_count()))
+    args = parser.parse_args()
+
+    print(f"{args.certificates} certificates")
+    for workers in sorted({1, args.workers}):
+        before = throughput(run_old, args.certificates, workers)
+        after = throughput(run_new, args.certificates, workers)
+        print(f"  {workers} worker(s):")
+        print(f"    before: {before:8.0f} certs/s  ({before / workers:6.0f} per core)")
+        print(f"    after:  {after:8.0f} certs/s  ({after / workers:6.0f} per core)")
+        print(f"    speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark: exam deadline tracking with the scheduler's heap vs scanning
+every session for expired deadlines once per second
+Pure in-memory; nothing is graded (only the bookkeeping is timed)
+
+Usage: python -m benchmarks.bench_deadlines [--sessions 50000] [--submitted 0.9]
+"""
+import argparse
+import random
+import time
+
+from app.services.exam_deadlines import DeadlineScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("--submitted", type=float, default=0.9, help="share submitted before the deadline")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    duration = 45 * 60
+    # Exams started over the last duration; deadlines spread over the next one
+    now = time.time()
+    deadlines = {f"session-{i}": now + rng.uniform(0, duration) for i in range(args.sessions)}
+    submitted = [s for s in deadlines if rng.random() < args.submitted]
+
+    scheduler = DeadlineScheduler(store=None, delay_seconds=0)
+    start = time.perf_counter()
+    for session_id, due_at in deadlines.items():
+        scheduler.schedule(session_id, due_at)
+    scheduled = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for session_id in submitted:
+        scheduler.cancel(session_id)
+    cancelled = time.perf_counter() - start
+
+    # Fast-forward: everything comes due, only the abandoned sessions are returned
+    scheduler._heap = [(due_at - duration, s) for due_at, s in scheduler._heap]
+    scheduler._due = {s: due_at - duration for s, due_at in scheduler._due.items()}
+    start = time.perf_counter()
+    expired = scheduler._next_due()
+    popped = time.perf_counter() - start
+    assert len(expired) == args.sessions - len(submitted)
+
+    # Polling alternative: every tick walks all live sessions
+    start = time.perf_counter()
+    [s for s, due_at in deadlines.items() if due_at <= now]
+    scan = time.perf_counter() - start
+    ticks = duration  # one scan per second over an exam's duration
+
+    print(f"{args.sessions} sessions, {len(submitted)} submitted, {len(expired)} expired")
+    print(f"  schedule: {scheduled / args.sessions * 1e6:6.2f} us/session")
+    print(f"  cancel:   {cancelled / len(submitted) * 1e6:6.2f} us/session")
+    print(f"  expire:   {popped / max(len(expired), 1) * 1e6:6.2f} us/session (incl. skipped stale entries)")
+    print(f"  heap total:    {(scheduled + cancelled + popped) * 1e3:8.1f} ms")
+    print(f"  1s scan total: {scan * ticks * 1e3:8.1f} ms ({scan * 1e3:.2f} ms x {ticks} ticks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: per-request CPU cost of building the exam start response
+Compares the old path (json.loads per question, pydantic models, FastAPI
+response validation + serialization) with the pre-serialized topic payload,
+and a sampled exam (--sample questions, shuffled options) joined from the
+pre-serialized per-question fragments
+
+Usage: python -m benchmarks.bench_exam_start [--questions 200] [--requests 2000] [--sample 50]
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.config import settings
+from app.routes.exam import render_exam_start
+from app.schemas.schemas import ExamStartResponse, QuestionResponse
+from app.services.exam_service import ExamPlan
+from app.services.question_cache import (
+    CachedQuestion, ExamSettings, TopicQuestionBank, build_bank, dump_json
+)
+
+
+class Row:
+    """Stand-in for a Question ORM row"""
+
+    def __init__(self, i: int):
+        self.id = i
+        self.uuid = str(uuid.uuid4())
+        self.question_text = f"Question {i}: which of the following statements is correct?"
+        self.options = json.dumps([f"Option {c} for question {i}" for c in "ABCD"])
+        self.question_type = "multiple_choice"
+        self.correct_answer = f"Option A for question {i}"
+
+
+async def old_path(rows, field, n_requests: int) -> None:
+    for _ in range(n_requests):
+        questions = [
+            QuestionResponse(
+                id=q.id,
+                uuid=q.uuid,
+                question_text=q.question_text,
+                options=json.loads(q.options) if isinstance(q.options, str) else q.options,
+                question_type=q.question_type
+            ) for q in rows
+        ]
+        content = ExamStartResponse(
+            exam_session_id=str(uuid.uuid4()),
+            questions=questions,
+            duration_minutes=settings.EXAM_DURATION_MINUTES,
+            total_questions=len(rows)
+        )
+        encoded = await serialize_response(
+            field=field, response_content=content, is_coroutine=True
+        )
+        dump_json(encoded)
+
+
+def new_path(bank: TopicQuestionBank, n_requests: int) -> None:
+    for seed in range(n_requests):
+        render_exam_start(bank, ExamPlan.sample(bank, seed), str(uuid.uuid4()))
+
+
+def cpu_per_request(fn, n_requests: int) -> float:
+    start = time.process_time()
+    fn()
+    return (time.process_time() - start) / n_requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sample", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = [Row(i) for i in range(1, args.questions + 1)]
+    questions = tuple(
+        CachedQuestion(
+            id=r.id,
+            uuid=r.uuid,
+            question_text=r.question_text,
+            options=tuple(json.loads(r.options)),
+            question_type=r.question_type,
+            correct_answer=r.correct_answer
+        ) for r in rows
+    )
+    bank = build_bank(topic_id=1, version=0, questions=questions)
+    sampled_bank = build_bank(
+        topic_id=1,
+        version=0,
+        questions=questions,
+        exam_settings=ExamSettings(
+            question_count=args.sample,
+            category_quotas=(),
+            shuffle_questions=True,
+            shuffle_options=True
+        )
+    )
+    field = create_response_field(name="response", type_=ExamStartResponse)
+
+    before = cpu_per_request(
+        lambda: asyncio.run(old_path(rows, field, args.requests)), args.requests
+    )
+    after = cpu_per_request(lambda: new_path(bank, args.requests), args.requests)
+    sampled = cpu_per_request(lambda: new_path(sampled_bank, args.requests), args.requests)
+
+    print(f"{args.questions} questions, {args.requests} requests")
+    print(f"  before: {before * 1e6:10.1f} us CPU/request")
+    print(f"  after:  {after * 1e6:10.1f} us CPU/request")
+    print(f"  speedup: {before / after:.1f}x")
+    print(f"  sampled ({args.sample} questions, shuffled options): {sampled * 1e6:10.1f} us CPU/request")
+
+
+if __name__ == "__main__":
+    main()
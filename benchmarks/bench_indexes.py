@@ -0,0 +1,177 @@
+"""
+Benchmark: query plans and timings of the hot queries, with and without
+the composite / partial indexes
+Seeds a throwaway SQLite database, runs each query before and after
+creating the indexes (the same step migrate.py runs) and prints the plans
+
+Usage: python -m benchmarks.bench_indexes [--topics 200] [--questions 200000]
+                                          [--users 20000] [--scores 500000] [--runs 200]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, func, insert, select, text
+
+from app.models.models import Base, Question, Role, Topic, User, UserScore
+from app.services.question_cache import QuestionCache
+from app.services.results_service import encode_cursor, results_query
+
+INDEXES = ("ix_questions_topic_active", "ix_user_scores_user_topic_active", "ix_user_scores_active_created")
+BATCH = 10000
+
+
+def seed(engine, n_topics: int, n_questions: int, n_users: int, n_scores: int) -> None:
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Role), [{"id": 1, "name": "User"}])
+        conn.execute(insert(Topic), [{"id": i, "name": f"Topic {i}"} for i in range(1, n_topics + 1)])
+
+        def insert_batches(model, rows):
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= BATCH:
+                    conn.execute(insert(model), batch)
+                    batch = []
+            if batch:
+                conn.execute(insert(model), batch)
+
+        insert_batches(Question, (
+            {
+                "uuid": str(uuid.uuid4()),
+                "question_text": f"Question {i}",
+                "options": ["A", "B", "C", "D"],
+                "question_type": "multiple_choice",
+                "correct_answer": "A",
+                "topic_id": rng.randint(1, n_topics),
+                "is_active": rng.random() < 0.9
+            } for i in range(n_questions)
+        ))
+        insert_batches(User, (
+            {
+                "name": f"User {i}",
+                "email": f"user{i}@example.com",
+                "password": "x",
+                "role_id": 1,
+                "is_active": rng.random() < 0.95
+            } for i in range(n_users)
+        ))
+        # Retakes: at most one active score per user and topic, as the unique index requires
+        active = set()
+
+        def score_row():
+            pair = (rng.randint(1, n_users), rng.randint(1, n_topics))
+            is_active = rng.random() < 0.95 and pair not in active
+            if is_active:
+                active.add(pair)
+            return {
+                "score": rng.randint(0, 20),
+                "user_id": pair[0],
+                "topic_id": pair[1],
+                "is_active": is_active,
+                "created_at": start + timedelta(seconds=rng.randint(0, 365 * 86400))
+            }
+
+        insert_batches(UserScore, (score_row() for _ in range(n_scores)))
+
+
+def hot_queries(n_topics: int, n_users: int):
+    """(name, callable returning a statement with fresh random parameters)"""
+    middle_cursor = encode_cursor(datetime(2024, 7, 1), 0)
+    return [
+        ("exam start: topic questions", lambda: QuestionCache._query(random.randint(1, n_topics))),
+        ("exam start: already taken", lambda: select(UserScore.id).where(
+            UserScore.user_id == random.randint(1, n_users),
+            UserScore.topic_id == random.randint(1, n_topics),
+            UserScore.is_active == True
+        ).limit(1)),
+        ("topic list with counts", lambda: select(
+            Topic.id, func.count(Question.id)
+        ).outerjoin(
+            Question, (Question.topic_id == Topic.id) & (Question.is_active == True)
+        ).where(Topic.is_active == True).group_by(Topic.id)),
+        ("results: first page", lambda: results_query(limit=100)),
+        ("results: page via cursor", lambda: results_query(cursor=middle_cursor, limit=100)),
+        ("login: user by email", lambda: select(User.id, User.password).where(
+            User.email == f"user{random.randint(0, n_users - 1)}@example.com",
+            User.is_active == True
+        )),
+    ]
+
+
+def explain(conn, stmt):
+    """EXPLAIN QUERY PLAN with the same bound parameters the real query gets"""
+    def prefix(conn, cursor, statement, parameters, context, executemany):
+        return "EXPLAIN QUERY PLAN " + statement, parameters
+
+    event.listen(conn, "before_cursor_execute", prefix, retval=True)
+    try:
+        # Raw DBAPI rows: the plan columns do not match the statement's result types
+        return conn.execute(stmt).cursor.fetchall()
+    finally:
+        event.remove(conn, "before_cursor_execute", prefix)
+
+
+def measure(engine, queries, runs: int):
+    results = {}
+    with engine.connect() as conn:
+        for name, build in queries:
+            plan = explain(conn, build())
+            statements = [build() for _ in range(runs)]
+            start = time.perf_counter()
+            for stmt in statements:
+                conn.execute(stmt).all()
+            elapsed = (time.perf_counter() - start) / runs
+            results[name] = (elapsed, [row[-1] for row in plan])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--scores", type=int, default=500000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for name in INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        print(f"Seeding {args.questions} questions, {args.users} users, {args.scores} scores...")
+        seed(engine, args.topics, args.questions, args.users, args.scores)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        queries = hot_queries(args.topics, args.users)
+        before = measure(engine, queries, args.runs)
+
+        for table in (Question.__table__, UserScore.__table__):
+            for index in table.indexes:
+                if index.name in INDEXES:
+                    index.create(bind=engine, checkfirst=True)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        after = measure(engine, queries, args.runs)
+        engine.dispose()
+
+    for name, _ in queries:
+        (t0, plan0), (t1, plan1) = before[name], after[name]
+        print(f"\n{name}")
+        print(f"  before: {t0 * 1e3:9.3f} ms   {' | '.join(plan0)}")
+        print(f"  after:  {t1 * 1e3:9.3f} ms   {' | '.join(plan1)}")
+        print(f"  speedup: {t0 / t1:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
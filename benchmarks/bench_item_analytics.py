@@ -0,0 +1,74 @@
+"""
+Benchmark: folding packed exam answers into per-question statistics,
+vectorized over a batch vs unpacking and accumulating row by row
+Runs on in-memory packed rows (the same bytes exam_answers stores)
+
+Usage: python -m benchmarks.bench_item_analytics [--submissions 100000] [--bank 2000] [--per-exam 50]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.services.answer_analytics import TopicItemStats, pack_answers, unpack_answers
+
+
+def make_rows(n_submissions: int, bank: int, per_exam: int):
+    rng = random.Random(42)
+    rows = []
+    for _ in range(n_submissions):
+        skill = rng.random()
+        question_ids = rng.sample(range(1, bank + 1), per_exam)
+        correct = [rng.random() < skill for _ in question_ids]
+        rows.append(pack_answers(question_ids, correct))
+    return rows
+
+
+def row_by_row(rows):
+    sums = {}
+    for id_blob, bitmap in rows:
+        question_ids, flags = unpack_answers(id_blob, bitmap)
+        n = len(question_ids)
+        total = int(flags.sum())
+        for question_id, x in zip(question_ids.tolist(), flags.tolist()):
+            rest = (total - x) / max(n - 1, 1)
+            s = sums.setdefault(question_id, [0, 0, 0.0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += x
+            s[2] += rest
+            s[3] += rest * rest
+            s[4] += x * rest
+    return sums
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submissions", type=int, default=100000)
+    parser.add_argument("--bank", type=int, default=2000)
+    parser.add_argument("--per-exam", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.submissions, args.bank, args.per_exam)
+    size = sum(len(a) + len(b) for a, b in rows)
+    print(f"{args.submissions} submissions x {args.per_exam} answers, {size / 1e6:.1f} MB packed")
+
+    start = time.perf_counter()
+    reference = row_by_row(rows)
+    before = time.perf_counter() - start
+
+    stats = TopicItemStats()
+    start = time.perf_counter()
+    for i in range(0, len(rows), 10000):
+        stats.add(rows[i:i + 10000])
+    after = time.perf_counter() - start
+
+    for question_id, column in stats.positions.items():
+        assert np.allclose(stats.sums[:, column], reference[question_id])
+    print(f"  row by row: {before * 1e3:8.0f} ms")
+    print(f"  vectorized: {after * 1e3:8.0f} ms")
+    print(f"  speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: percentile rank from SQL aggregates vs the in-memory score
+distributions, and the cost of the vectorized rebuild
+Seeds a throwaway SQLite database with user_scores rows
+
+Usage: python -m benchmarks.bench_score_stats [--topics 50] [--scores 1000000] [--runs 200]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import case, create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Base, Role, Topic, User, UserScore
+from app.services.score_stats import ScoreStats
+
+BATCH = 10000
+
+
+def seed(engine, n_topics: int, n_scores: int) -> None:
+    """Each user takes every topic once (one active score per user and topic)"""
+    rng = random.Random(42)
+    n_users = -(-n_scores // n_topics)
+    with engine.begin() as conn:
+        conn.execute(insert(Role), [{"id": 1, "name": "User"}])
+        conn.execute(insert(Topic), [{"id": i, "name": f"Topic {i}"} for i in range(1, n_topics + 1)])
+        for start in range(0, n_users, BATCH):
+            conn.execute(insert(User), [
+                {"name": f"User {i}", "email": f"user{i}@example.com", "password": "x", "role_id": 1}
+                for i in range(start, min(start + BATCH, n_users))
+            ])
+        for start in range(0, n_scores, BATCH):
+            conn.execute(insert(UserScore), [
+                {
+                    "score": min(50, max(0, int(rng.gauss(30, 8)))),
+                    "user_id": i // n_topics + 1,
+                    "topic_id": i % n_topics + 1
+                } for i in range(start, min(start + BATCH, n_scores))
+            ])
+
+
+def sql_percentile(db: Session, topic_id: int, score: int) -> float:
+    below, equal, total = db.execute(
+        select(
+            func.sum(case((UserScore.score < score, 1), else_=0)),
+            func.sum(case((UserScore.score == score, 1), else_=0)),
+            func.count()
+        ).where(
+            UserScore.topic_id == topic_id,
+            UserScore.is_active == True
+        )
+    ).one()
+    return 100.0 * (below + 0.5 * equal) / total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--scores", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        print(f"Seeding {args.scores} scores over {args.topics} topics...")
+        seed(engine, args.topics, args.scores)
+
+        stats = ScoreStats(leaderboard_size=100, refresh_seconds=5, rebuild_seconds=3600, id_overlap=1000)
+        with Session(engine) as db:
+            start = time.perf_counter()
+            stats.rebuild(db)
+            rebuild = time.perf_counter() - start
+
+            queries = [(random.randint(1, args.topics), random.randint(0, 50)) for _ in range(args.runs)]
+            start = time.perf_counter()
+            expected = [sql_percentile(db, topic_id, score) for topic_id, score in queries]
+            sql_time = (time.perf_counter() - start) / args.runs
+
+        start = time.perf_counter()
+        actual = [stats.percentile(topic_id, score)[0] for topic_id, score in queries]
+        memory_time = (time.perf_counter() - start) / args.runs
+        engine.dispose()
+
+    assert all(abs(a - e) < 1e-9 for a, e in zip(actual, expected))
+    print(f"rebuild of {args.scores} scores: {rebuild * 1e3:.0f} ms")
+    print(f"percentile via SQL:       {sql_time * 1e3:9.3f} ms")
+    print(f"percentile in memory:     {memory_time * 1e3:9.3f} ms")
+    print(f"speedup: {sql_time / memory_time:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
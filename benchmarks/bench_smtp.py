@@ -0,0 +1,71 @@
+"""
+Benchmark: certificate email throughput against the local SMTP sink
+Compares one connect / EHLO / AUTH / QUIT per email (the old path) with the
+pooled mailer. The sink has no TLS, so the real saving on a STARTTLS server
+is larger than measured here
+
+Usage: python -m benchmarks.bench_smtp [--emails 500] [--threads 4] [--latency-ms 2]
+"""
+import argparse
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.certificate_service import generate_certificate_pdf
+from app.services.email_service import build_certificate_message
+from app.services.smtp_pool import SMTPConnectionPool
+from benchmarks.smtp_sink import start_sink
+
+HOST = "localhost"
+PORT = 8026
+
+
+def send_unpooled(msg) -> None:
+    server = smtplib.SMTP(HOST, PORT)
+    server.login("bench", "bench")
+    server.send_message(msg)
+    server.quit()
+
+
+def run(send, messages, threads: int) -> float:
+    """Emails per second"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(send, messages))
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    pdf = generate_certificate_pdf("Benchmark Student", "JavaScript", 8, 10, "B")
+    messages = [
+        build_certificate_message(f"student{i}@example.com", f"Student {i}", "JavaScript", pdf)
+        for i in range(args.emails)
+    ]
+
+    sink = start_sink(HOST, PORT, args.latency_ms / 1000)
+    try:
+        handler = sink.handler
+        before = run(send_unpooled, messages, args.threads)
+        before_sessions, handler.sessions = handler.sessions, 0
+
+        pool = SMTPConnectionPool(HOST, PORT, user="bench", password="bench", starttls=False, size=args.threads)
+        after = run(pool.send, messages, args.threads)
+        pool.close()
+        after_sessions = handler.sessions
+    finally:
+        sink.stop()
+
+    print(f"{args.emails} emails, {args.threads} threads, {args.latency_ms} ms per command")
+    print(f"  before: {before:8.0f} emails/s  ({before_sessions} SMTP sessions)")
+    print(f"  after:  {after:8.0f} emails/s  ({after_sessions} SMTP sessions)")
+    print(f"  speedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
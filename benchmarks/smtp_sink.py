@@ -0,0 +1,87 @@
+"""
+Local SMTP stand-in for tests and benchmarks
+Accepts any AUTH credentials over plain text, counts and discards messages
+An optional per-command latency simulates a remote mail server
+
+Usage: python -m benchmarks.smtp_sink [--port 8025] [--latency-ms 0]
+Point the app at it with:
+    SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=false SMTP_USER=test SMTP_PASSWORD=test
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+
+class SinkHandler:
+    """aiosmtpd handler that only counts what it receives"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sessions = 0
+        self.messages = 0
+
+    async def _delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await self._delay()
+        session.host_name = hostname
+        self.sessions += 1
+        return responses
+
+    async def handle_NOOP(self, server, session, envelope, arg):
+        await self._delay()
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        await self._delay()
+        self.messages += 1
+        return "250 Message accepted for delivery"
+
+
+def accept_any(server, session, envelope, mechanism, auth_data) -> AuthResult:
+    return AuthResult(success=True)
+
+
+def start_sink(host: str = "localhost", port: int = 8025, latency: float = 0.0) -> Controller:
+    """Start the sink on a background thread; call .stop() on the result when done"""
+    # aiosmtpd warns about its own legacy login_data on every AUTH
+    logging.getLogger("mail.log").setLevel(logging.ERROR)
+    controller = Controller(
+        SinkHandler(latency),
+        hostname=host,
+        port=port,
+        authenticator=accept_any,
+        auth_require_tls=False
+    )
+    controller.start()
+    return controller
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    controller = start_sink(args.host, args.port, args.latency_ms / 1000)
+    print(f"SMTP sink listening on {args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            handler = controller.handler
+            print(f"  sessions: {handler.sessions}  messages: {handler.messages}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Database migration script
+Brings an existing database up to date with the current models
+Every step is idempotent, so it is safe to run on each deploy
+"""
+import json
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+from app.core.database import SessionLocal, engine
+from app.models.models import (
+    Base, StatCounter, CertificateOutbox, ExamAnswers, ProvisioningJob, Question, TopicExamSettings, UserScore
+)
+from app.services.stats_service import rebuild_counters
+
+def create_new_tables():
+    """Create tables added after the initial schema (existing tables are left untouched)"""
+    Base.metadata.create_all(bind=engine, tables=[
+        StatCounter.__table__,
+        CertificateOutbox.__table__,
+        TopicExamSettings.__table__,
+        ExamAnswers.__table__,
+        ProvisioningJob.__table__
+    ])
+    print("✓ New tables created")
+
+def add_missing_columns():
+    """Add columns introduced after the initial schema (nullable, no backfill)"""
+    columns = [
+        UserScore.__table__.c.certificate_key,
+        UserScore.__table__.c.total_questions,
+        Question.__table__.c.category,
+        CertificateOutbox.__table__.c.batch_id
+    ]
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for column in columns:
+            existing = {c["name"] for c in inspector.get_columns(column.table.name)}
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"✓ Added column {column.table.name}.{column.name}")
+
+def make_active_score_index_unique():
+    """
+    ix_user_scores_user_topic_active is now UNIQUE: deactivate duplicate
+    active scores (keeping the first one per user and topic) and drop the
+    old non-unique index so create_indexes rebuilds it
+    """
+    index = next(i for i in UserScore.__table__.indexes if i.name == "ix_user_scores_user_topic_active")
+    existing = {i["name"]: i for i in inspect(engine).get_indexes("user_scores")}
+    if existing.get(index.name, {}).get("unique"):
+        print("✓ Active score index already unique")
+        return
+    with engine.begin() as conn:
+        deactivated = conn.execute(text(
+            "UPDATE user_scores SET is_active = :inactive, updated_at = CURRENT_TIMESTAMP"
+            " WHERE is_active = :active AND EXISTS ("
+            " SELECT 1 FROM user_scores earlier"
+            " WHERE earlier.user_id = user_scores.user_id"
+            " AND earlier.topic_id = user_scores.topic_id"
+            " AND earlier.is_active = :active AND earlier.id < user_scores.id)"
+        ), {"active": True, "inactive": False}).rowcount
+        if index.name in existing:
+            index.drop(bind=conn)
+    print(f"✓ Duplicate active scores deactivated: {deactivated}")
+
+def create_indexes():
+    """Create composite / partial indexes declared on existing tables (skips existing ones)"""
+    names = {
+        "ix_questions_topic_active",
+        "ix_user_scores_user_topic_active",
+        "ix_user_scores_active_created",
+        "ix_certificate_outbox_batch_id"
+    }
+    for table in (Question.__table__, UserScore.__table__, CertificateOutbox.__table__):
+        for index in table.indexes:
+            if index.name in names:
+                index.create(bind=engine, checkfirst=True)
+    print(f"✓ Indexes ensured: {', '.join(sorted(names))}")
+
+def parse_legacy_options(raw: str) -> list:
+    """
+    Options as stored before the JSON column: normally a JSON array, but
+    create_question used to write a '{"a","b"}' string
+    """
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = None
+    if isinstance(value, list):
+        return [o if isinstance(o, str) else str(o) for o in value]
+    
+    stripped = raw.strip()
+    if not (stripped.startswith("{") and stripped.endswith("}")):
+        # Not a list in any known format; keep the text as a single option
+        return [stripped]
+    inner = stripped[1:-1].strip()
+    try:
+        value = json.loads("[" + inner + "]")
+        return [o if isinstance(o, str) else str(o) for o in value]
+    except ValueError:
+        # Options containing quotes were written unescaped: split on the separators
+        if inner.startswith('"') and inner.endswith('"'):
+            inner = inner[1:-1]
+        return inner.split('","') if inner else []
+
+def repair_question_options():
+    """
+    Rewrite question options that are not valid JSON arrays, then switch the
+    column to JSONB on Postgres
+    """
+    if engine.dialect.name == "postgresql":
+        column = next(c for c in inspect(engine).get_columns("questions") if c["name"] == "options")
+        if isinstance(column["type"], postgresql.JSONB):
+            print("✓ Question options already JSONB")
+            return
+    
+    with engine.begin() as conn:
+        fixes = []
+        for question_id, raw in conn.execute(text("SELECT id, options FROM questions")):
+            try:
+                value = json.loads(raw)
+                if isinstance(value, list) and all(isinstance(o, str) for o in value):
+                    continue
+            except (TypeError, ValueError):
+                pass
+            fixes.append({"id": question_id, "options": json.dumps(parse_legacy_options(raw or ""))})
+        if fixes:
+            conn.execute(text("UPDATE questions SET options = :options WHERE id = :id"), fixes)
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE questions ALTER COLUMN options TYPE JSONB USING options::jsonb"))
+    print(f"✓ Question options repaired: {len(fixes)} rows rewritten")
+
+def backfill_exam_totals():
+    """Fill user_scores.total_questions from the packed answers (4 bytes per question id)"""
+    with engine.begin() as conn:
+        updated = conn.execute(text(
+            "UPDATE user_scores SET total_questions = ("
+            " SELECT length(question_ids) / 4 FROM exam_answers"
+            " WHERE exam_answers.user_score_id = user_scores.id)"
+            " WHERE total_questions IS NULL"
+            " AND EXISTS (SELECT 1 FROM exam_answers WHERE exam_answers.user_score_id = user_scores.id)"
+        )).rowcount
+    print(f"✓ Exam totals backfilled: {updated} scores")
+
+def seed_stat_counters():
+    """Recompute dashboard counters from the source tables"""
+    db = SessionLocal()
+    try:
+        counters = rebuild_counters(db)
+        print(f"✓ Dashboard counters rebuilt: {counters}")
+    finally:
+        db.close()
+
+def run_migrations():
+    """Run every migration step in order"""
+    try:
+        create_new_tables()
+        add_missing_columns()
+        make_active_score_index_unique()
+        create_indexes()
+        repair_question_options()
+        backfill_exam_totals()
+        seed_stat_counters()
+        print("\n✓ Database migrated successfully!")
+    except Exception as e:
+        print(f"Error migrating database: {e}")
+        raise
+
+if __name__ == "__main__":
+    run_migrations()
@@ -0,0 +1,44 @@
+"""
+Bulk user provisioning script
+Creates users from a CSV (name,email,password,role_id) or JSON Lines file
+
+Usage: python provision_users.py students.csv [--report report.json]
+"""
+import argparse
+import csv
+import json
+from app.core.database import SessionLocal
+from app.services.user_provisioning import provision_users
+
+def read_rows(path: str):
+    """Load rows from a .csv file (with header) or a JSON Lines file"""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            return list(csv.DictReader(f))
+        return [json.loads(line) for line in f if line.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision users in bulk")
+    parser.add_argument("path", help="CSV or JSON Lines file")
+    parser.add_argument("--report", help="Write the per-row report to this JSON file")
+    args = parser.parse_args()
+
+    rows = read_rows(args.path)
+    db = SessionLocal()
+    try:
+        report = provision_users(db, rows)
+    finally:
+        db.close()
+
+    print(f"✓ Created: {report['created']}  Skipped: {report['skipped']}  Failed: {report['failed']}")
+    for result in report["results"]:
+        if result["status"] != "created":
+            print(f"  row {result['row']} ({result.get('email')}): {result['status']} - {result.get('error')}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()